@@ -0,0 +1,88 @@
+#! /usr/bin/env python3
+"""Benchmark comparing Git engines on a tree of local bare-repo remotes
+
+Usage:
+    python benchmarks/bench_git_engines.py --repos 100 --updated 0.2
+"""
+
+from pathlib import Path
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from checkAUR import async_git, use_git
+
+
+GIT_ENVIRONMENT = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+
+def git(*args: str, cwd: Path) -> None:
+    """run git command quietly"""
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, env=GIT_ENVIRONMENT)
+
+
+def commit_pkgbuild(work: Path, name: str, version: str) -> None:
+    """commit PKGBUILD with given version and push it"""
+    (work / "PKGBUILD").write_text(f"pkgname={name}\npkgver={version}\npkgrel=1\n", encoding="utf-8")
+    git("add", "PKGBUILD", cwd=work)
+    git("commit", "--quiet", "-m", version, cwd=work)
+    git("push", "--quiet", "origin", "HEAD:master", cwd=work)
+
+
+def build_tree(root: Path, repos: int) -> list[str]:
+    """create remotes, working copies used to push updates and the AUR folder"""
+    names = [f"package-{number:04d}" for number in range(repos)]
+    for directory in ("aur", "remotes", "work"):
+        (root / directory).mkdir()
+    for name in names:
+        remote = root / "remotes" / f"{name}.git"
+        git("init", "--quiet", "--bare", "--initial-branch=master", remote.as_posix(), cwd=root)
+        git("clone", "--quiet", remote.as_posix(), (root / "work" / name).as_posix(), cwd=root)
+        commit_pkgbuild(root / "work" / name, name, "1.0")
+        git("clone", "--quiet", remote.as_posix(), (root / "aur" / name).as_posix(), cwd=root)
+    return names
+
+
+def push_updates(root: Path, names: list[str], fraction: float, round_number: int) -> int:
+    """push new version to the given fraction of remotes"""
+    updated = names[:int(len(names) * fraction)]
+    for name in updated:
+        commit_pkgbuild(root / "work" / name, name, f"1.{round_number}")
+    return len(updated)
+
+
+def main() -> None:
+    """run the benchmark"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repos", type=int, default=50)
+    parser.add_argument("--updated", type=float, default=0.2, help="fraction of repos with upstream changes")
+    parser.add_argument("--jobs", type=int, default=10)
+    args = parser.parse_args()
+
+    engines = {
+        "gitpython": lambda path: use_git.pull_entire_aur(path, args.jobs),
+        "asyncio": lambda path: async_git.pull_entire_aur(path, args.jobs),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        names = build_tree(root, args.repos)
+        for round_number, (engine, pull) in enumerate(engines.items(), start=1):
+            expected = push_updates(root, names, args.updated, round_number)
+            start = time.perf_counter()
+            pulled = pull(root / "aur")
+            duration = time.perf_counter() - start
+            assert len(pulled) == expected, f"{engine} pulled {len(pulled)} instead of {expected}"
+            print(f"{engine:>10}: {duration:.3f} s for {args.repos} repos ({expected} updated)")
+
+
+if __name__ == "__main__":
+    main()
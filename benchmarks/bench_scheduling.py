@@ -0,0 +1,94 @@
+#! /usr/bin/env python3
+"""Benchmark of fetch scheduling on a tree where a few remotes are much slower than the rest.
+Compares the worst order (slow repos last), folder order of a run without history
+and the order by fetch times recorded by that run
+
+Usage:
+    python benchmarks/bench_scheduling.py --repos 40 --slow 4 --delay 2.0
+"""
+
+from pathlib import Path
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from checkAUR import async_git, use_git
+from checkAUR.run_state import RunState
+
+
+GIT_ENVIRONMENT = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+
+def git(*args: str, cwd: Path) -> None:
+    """run git command quietly"""
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, env=GIT_ENVIRONMENT)
+
+
+def build_tree(root: Path, repos: int, slow: int, delay: float) -> dict[str, float]:
+    """create remotes and the AUR folder, returning delay of every remote"""
+    names = [f"package-{number:04d}" for number in range(repos)]
+    delays: dict[str, float] = {}
+    for directory in ("aur", "remotes", "work"):
+        (root / directory).mkdir()
+    for number, name in enumerate(names):
+        remote = root / "remotes" / f"{name}.git"
+        work = root / "work" / name
+        git("init", "--quiet", "--bare", "--initial-branch=master", remote.as_posix(), cwd=root)
+        git("clone", "--quiet", remote.as_posix(), work.as_posix(), cwd=root)
+        (work / "PKGBUILD").write_text(f"pkgname={name}\npkgver=1.0\npkgrel=1\n", encoding="utf-8")
+        git("add", "PKGBUILD", cwd=work)
+        git("commit", "--quiet", "-m", "1.0", cwd=work)
+        git("push", "--quiet", "origin", "HEAD:master", cwd=work)
+        clone = root / "aur" / name
+        git("clone", "--quiet", remote.as_posix(), clone.as_posix(), cwd=root)
+        # every fetch is slowed down on the remote side, a few remotes much more than the rest
+        delays[name] = delay if number < slow else delay / 10
+        git("config", "remote.origin.uploadpack", f"sleep {delays[name]}; git upload-pack", cwd=clone)
+    return delays
+
+
+def main() -> None:
+    """run the benchmark"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repos", type=int, default=40)
+    parser.add_argument("--slow", type=int, default=4, help="number of slow remotes")
+    parser.add_argument("--delay", type=float, default=2.0, help="fetch time of a slow remote in seconds")
+    parser.add_argument("--jobs", type=int, default=10)
+    args = parser.parse_args()
+
+    engines = {
+        "gitpython": use_git.pull_entire_aur,
+        "asyncio": async_git.pull_entire_aur,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        delays = build_tree(root, args.repos, args.slow, args.delay)
+        for engine, pull in engines.items():
+            with RunState(root / f"{engine}-worst.sqlite") as worst:
+                # history claiming the opposite of the real delays starts slow repos last
+                for name, delay in delays.items():
+                    worst.record_fetch_time(name, args.delay - delay)
+            runs = {
+                "slow last": root / f"{engine}-worst.sqlite",
+                "folder order": root / f"{engine}.sqlite",
+                "longest first": root / f"{engine}.sqlite",
+            }
+            for run, state_path in runs.items():
+                with RunState(state_path) as state:
+                    start = time.perf_counter()
+                    pull(root / "aur", args.jobs, False, state)
+                    duration = time.perf_counter() - start
+                print(f"{engine:>10} {run:>13}: {duration:.3f} s for {args.repos} repos ({args.slow} slow)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#! /usr/bin/env python3
+"""Benchmark suite measuring every stage of the program on a synthetic AUR tree: repos backed by local bare
+remotes, a fake pacman database and a fake checkrebuild script. Results are saved as JSON and can be checked
+against budgets in seconds and against results of an earlier run
+
+Usage:
+    python benchmarks/bench_suite.py --repos 100 --commits 5 --updated 0.2 --output results.json
+    python benchmarks/bench_suite.py --budgets budgets.json --baseline results.json --tolerance 1.25
+
+Budgets file maps stage names to the highest allowed median in seconds, e.g. {"pull_entire_aur": 10.0}
+"""
+
+from pathlib import Path
+from typing import Any, Callable
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+from checkAUR import __main__ as checkaur_main
+from checkAUR import async_git, use_git
+from checkAUR.common.data_classes import RunOptions, GIT_ENGINES
+from checkAUR.common.package import read_enitre_repo_pkgbuild, PackageIndex
+from checkAUR.compare_packages import compare_packages
+from checkAUR.pacman import extract_local_packages
+
+
+GIT_ENVIRONMENT = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+STAGES = ("pull_entire_aur", "read_enitre_repo_pkgbuild", "extract_local_packages", "compare_packages",
+    "run_main")
+
+
+def git(*args: str, cwd: Path) -> None:
+    """run git command quietly"""
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, env=GIT_ENVIRONMENT)
+
+
+def commit_version(work: Path, name: str, version: str, file_size: int) -> None:
+    """commit PKGBUILD with given version and a data file of the given size, then push them"""
+    (work / "PKGBUILD").write_text(f"pkgname={name}\npkgver={version}\npkgrel=1\n", encoding="utf-8")
+    (work / "data.bin").write_bytes(os.urandom(file_size))
+    git("add", "PKGBUILD", "data.bin", cwd=work)
+    git("commit", "--quiet", "-m", version, cwd=work)
+    git("push", "--quiet", "origin", "HEAD:master", cwd=work)
+
+
+def build_tree(root: Path, repos: int, commits: int, file_size: int, updated: float) -> list[str]:
+    """create remotes with the given history, the pristine AUR folder and upstream changes
+    of the given fraction of repos, returning names of the updated repos"""
+    names = [f"package-{number:04d}" for number in range(repos)]
+    for directory in ("aur", "remotes", "work"):
+        (root / directory).mkdir()
+    for name in names:
+        remote = root / "remotes" / f"{name}.git"
+        work = root / "work" / name
+        git("init", "--quiet", "--bare", "--initial-branch=master", remote.as_posix(), cwd=root)
+        git("clone", "--quiet", remote.as_posix(), work.as_posix(), cwd=root)
+        for commit in range(commits):
+            commit_version(work, name, f"1.{commit}", file_size)
+        git("clone", "--quiet", remote.as_posix(), (root / "aur" / name).as_posix(), cwd=root)
+    updated_names = names[:int(len(names) * updated)]
+    for name in updated_names:
+        commit_version(root / "work" / name, name, "2.0", file_size)
+    return updated_names
+
+
+def build_database(db_path: Path, names: list[str], commits: int) -> None:
+    """create pacman's database with all packages installed in their version from the AUR folder"""
+    version = f"1.{commits - 1}-1"
+    for name in names:
+        entry = db_path / "local" / f"{name}-{version}"
+        entry.mkdir(parents=True)
+        (entry / "desc").write_text(f"%NAME%\n{name}\n\n%VERSION%\n{version}\n\n%INSTALLDATE%\n1700000000\n\n",
+            encoding="utf-8")
+        (entry / "files").write_text("%FILES%\n\n", encoding="utf-8")
+    (db_path / "sync").mkdir(parents=True)
+    with tarfile.open(db_path / "sync" / "core.db", "w:gz"):
+        pass
+
+
+def build_checkrebuild(bin_path: Path, names: list[str]) -> None:
+    """create checkrebuild script reporting the given packages"""
+    bin_path.mkdir()
+    script = bin_path / "checkrebuild"
+    lines = "".join(f"foreign\\t{name}\\n" for name in names)
+    script.write_text(f"#!/bin/sh\nprintf '{lines}'\n", encoding="utf-8")
+    script.chmod(0o755)
+
+
+def run_round(root: Path, round_number: int, options: RunOptions, updated: int) -> dict[str, float]:
+    """measure every stage on a fresh copy of the AUR folder, with empty caches and state"""
+    os.environ["XDG_CACHE_HOME"] = (root / f"cache-{round_number}").as_posix()
+    os.environ["XDG_STATE_HOME"] = (root / f"state-{round_number}").as_posix()
+    pull = async_git.pull_entire_aur if options.git_engine == "asyncio" else use_git.pull_entire_aur
+    times: dict[str, float] = {}
+    results: dict[str, Any] = {}
+
+    def measure(stage: str, function: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        results[stage] = function()
+        times[stage] = time.perf_counter() - start
+
+    aur_path = root / f"aur-{round_number}"
+    shutil.copytree(root / "aur", aur_path, symlinks=True)
+    measure("pull_entire_aur", lambda: pull(aur_path, options.jobs))
+    assert len(results["pull_entire_aur"]) == updated, f"pulled {len(results['pull_entire_aur'])} instead of {updated}"
+    measure("read_enitre_repo_pkgbuild", lambda: read_enitre_repo_pkgbuild(aur_path))
+    measure("extract_local_packages", lambda: extract_local_packages(options.db_path))
+    measure("compare_packages", lambda: compare_packages(results["read_enitre_repo_pkgbuild"],
+        PackageIndex(results["extract_local_packages"])))
+
+    os.environ["aur_path"] = (root / f"aur-main-{round_number}").as_posix()
+    shutil.copytree(root / "aur", os.environ["aur_path"], symlinks=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        measure("run_main", lambda: checkaur_main.run_main(True, options))
+    return times
+
+
+def summarize(runs: list[dict[str, float]]) -> dict[str, dict[str, Any]]:
+    """median, minimum and all times of every stage"""
+    return {stage: {
+        "median": statistics.median(run[stage] for run in runs),
+        "min": min(run[stage] for run in runs),
+        "runs": [run[stage] for run in runs],
+    } for stage in STAGES}
+
+
+def check_limits(stages: dict[str, dict[str, Any]], budgets: dict[str, float],
+    baseline: dict[str, dict[str, Any]], tolerance: float
+) -> list[str]:
+    """find stages over their budget, or slower than the baseline by more than the tolerance"""
+    failures: list[str] = []
+    for stage, result in stages.items():
+        if stage in budgets and result["median"] > budgets[stage]:
+            failures.append(f"{stage}: {result['median']:.3f} s over budget of {budgets[stage]:.3f} s")
+        if stage in baseline and result["median"] > baseline[stage]["median"] * tolerance:
+            failures.append(f"{stage}: {result['median']:.3f} s slower than baseline "
+                f"{baseline[stage]['median']:.3f} s by more than {tolerance:g} times")
+    return failures
+
+
+def main() -> int:
+    """run the benchmark"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repos", type=int, default=50)
+    parser.add_argument("--commits", type=int, default=3, help="commits in the history of every repo")
+    parser.add_argument("--file-size", type=int, default=4096, help="size of the data file in every commit")
+    parser.add_argument("--updated", type=float, default=0.2, help="fraction of repos with upstream changes")
+    parser.add_argument("--invalid", type=float, default=0.05,
+        help="fraction of packages reported by the fake checkrebuild")
+    parser.add_argument("--engine", choices=GIT_ENGINES, default=GIT_ENGINES[0])
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="JSON file for the results")
+    parser.add_argument("--budgets", type=Path, help="JSON file with budgets of stages in seconds")
+    parser.add_argument("--baseline", type=Path, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+        help="how many times slower than the baseline a stage may be")
+    args = parser.parse_args()
+
+    # the clipboard is not available where benchmarks run
+    checkaur_main.copy_aur_wd = lambda _aur_path: None
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        start = time.perf_counter()
+        updated = build_tree(root, args.repos, args.commits, args.file_size, args.updated)
+        names = sorted(path.name for path in (root / "aur").iterdir())
+        build_database(root / "pacman", names, args.commits)
+        build_checkrebuild(root / "bin", names[:int(len(names) * args.invalid)])
+        os.environ["PATH"] = f"{(root / 'bin').as_posix()}{os.pathsep}{os.environ['PATH']}"
+        print(f"Tree of {args.repos} repos ({len(updated)} updated) built in {time.perf_counter() - start:.1f} s")
+        options = RunOptions(db_path=root / "pacman", git_engine=args.engine, jobs=args.jobs,
+            external_checkrebuild=True)
+        runs = [run_round(root, round_number, options, len(updated)) for round_number in range(args.rounds)]
+
+    stages = summarize(runs)
+    for stage, result in stages.items():
+        print(f"{stage:>26}: median {result['median']:.3f} s, min {result['min']:.3f} s")
+    results = {
+        "parameters": {key: value for key, value in vars(args).items() \
+            if key not in ("output", "budgets", "baseline")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count()},
+        "stages": stages,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    budgets: dict[str, float] = {} if args.budgets is None else json.loads(args.budgets.read_text(encoding="utf-8"))
+    baseline: dict[str, dict[str, Any]] = {} if args.baseline is None \
+        else json.loads(args.baseline.read_text(encoding="utf-8"))["stages"]
+    failures = check_limits(stages, budgets, baseline, args.tolerance)
+    for failure in failures:
+        print(f"Regression: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
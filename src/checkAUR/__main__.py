@@ -1,20 +1,20 @@
-"""Main for checkAUR
+"""Main for checkAUR: renders results of the checks run by the library interface
 """
 
 from pathlib import Path
+import json
 
-import pyperclip # type: ignore [import-untyped]
-
-from checkAUR.common.custom_logging import logger
+from checkAUR.common.custom_logging import logger, setup_logging
 from checkAUR.check_user import check_if_root
-from checkAUR.check_rebuild import check_rebuild, print_invalid_packages
-from checkAUR.aur_path import load_env
-from checkAUR.use_git import pull_entire_aur
-from checkAUR.compare_packages import show_results
-from checkAUR.common.exceptions import ProgramNotInstalledError
-from checkAUR.common.package import read_enitre_repo_pkgbuild, Package
-from checkAUR.pacman import extract_local_packages
-from checkAUR.common.data_classes import TuplePackages
+from checkAUR.check_rebuild import print_invalid_packages
+from checkAUR.compare_packages import show_results, print_failures
+from checkAUR.common.data_classes import RunOptions
+from checkAUR.common.report import CheckReport
+from checkAUR.stages import print_stage_times
+from checkAUR.concurrency import print_limiter_report
+from checkAUR.progress import ProgressListener, ConsoleProgress, JsonLinesProgress, no_progress
+from checkAUR.metrics import metrics_from_report, write_metrics
+from checkAUR.api import CheckConfig, check
 
 def copy_aur_wd(aur_path: Path) -> None:
     """copy 'cd /aur/path' command into clipboard. Current solution to cwd problem
@@ -27,68 +27,69 @@ def copy_aur_wd(aur_path: Path) -> None:
     """
     if not isinstance(aur_path, Path):
         raise TypeError("Path should be pathlib.Path type!") 
+    import pyperclip # type: ignore [import-untyped] # pylint: disable=import-outside-toplevel
     pyperclip.copy(f"cd {aur_path.as_posix()}")
     print("Command to get to AUR folder was copied into the clipboard.")
 
 
-def run_main(ignore=False) -> None:
-    """run main program sequence
+def run_main(ignore=False, options: RunOptions = RunOptions(), output_format: str = "text") -> None:
+    """run main program sequence. Checkrebuild, pulling repos and pacman query run concurrently,
+    in text format updated repos and finished stages are printed as soon as they are known.
+    Metrics of the run are written at the end, if their path is given in the options
 
     Args:
         ignore (bool, optional): if checkrebuild should be ignored. Defaults to False.
+        options (RunOptions, optional): additional options of the run. Defaults to RunOptions().
+        output_format (str, optional): "text" for the user, "json" for one report at the end,
+            "ndjson" for one JSON object per event followed by the report. Defaults to "text".
     """
-    invalid_packages: set[str]
-    if ignore:
-        logger.debug("Running checkrebuild")
-        try:
+    progress: ProgressListener = no_progress
+    if output_format == "text":
+        progress = ConsoleProgress()
+        if ignore:
             print("Starting checkrebuild...")
-            invalid_packages = check_rebuild()
-        except UnicodeError:
-            message = "Error during analysis of checkrebuild results! The step will be skipped"
-            print(message)
-            logger.error(message)
-            invalid_packages = set()
-        except ProgramNotInstalledError as exc:
-            print(str(exc))
-            print("Check if it's installed, install it using pacman or use -i flag. The step will be skipped")
-            invalid_packages = set()
-        logger.debug("Search results:")
-        logger.debug(invalid_packages)
-        print_invalid_packages(invalid_packages)
-    else:
-        invalid_packages = set()
+        print("Starting fetching repos" if options.fetch_only else "Starting pulling repos")
+    elif output_format == "ndjson":
+        progress = JsonLinesProgress()
 
+    report = check(CheckConfig(options=options, check_rebuild=ignore), progress)
     try:
-        env_variables = load_env()
-        aur_path = env_variables.aur_path
-    except EnvironmentError:
-        return
+        if output_format == "json":
+            print(json.dumps(report.to_dict(), indent=2))
+        elif output_format == "ndjson":
+            print(json.dumps({"event": "report", **report.to_dict()}), flush=True)
+        else:
+            assert isinstance(progress, ConsoleProgress)
+            show_report(report, progress)
+    finally:
+        if options.metrics_path is not None:
+            write_metrics(options.metrics_path, metrics_from_report(report))
 
-    message = "Starting pulling repos"
-    print(message)
-    logger.debug(message)
-    try:
-        pulled_packages: set[Package] = pull_entire_aur(aur_path)
-    except ProgramNotInstalledError:
-        print("Closing...")
-        return
-    logger.debug("%s repos pulled", len(pulled_packages))
 
-    aur_packages: set[Package] = read_enitre_repo_pkgbuild(aur_path)
-    pacman_packages: set[Package] = extract_local_packages()
-    results = TuplePackages(aur_packages=aur_packages,
-        pacman_packages=pacman_packages,
-        pulled_packages=pulled_packages,
-        invalid_packages=invalid_packages
-    )
+def show_report(report: CheckReport, progress: ConsoleProgress) -> None:
+    """show results of the checks and copy command changing directory to AUR folder, if there is anything to build
 
-    if show_results(results):
-        copy_aur_wd(aur_path)
+    Args:
+        report (CheckReport): results of the checks
+        progress (ConsoleProgress): printer of the events, which counted repos during the run
+    """
+    if report.fetch_limits is not None:
+        print_limiter_report(report.fetch_limits)
+    print_failures(report.failures)
+    progress.print_summary()
+    print_stage_times(report.timings)
+    if report.invalid_packages is not None:
+        print_invalid_packages(set(report.invalid_packages))
+    if report.awaiting_packages is None or report.aur_path is None:
+        return
+    if show_results(report):
+        copy_aur_wd(report.aur_path)
 
 
 def main():
     """Main function for checkAUR
     """
+    setup_logging()
     logger.debug("Main interface start")
     if check_if_root():
         return
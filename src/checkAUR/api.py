@@ -0,0 +1,239 @@
+"""Module with the library interface: checks run like in the CLI, but their results are returned
+as a report, without printing anything. The CLI renders the same report
+"""
+
+from typing import Callable, Any, Optional
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+import tarfile
+import time
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.check_rebuild import check_rebuild
+from checkAUR.rebuild_detector import detect_rebuilds
+from checkAUR.interpreter_abi import detect_abi_breakage
+from checkAUR.aur_path import load_env
+from checkAUR.use_git import pull_aur_repos
+from checkAUR import async_git
+from checkAUR.aur_rpc import check_with_rpc
+from checkAUR.compare_packages import find_orphan_repos, compare_packages, compare_invalid_packages
+from checkAUR.common.exceptions import ProgramNotInstalledError
+from checkAUR.common.package import read_enitre_repo_pkgbuild, read_repo_folders, Package, PackageIndex
+from checkAUR.common.report import CheckReport, PackageUpdate, UpdatedRepo, Failure, StageTiming, STAGE_FAILED
+from checkAUR.pacman import extract_local_packages
+from checkAUR.common.data_classes import RunOptions, PACMAN_DB_PATH
+from checkAUR.stages import run_stages, run_once, StageResult
+from checkAUR.run_state import open_run_state
+from checkAUR.deadlines import PullLimits, PullSummary
+from checkAUR.concurrency import FetchLimiter, AdaptiveLimit
+from checkAUR.progress import ProgressListener, ProgressRecorder, no_progress, REPO_OUTCOMES
+
+
+@dataclass(frozen=True)
+class CheckConfig:
+    """configuration of the checks
+
+    Attributes:
+        aur_path (Optional[Path]): user's AUR folder. Defaults to None, meaning the one set with 'checkAUR -s'.
+        options (RunOptions): options of pulling repos and reading pacman's database. Defaults to RunOptions().
+        check_rebuild (bool): if packages requiring rebuild should be searched for. Defaults to True.
+    """
+    aur_path: Optional[Path] = None
+    options: RunOptions = RunOptions()
+    check_rebuild: bool = True
+
+
+def find_invalid_packages(db_path: Path = PACMAN_DB_PATH, external: bool = False) -> set[str]:
+    """find packages requiring rebuild.
+    Packages with modules for interpreter versions which are not installed anymore are included,
+    if they can't be searched for, only the rebuild detector's results are returned
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+        external (bool, optional): if checkrebuild script should be run instead of the built-in detector.
+            Defaults to False.
+
+    Raises:
+        ProgramNotInstalledError: if checkrebuild is not installed or there is no pacman's database
+        UnicodeError: if output of checkrebuild could not be read
+        OSError: if pacman's database could not be read
+        tarfile.TarError: if any of sync databases could not be read
+
+    Returns:
+        set[str]: packages requiring rebuild
+    """
+    logger.debug("Running checkrebuild")
+    invalid_packages = check_rebuild() if external else detect_rebuilds(db_path)
+    try:
+        invalid_packages |= detect_abi_breakage(db_path)
+    except (OSError, tarfile.TarError, ProgramNotInstalledError) as exc:
+        logger.warning("Modules of old interpreter versions could not be searched for: %s", exc)
+    logger.debug("Search results: %s", invalid_packages)
+    return invalid_packages
+
+
+def update_aur(aur_path: Path, options: RunOptions = RunOptions(),
+    installed: Optional[Callable[[], set[Package]]] = None, progress: ProgressListener = no_progress,
+    limiter: Optional[FetchLimiter] = None
+) -> tuple[set[Package], set[Package], set[str]]:
+    """pull AUR repos and read their packages afterwards
+
+    Args:
+        aur_path (Path): path to user's AUR folder
+        options (RunOptions, optional): options selecting the Git engine and repos to pull.
+            Defaults to RunOptions().
+        installed (Optional[Callable[[], set[Package]]], optional): function giving installed foreign packages.
+            If given, repos of packages which are not installed are not pulled. Defaults to None.
+        progress (ProgressListener, optional): gets events of every repo as soon as they happen.
+            Defaults to no_progress.
+        limiter (Optional[FetchLimiter], optional): limiter of fetches, its report tells the limits chosen.
+            Defaults to None, meaning a new one made from the options.
+
+    Raises:
+        ProgramNotInstalledError: if Git or pacman is not installed
+
+    Returns:
+        tuple[set[Package], set[Package], set[str]]: pulled packages, all packages in AUR folder
+            and folder names of repos skipped as not installed
+    """
+    pulled_packages: set[Package]
+    orphan_repos: set[str] = set()
+    with open_run_state(aur_path, options.refresh, options.fresh_for) as state:
+        repos: Optional[set[str]] = None
+        filter_orphans = installed is not None and not options.include_orphans
+        if filter_orphans or options.rpc_url is not None:
+            repo_packages = read_repo_folders(aur_path, state.read_packages)
+            # repos without readable metadata can't be matched with packages, pulling may repair them
+            unreadable_repos = {folder for folder, packages in repo_packages.items() if not packages}
+            repo_packages = {folder: packages for folder, packages in repo_packages.items() if packages}
+            if filter_orphans:
+                assert installed is not None
+                orphan_repos = find_orphan_repos(repo_packages, installed())
+                repo_packages = {folder: packages for folder, packages in repo_packages.items() \
+                    if folder not in orphan_repos}
+                repos = set(repo_packages) | unreadable_repos
+                logger.debug("%s repos skipped as not installed", len(orphan_repos))
+            if options.rpc_url is not None:
+                outdated = check_with_rpc(aur_path, repo_packages, options.rpc_url) if repo_packages else set()
+                if outdated is not None:
+                    # AUR has new versions of these repos, no matter how recently they were fetched
+                    state.fresh_for = 0.0
+                    repos = outdated | unreadable_repos
+
+        logger.debug("Starting fetching repos" if options.fetch_only else "Starting pulling repos")
+        limits = PullLimits(timeout=options.timeout, deadline=options.deadline, retries=options.retries)
+        if limiter is None:
+            limiter = FetchLimiter(AdaptiveLimit(options.jobs, maximum=max(options.jobs, options.max_jobs)),
+                options.host_rate)
+        pulled_repos: dict[str, set[Package]]
+        if options.git_engine == "asyncio":
+            pulled_repos = async_git.pull_aur_repos(aur_path, options.jobs, options.fetch_only, state, repos,
+                limits, PullSummary(), limiter, progress)
+        else:
+            pulled_repos = pull_aur_repos(aur_path, options.jobs, options.fetch_only, state, repos,
+                limits, PullSummary(), limiter, progress)
+        logger.debug("%s repos pulled", len(pulled_repos))
+        logger.debug("Fetch limits: %s", limiter.report())
+        pulled_packages = set().union(*pulled_repos.values())
+
+        # repos updated by Git were already read, in fetch-only mode their working trees are outdated anyway
+        aur_packages: set[Package] = read_enitre_repo_pkgbuild(aur_path, pulled_repos, state.read_packages)
+    return pulled_packages, aur_packages, orphan_repos
+
+
+def describe_error(error: BaseException) -> str:
+    """describe exception of a failed stage for the user
+
+    Args:
+        error (BaseException): exception raised by the stage
+
+    Returns:
+        str: one line description
+    """
+    if isinstance(error, ProgramNotInstalledError):
+        return f"{error.program} could not be launched, probably it's not installed"
+    if isinstance(error, UnicodeError):
+        return "output of checkrebuild could not be read"
+    return str(error) or type(error).__name__
+
+
+def _succeeded(results: dict[str, StageResult], name: str) -> bool:
+    return name in results and results[name].error is None
+
+
+def _package_update(pacman_packages: PackageIndex, package: Package) -> PackageUpdate:
+    installed = pacman_packages.get(package.name)
+    assert installed is not None
+    return PackageUpdate(package.name, installed.version, package.version)
+
+
+def check(config: CheckConfig = CheckConfig(), progress: ProgressListener = no_progress) -> CheckReport:
+    """run the checks: checkrebuild, pulling repos and pacman query run concurrently,
+    failures of repos and stages are reported instead of raised
+
+    Args:
+        config (CheckConfig, optional): configuration of the checks. Defaults to CheckConfig().
+        progress (ProgressListener, optional): gets events of every repo and stage as soon as they happen.
+            Defaults to no_progress.
+
+    Returns:
+        CheckReport: results of the checks
+    """
+    start = time.monotonic()
+    options = config.options
+    recorder = ProgressRecorder(progress)
+    failures: list[Failure] = []
+    stages: dict[str, Callable[[], Any]] = {}
+    if config.check_rebuild:
+        stages["checkrebuild"] = partial(find_invalid_packages, options.db_path, options.external_checkrebuild)
+
+    aur_path = config.aur_path
+    if aur_path is None:
+        try:
+            aur_path = load_env().aur_path
+        except EnvironmentError:
+            failures.append(Failure("aur", STAGE_FAILED, "AUR folder is not set, set it with 'checkAUR -s'"))
+    limiter = FetchLimiter(AdaptiveLimit(options.jobs, maximum=max(options.jobs, options.max_jobs)),
+        options.host_rate)
+    if aur_path is not None:
+        # pull stage needs installed packages to skip orphan repos, so both stages share one query
+        installed = run_once(partial(extract_local_packages, options.db_path))
+        stages["aur"] = partial(update_aur, aur_path, options, installed, recorder, limiter)
+        stages["pacman"] = installed
+
+    results = run_stages(stages, recorder)
+    for name, result in results.items():
+        if result.error is not None:
+            logger.error("Stage %s failed: %r", name, result.error)
+            failures.append(Failure(name, STAGE_FAILED, describe_error(result.error)))
+    failures.extend(Failure(event.name, event.kind, event.detail) for event in recorder.failed)
+
+    invalid_packages: Optional[set[str]] = results["checkrebuild"].value \
+        if _succeeded(results, "checkrebuild") else None
+    updates: Optional[PackageIndex] = None
+    awaiting_packages: Optional[tuple[PackageUpdate, ...]] = None
+    if _succeeded(results, "aur") and _succeeded(results, "pacman"):
+        pacman_packages = PackageIndex(results["pacman"].value)
+        updates = compare_packages(results["aur"].value[1], pacman_packages)
+        awaiting_packages = tuple(_package_update(pacman_packages, package) \
+            for package in sorted(updates, key=lambda item: item.name))
+    fetch_limits = limiter.report()
+    return CheckReport(
+        aur_path=aur_path,
+        updated_repos=tuple(UpdatedRepo(name, tuple(sorted(packages, key=lambda item: item.name))) \
+            for name, packages in sorted(recorder.updated.items())),
+        awaiting_packages=awaiting_packages,
+        invalid_packages=None if invalid_packages is None else tuple(sorted(invalid_packages)),
+        invalid_without_update=() if invalid_packages is None or updates is None \
+            else compare_invalid_packages(updates, invalid_packages),
+        orphan_repos=tuple(sorted(results["aur"].value[2])) if _succeeded(results, "aur") else (),
+        failures=tuple(failures),
+        timings=tuple(StageTiming(name, result.duration, result.error is not None) \
+            for name, result in results.items()),
+        repos={outcome: recorder.count(outcome) for outcome in REPO_OUTCOMES},
+        fetched_bytes=recorder.fetched_bytes,
+        fetch_limits=fetch_limits if fetch_limits.peak > 0 else None,
+        duration=time.monotonic() - start,
+        finished_at=time.time(),
+    )
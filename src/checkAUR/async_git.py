@@ -0,0 +1,235 @@
+"""Module responsible for Git operations, driving git directly with asyncio
+"""
+
+from typing import Optional, Collection
+from functools import partial
+from pathlib import Path
+import asyncio
+import os
+import time
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.exceptions import ProgramNotInstalledError
+from checkAUR.common.package import Package, scan_aur_folder
+from checkAUR.common.tracing import span, traced
+from checkAUR.use_git import validate_with_state, read_pulled_packages
+from checkAUR.git_refs import read_head, read_upstream, remote_url
+from checkAUR.run_state import RunState
+from checkAUR.deadlines import PullLimits, PullSummary, Deadline, call_with_retries_async
+from checkAUR.concurrency import FetchLimiter, AdaptiveLimit, remote_host
+from checkAUR.progress import ProgressListener, ProgressEvent, no_progress, REPO_STARTED, REPO_FETCHED, \
+    REPO_FAILED, REPO_TIMED_OUT
+
+
+_GIT_ENVIRONMENT = {**os.environ, "GIT_TERMINAL_PROMPT": "0", "LC_ALL": "C"}
+
+
+async def run_git(repo_path: Path, *args: str, timeout: Optional[float] = None) -> tuple[int, str]:
+    """run git command in the given repository
+
+    Args:
+        repo_path (Path): path to the repository
+        args (str): arguments of git command
+        timeout (Optional[float], optional): seconds after which git is killed. Defaults to None.
+
+    Raises:
+        ProgramNotInstalledError: if Git is not installed
+        TimeoutError: if git did not finish in time
+
+    Returns:
+        tuple[int, str]: return code and stdout of the command
+    """
+    try:
+        process = await asyncio.create_subprocess_exec("git", "-C", repo_path.as_posix(), *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=_GIT_ENVIRONMENT
+        )
+    except FileNotFoundError as exc:
+        logger.critical("Git not installed!")
+        raise ProgramNotInstalledError("Git") from exc
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (TimeoutError, asyncio.CancelledError):
+        # killed also when the task is cancelled, so no git process outlives the deadline
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        logger.debug("git %s failed in %s: %s", args[0], repo_path.as_posix(),
+            stderr.decode(encoding="utf-8", errors="replace").strip())
+    return process.returncode or 0, stdout.decode(encoding="utf-8", errors="replace")
+
+
+async def _fetch(repo_path: Path, timeout: float) -> bool:
+    return_code, _ = await run_git(repo_path, "fetch", "--quiet", "--no-tags", "origin", timeout=timeout)
+    return return_code == 0
+
+
+async def _fetched_size(repo_path: Path, old_tip: Optional[str], new_tip: Optional[str], timeout: float) -> int:
+    if new_tip is None or new_tip == old_tip:
+        return 0
+    try:
+        return_code, stdout = await run_git(repo_path, "rev-list", "--objects", "--disk-usage", new_tip,
+            *([f"^{old_tip}"] if old_tip else []), timeout=timeout)
+        return int(stdout) if return_code == 0 else 0
+    except (TimeoutError, ValueError):
+        return 0
+
+
+@traced(category="git")
+async def pull_repo(repo_path: Path, fetch_only: bool = False, state: Optional[RunState] = None,
+    limits: PullLimits = PullLimits(), deadline: Optional[Deadline] = None, limiter: Optional[FetchLimiter] = None,
+    progress: ProgressListener = no_progress
+) -> bool:
+    """fetch origin of one repository and fast-forward it, if anything changed.
+    With the run state, fetch is skipped for repos fetched recently enough, see RunState.is_fresh.
+    Failed fetch is repeated with backoff, every git command is killed after the timeout
+
+    Args:
+        repo_path (Path): path to the repo's folder
+        fetch_only (bool, optional): if working tree should be left untouched. Defaults to False.
+        state (Optional[RunState], optional): state of the AUR folder. Defaults to None.
+        limits (PullLimits, optional): timeout and retries of git commands. Defaults to PullLimits().
+        deadline (Optional[Deadline], optional): deadline of the whole pull. Defaults to None.
+        limiter (Optional[FetchLimiter], optional): limiter every fetch attempt waits for.
+            Defaults to None, meaning fetch starts at once.
+        progress (ProgressListener, optional): gets fetched and failed events of the repo.
+            Defaults to no_progress.
+
+    Raises:
+        ProgramNotInstalledError: if Git is not installed
+        TimeoutError: if git did not finish in time
+
+    Returns:
+        bool: True if the repo was updated, False if not
+    """
+    deadline = Deadline() if deadline is None else deadline
+    try:
+        with span("validate", "git", repo=repo_path.name):
+            git_dir: Optional[Path] = validate_with_state(repo_path, state)
+    except (OSError, ValueError):
+        git_dir = None
+    if git_dir is None:
+        progress(ProgressEvent(REPO_FAILED, repo_path.name, detail="not a valid AUR repo"))
+        return False
+
+    old_tip = read_upstream(git_dir)
+    if state is not None and state.is_fresh(repo_path.name, read_head(git_dir), old_tip):
+        logger.debug("%s was fetched recently, skipping fetch", repo_path.as_posix())
+    else:
+        fetch = partial(_fetch, repo_path)
+        if limiter is not None:
+            fetch = limiter.limited_async(fetch, remote_host(remote_url(git_dir)), deadline)
+        start = time.monotonic()
+        with span("fetch", "git", repo=repo_path.name):
+            fetched = await call_with_retries_async(fetch, limits, deadline, f"fetch of {repo_path.name}")
+        if not fetched:
+            progress(ProgressEvent(REPO_FAILED, repo_path.name, detail="fetch failed"))
+            return False
+        if state is not None:
+            state.update(repo_path.name, checked_at=time.time())
+            state.record_fetch_time(repo_path.name, time.monotonic() - start)
+    new_tip = read_upstream(git_dir)
+    progress(ProgressEvent(REPO_FETCHED, repo_path.name,
+        size=await _fetched_size(repo_path, old_tip, new_tip, deadline.clamp(limits.timeout))))
+
+    result = True
+    if new_tip == read_head(git_dir):
+        result = False
+    elif not fetch_only:
+        with span("fast-forward", "git", repo=repo_path.name):
+            return_code, _ = await run_git(repo_path, "merge", "--ff-only", "--quiet", "@{upstream}",
+                timeout=deadline.clamp(limits.timeout))
+        result = return_code == 0
+        if not result:
+            progress(ProgressEvent(REPO_FAILED, repo_path.name, detail="fast-forward failed"))
+    if state is not None:
+        state.update(repo_path.name, head=read_head(git_dir), remote_tip=read_upstream(git_dir))
+    return result
+
+
+async def _pull_limited(repo_path: Path, semaphore: asyncio.Semaphore, fetch_only: bool,
+    state: Optional[RunState], limits: PullLimits, deadline: Deadline, summary: PullSummary,
+    limiter: FetchLimiter, progress: ProgressListener
+) -> set[Package]:
+    async with semaphore:
+        progress(ProgressEvent(REPO_STARTED, repo_path.name))
+        try:
+            if not await pull_repo(repo_path, fetch_only, state, limits, deadline, limiter, progress):
+                return set()
+        except TimeoutError:
+            summary.add_timed_out(repo_path.name)
+            progress(ProgressEvent(REPO_TIMED_OUT, repo_path.name))
+            return set()
+    # reading metadata starts 'git cat-file' and reads files, so it must not stall other repos
+    return await asyncio.to_thread(read_pulled_packages, repo_path, fetch_only, state, progress)
+
+
+async def pull_entire_aur_async(aur_path: Path, concurrency: int = 10, fetch_only: bool = False,
+    state: Optional[RunState] = None, repos: Optional[Collection[str]] = None,
+    limits: PullLimits = PullLimits(), summary: Optional[PullSummary] = None,
+    limiter: Optional[FetchLimiter] = None, progress: ProgressListener = no_progress
+) -> dict[str, set[Package]]:
+    """fetch and fast-forward user's entire AUR folder, arguments are the same as in use_git.pull_aur_repos,
+    with concurrency in place of max_workers
+
+    Raises:
+        ProgramNotInstalledError: if Git is not installed
+
+    Returns:
+        dict[str, set[Package]]: pulled packages by names of the updated repo folders
+    """
+    assert isinstance(aur_path, Path)
+    assert concurrency > 0
+    repo_list: tuple[Path,...] = tuple(repo_path for repo_path in scan_aur_folder(aur_path) \
+        if repos is None or repo_path.name in repos)
+    if state is not None:
+        # the semaphore wakes waiting tasks in order, so slow repos start first
+        repo_list = tuple(state.longest_first(repo_list))
+
+    summary = PullSummary() if summary is None else summary
+    limiter = FetchLimiter(AdaptiveLimit(concurrency, concurrency)) if limiter is None else limiter
+    deadline = Deadline(limits.deadline)
+    semaphore = asyncio.Semaphore(limiter.maximum)
+    tasks: dict[asyncio.Task, Path] = {asyncio.create_task(_pull_limited(repo_path, semaphore, fetch_only,
+        state, limits, deadline, summary, limiter, progress)): repo_path for repo_path in repo_list}
+    if not tasks:
+        return {}
+    done, pending = await asyncio.wait(tasks, timeout=deadline.remaining())
+    for task in pending:
+        summary.add_timed_out(tasks[task].name)
+        progress(ProgressEvent(REPO_TIMED_OUT, tasks[task].name))
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+    return {tasks[task].name: task.result() for task in done if task.result()}
+
+
+def pull_aur_repos(aur_path: Path, concurrency: int = 10, fetch_only: bool = False,
+    state: Optional[RunState] = None, repos: Optional[Collection[str]] = None,
+    limits: PullLimits = PullLimits(), summary: Optional[PullSummary] = None,
+    limiter: Optional[FetchLimiter] = None, progress: ProgressListener = no_progress
+) -> dict[str, set[Package]]:
+    """run pull_entire_aur_async in a new event loop
+
+    Returns:
+        dict[str, set[Package]]: pulled packages by names of the updated repo folders
+    """
+    return asyncio.run(pull_entire_aur_async(aur_path, concurrency, fetch_only, state, repos, limits, summary,
+        limiter, progress))
+
+
+def pull_entire_aur(aur_path: Path, concurrency: int = 10, fetch_only: bool = False,
+    state: Optional[RunState] = None, repos: Optional[Collection[str]] = None,
+    limits: PullLimits = PullLimits(), summary: Optional[PullSummary] = None,
+    limiter: Optional[FetchLimiter] = None, progress: ProgressListener = no_progress
+) -> set[Package]:
+    """run pull_entire_aur_async in a new event loop
+
+    Returns:
+        set[Package]: pulled packages
+    """
+    return set().union(*pull_aur_repos(aur_path, concurrency, fetch_only, state, repos, limits,
+        summary, limiter, progress).values())
@@ -2,11 +2,10 @@
 """
 
 from typing import Optional
+from functools import cache
 import os
 from pathlib import Path
 
-import dotenv
-
 from checkAUR.common.custom_logging import logger
 from checkAUR.common.data_classes import EnvVariables
 
@@ -39,17 +38,29 @@ def set_aur_path(aur_path: Path) -> bool:
     return True
 
 
+@cache
+def find_env_file() -> Optional[str]:
+    """find .env file, searching only once per run
+
+    Returns:
+        Optional[str]: path to the .env file, None if there is none
+    """
+    import dotenv # pylint: disable=import-outside-toplevel
+    try:
+        return dotenv.find_dotenv(raise_error_if_not_found=True)
+    except IOError:
+        return None
+
+
 def setting_path_env_variable(aur_path: Path):
     """set environment variable for local AUR repo
 
     Args:
         aur_path (Path): path to the AUR folder
     """
-    try:
-        env_path = dotenv.find_dotenv(raise_error_if_not_found=True)
-    except IOError:
-        pass
-    else:
+    env_path = find_env_file()
+    if env_path is not None:
+        import dotenv # pylint: disable=import-outside-toplevel
         dotenv.load_dotenv(env_path)
         dotenv.set_key(env_path, "aur_path", aur_path.as_posix())
         return
@@ -66,19 +77,14 @@ def load_env() -> EnvVariables:
     Returns:
         EnvVariables: NamedTuple of environmental variables
     """
-    env_exception: Optional[Exception] = None
-    try:
-        env_file: str = dotenv.find_dotenv(raise_error_if_not_found=True)
-    except IOError as exc:
-        env_exception = exc
-    else:
+    env_file: Optional[str] = find_env_file()
+    if env_file is not None:
+        import dotenv # pylint: disable=import-outside-toplevel
         dotenv.load_dotenv(env_file)
 
     env_var: Optional[str] = os.environ.get("aur_path")
     if env_var is None:
-        message = ".env file not found!"
-        logger.critical(message)
-        print(message)
-        raise EnvironmentError("Environament variable could not be extracted") from env_exception
+        logger.critical(".env file not found!")
+        raise EnvironmentError("Environament variable could not be extracted")
 
     return EnvVariables(aur_path=Path(env_var))
@@ -0,0 +1,244 @@
+"""Module asking AUR RPC for versions of packages, so only repos with new versions have to be fetched
+"""
+
+from typing import Optional, Final, Iterable, Iterator, Mapping, Self
+from pathlib import Path
+from urllib.parse import urlsplit, urlencode
+import http.client
+import json
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.exceptions import AurRpcError
+from checkAUR.common.package import Package
+from checkAUR.common.vercmp import vercmp
+from checkAUR.common.xdg import cache_path, write_atomic
+
+
+CACHE_FILE: Final[str] = "aur_rpc.json"
+CACHE_VERSION: Final[int] = 1
+MAX_NAMES: Final[int] = 150
+MAX_QUERY_LENGTH: Final[int] = 4000
+TIMEOUT: Final[float] = 15.0
+
+
+def batch_names(names: Iterable[str], max_names: int = MAX_NAMES,
+    max_length: int = MAX_QUERY_LENGTH
+) -> Iterator[list[str]]:
+    """split names into batches small enough for a single request
+
+    Args:
+        names (Iterable[str]): names of the packages
+        max_names (int, optional): maximal number of names in a batch. Defaults to MAX_NAMES.
+        max_length (int, optional): maximal length of the query string. Defaults to MAX_QUERY_LENGTH.
+
+    Returns:
+        Iterator[list[str]]: batches of names, sorted, so the same names give the same requests
+    """
+    batch: list[str] = []
+    length = 0
+    for name in sorted(set(names)):
+        name_length = len(urlencode([("arg[]", name)])) + 1
+        if batch and (len(batch) >= max_names or length + name_length > max_length):
+            yield batch
+            batch, length = [], 0
+        batch.append(name)
+        length += name_length
+    if batch:
+        yield batch
+
+
+class AurRpcClient:
+    """Client of AUR RPC 'info' endpoint, keeping one keep-alive connection for all requests.
+    Responses are cached with their ETag, so unchanged results are not transferred again
+
+    Attributes:
+        url (str): URL of the endpoint
+    """
+    def __init__(self, url: str, timeout: float = TIMEOUT):
+        """Client of AUR RPC 'info' endpoint
+
+        Args:
+            url (str): URL of the endpoint, e.g. https://aur.archlinux.org/rpc/v5/info
+            timeout (float, optional): timeout of a single request in seconds. Defaults to TIMEOUT.
+
+        Raises:
+            AurRpcError: if URL is not HTTP or HTTPS
+        """
+        self.url = url
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise AurRpcError(f"Unsupported AUR RPC URL: {url}")
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path or "/"
+        self._timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+        self._cache: Optional[dict[str, dict[str, str]]] = None
+        self._used: dict[str, dict[str, str]] = {}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """close the connection and save cached responses
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self._save_cache()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._connection is None:
+            connection_class = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+            self._connection = connection_class(self._host, self._port, timeout=self._timeout)
+        return self._connection
+
+    def _load_cache(self) -> dict[str, dict[str, str]]:
+        if self._cache is None:
+            try:
+                with open(cache_path(CACHE_FILE), "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                self._cache = data["entries"] if data.get("version") == CACHE_VERSION else {}
+            except (OSError, ValueError, KeyError, AttributeError):
+                self._cache = {}
+        return self._cache
+
+    def _save_cache(self) -> None:
+        if not self._used:
+            return
+        try:
+            write_atomic(cache_path(CACHE_FILE), json.dumps({"version": CACHE_VERSION, "entries": self._used}))
+        except OSError:
+            logger.warning("Could not save AUR RPC cache")
+
+    def _get(self, target: str) -> tuple[int, dict[str, str], bytes]:
+        cached = self._load_cache().get(target)
+        headers = {"Accept": "application/json", "Connection": "keep-alive"}
+        if cached is not None and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        # a kept-alive connection may have been closed by the server, so the request is repeated once
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request("GET", target, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as exc:
+                connection.close()
+                self._connection = None
+                if attempt:
+                    raise AurRpcError(f"AUR RPC closed connection: {exc}") from exc
+                continue
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                self._connection = None
+                raise AurRpcError(f"AUR RPC request failed: {exc}") from exc
+            if response.will_close:
+                connection.close()
+                self._connection = None
+            return response.status, {key.lower(): value for key, value in response.getheaders()}, body
+        raise AurRpcError("AUR RPC request failed")
+
+    def _request(self, names: list[str]) -> list[dict]:
+        target = f"{self._path}?{urlencode([('arg[]', name) for name in names])}"
+        status, headers, body = self._get(target)
+        if status == http.client.NOT_MODIFIED:
+            cached = self._load_cache().get(target)
+            if cached is None:
+                raise AurRpcError("AUR RPC answered 'not modified' to uncached request")
+            logger.debug("AUR RPC response not modified")
+            self._used[target] = cached
+            content = cached["body"]
+        elif status == http.client.OK:
+            content = body.decode(encoding="utf-8", errors="replace")
+            if headers.get("etag"):
+                self._used[target] = {"etag": headers["etag"], "body": content}
+        else:
+            raise AurRpcError(f"AUR RPC answered with status {status}")
+
+        try:
+            data = json.loads(content)
+        except ValueError as exc:
+            raise AurRpcError("AUR RPC answered with invalid JSON") from exc
+        if not isinstance(data, dict) or data.get("type") == "error":
+            raise AurRpcError(f"AUR RPC error: {data.get('error') if isinstance(data, dict) else data}")
+        results = data.get("results", [])
+        if not isinstance(results, list):
+            raise AurRpcError("AUR RPC answered without results")
+        return results
+
+    def info(self, names: Iterable[str]) -> dict[str, Package]:
+        """ask for current versions of the packages, in as few requests as possible
+
+        Args:
+            names (Iterable[str]): names of the packages
+
+        Raises:
+            AurRpcError: if AUR RPC could not be queried
+
+        Returns:
+            dict[str, Package]: packages known to AUR by their names, with versions and pkgbases
+        """
+        result: dict[str, Package] = {}
+        for batch in batch_names(names):
+            for entry in self._request(batch):
+                try:
+                    package = Package(entry["Name"], entry["Version"], base=entry.get("PackageBase"))
+                except (KeyError, TypeError):
+                    continue
+                result[package.name] = package
+        return result
+
+
+def find_outdated_repos(repo_packages: Mapping[str, set[Package]], client: AurRpcClient) -> set[str]:
+    """find repos whose packages have newer version in AUR than in the local PKGBUILD
+
+    Args:
+        repo_packages (Mapping[str, set[Package]]): packages of the local repos, by folder name
+        client (AurRpcClient): client of AUR RPC
+
+    Raises:
+        AurRpcError: if AUR RPC could not be queried
+
+    Returns:
+        set[str]: folder names of the outdated repos
+    """
+    names = {min(packages, key=lambda package: package.name).name: folder \
+        for folder, packages in repo_packages.items() if packages}
+    remote_packages = client.info(names)
+    result: set[str] = set()
+    for name, folder in names.items():
+        remote = remote_packages.get(name)
+        if remote is None:
+            logger.info("%s not found in AUR", name)
+            continue
+        local = next(package for package in repo_packages[folder] if package.name == name)
+        if vercmp(remote.version, local.version) > 0:
+            result.add(folder)
+    return result
+
+
+def check_with_rpc(aur_path: Path, repo_packages: Mapping[str, set[Package]], url: str) -> Optional[set[str]]:
+    """ask AUR RPC which repos have to be fetched
+
+    Args:
+        aur_path (Path): path to user's AUR folder
+        repo_packages (Mapping[str, set[Package]]): packages of the local repos, by folder name
+        url (str): URL of AUR RPC 'info' endpoint
+
+    Returns:
+        Optional[set[str]]: folder names of repos to fetch, None if every repo has to be fetched
+    """
+    try:
+        with AurRpcClient(url) as client:
+            result = find_outdated_repos(repo_packages, client)
+    except AurRpcError as exc:
+        logger.warning("Could not check versions in AUR, fetching all repos: %s", exc)
+        return None
+    logger.debug("%s of %s repos in %s have new versions in AUR", len(result), len(repo_packages),
+        aur_path.as_posix())
+    return result
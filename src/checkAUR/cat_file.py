@@ -0,0 +1,113 @@
+"""Module reading objects from Git repository through a persistent 'git cat-file --batch' process
+"""
+
+from typing import Optional, Self, IO
+from pathlib import Path
+import subprocess
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.exceptions import ProgramNotInstalledError
+
+
+class CatFileBatch:
+    """Persistent 'git cat-file --batch' process of one repository.
+    Every read reuses the same process instead of starting git again
+
+    Attributes:
+        repo_path (Path): path to the repository
+    """
+    def __init__(self, repo_path: Path):
+        """Persistent 'git cat-file --batch' process of one repository
+
+        Args:
+            repo_path (Path): path to the repository
+        """
+        self.repo_path = repo_path
+        self._process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> Self:
+        self.open()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """start the git process, if it's not running yet
+
+        Raises:
+            ProgramNotInstalledError: if Git is not installed
+        """
+        if self._process is not None:
+            return
+        try:
+            self._process = subprocess.Popen(
+                ["git", "-C", self.repo_path.as_posix(), "cat-file", "--batch"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except FileNotFoundError as exc:
+            logger.critical("Git not installed!")
+            raise ProgramNotInstalledError("Git") from exc
+
+    def close(self) -> None:
+        """stop the git process
+        """
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        if process.stdin is not None:
+            process.stdin.close()
+        if process.stdout is not None:
+            process.stdout.close()
+        process.wait()
+
+    def read(self, object_name: str) -> Optional[bytes]:
+        """read content of the object
+
+        Args:
+            object_name (str): name of the object, e.g. "HEAD:PKGBUILD" or commit hash with path
+
+        Raises:
+            ValueError: if object name contains a new line
+            OSError: if communication with git failed
+
+        Returns:
+            Optional[bytes]: content of the object, None if it does not exist
+        """
+        if "\n" in object_name:
+            raise ValueError("Object name can't contain new line")
+        self.open()
+        assert self._process is not None
+        stdin: IO[bytes] = self._process.stdin # type: ignore [assignment]
+        stdout: IO[bytes] = self._process.stdout # type: ignore [assignment]
+        stdin.write(object_name.encode(encoding="utf-8") + b"\n")
+        stdin.flush()
+
+        header = stdout.readline()
+        if not header:
+            raise OSError(f"git cat-file stopped in {self.repo_path.as_posix()}")
+        fields = header.split()
+        if len(fields) != 3 or not fields[2].isdigit():
+            return None
+        size = int(fields[2])
+        content = stdout.read(size)
+        stdout.read(1)
+        return content
+
+    def read_text(self, object_name: str) -> Optional[str]:
+        """read content of the object as text
+
+        Args:
+            object_name (str): name of the object, e.g. "HEAD:PKGBUILD"
+
+        Returns:
+            Optional[str]: content of the object, None if it does not exist or is not UTF-8 text
+        """
+        content = self.read(object_name)
+        if content is None:
+            return None
+        try:
+            return content.decode(encoding="utf-8")
+        except UnicodeError:
+            logger.warning("%s in %s is not proper text", object_name, self.repo_path.as_posix())
+            return None
@@ -5,8 +5,10 @@ import re
 
 from checkAUR.common.custom_logging import logger
 from checkAUR.common.exceptions import ProgramNotInstalledError
+from checkAUR.common.tracing import traced
 
 
+@traced(category="rebuild")
 def check_rebuild() -> set[str]:
     """check AUR packages requiring updates
 
@@ -21,9 +23,7 @@ def check_rebuild() -> set[str]:
             shell=True, capture_output=True, check=True
         )
     except subprocess.CalledProcessError as exc:
-        message = "checkrebuild not available"
-        print(message)
-        logger.error(message)
+        logger.error("checkrebuild not available")
         raise ProgramNotInstalledError("rebuild-detector") from exc
     stdout: bytes = result.stdout
     try:
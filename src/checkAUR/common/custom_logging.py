@@ -1,28 +1,110 @@
-"""Logger module for the entire project
+"""Logger module for the entire project.
+Threads only put records into a queue, a background listener writes them into a rotating file
+in user's state directory. Nothing is written until setup_logging is called
 """
 
+from typing import Optional, Final, TYPE_CHECKING
+from pathlib import Path
+import atexit
 import logging
+import os
+import queue
 
+from checkAUR.common.xdg import state_path
 
-def gen_logger():
-    """generate logger for the entire project
+if TYPE_CHECKING:
+    from logging.handlers import QueueHandler, QueueListener
+
+
+LOG_FILE: Final[str] = "checkAUR.log"
+LOG_LEVEL_VARIABLE: Final[str] = "CHECKAUR_LOG_LEVEL"
+LOG_LEVELS: Final[tuple[str,...]] = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+DEFAULT_LOG_LEVEL: Final[str] = "WARNING"
+MAX_LOG_BYTES: Final[int] = 1024 * 1024
+LOG_BACKUPS: Final[int] = 3
+LOG_FORMAT: Final[str] = "%(asctime)s | %(levelname)s | %(threadName)s | %(message)s"
+
+
+def resolve_level(level: Optional[str] = None) -> int:
+    """find level of logging, given one takes precedence over CHECKAUR_LOG_LEVEL environment variable
+
+    Args:
+        level (Optional[str], optional): name of the level, e.g. from CLI. Defaults to None.
+
+    Raises:
+        ValueError: if given level is not known
 
     Returns:
-        logging.Logger: logger to be used
+        int: level of logging, WARNING if neither level is given nor the variable is a known level
     """
-    log = logging.getLogger("checkAUR_log")
-    if __debug__:
-        log.setLevel(logging.DEBUG)
-        log.debug("**** DEBUG ****")
-    else:
-        log.setLevel(logging.WARNING)
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_VARIABLE, DEFAULT_LOG_LEVEL)
+        if level.upper() not in LOG_LEVELS:
+            level = DEFAULT_LOG_LEVEL
+    if level.upper() not in LOG_LEVELS:
+        raise ValueError(f"Unknown log level {level}")
+    return logging.getLevelNamesMapping()[level.upper()]
 
-    file_han = logging.FileHandler("logs.log")
-    log.addHandler(file_han)
 
-    formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
-    file_han.setFormatter(formatter)
+def gen_logger() -> logging.Logger:
+    """generate logger for the entire project, without any output until setup_logging is called
 
+    Returns:
+        logging.Logger: logger to be used
+    """
+    log = logging.getLogger("checkAUR_log")
+    log.setLevel(resolve_level())
+    log.addHandler(logging.NullHandler())
     return log
 
 logger = gen_logger()
+_listener: Optional["QueueListener"] = None
+_queue_handler: Optional["QueueHandler"] = None
+
+
+def setup_logging(level: Optional[str] = None, path: Optional[Path] = None, max_bytes: int = MAX_LOG_BYTES,
+    backups: int = LOG_BACKUPS
+) -> Path:
+    """start writing log records in the background, replacing earlier setup
+
+    Args:
+        level (Optional[str], optional): name of the level. Defaults to None, meaning CHECKAUR_LOG_LEVEL or WARNING.
+        path (Optional[Path], optional): log file. Defaults to None, meaning checkAUR.log in user's state directory.
+        max_bytes (int, optional): size after which the file is rotated. Defaults to MAX_LOG_BYTES.
+        backups (int, optional): number of kept rotated files. Defaults to LOG_BACKUPS.
+
+    Returns:
+        Path: path to the log file
+    """
+    global _listener, _queue_handler # pylint: disable=global-statement
+    # imported here, so commands exiting early don't pay for it
+    from logging.handlers import QueueHandler, QueueListener, \
+        RotatingFileHandler # pylint: disable=import-outside-toplevel
+    stop_logging()
+    if path is None:
+        path = state_path(LOG_FILE)
+    file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _queue_handler = QueueHandler(records)
+    logger.addHandler(_queue_handler)
+    logger.setLevel(resolve_level(level))
+    _listener = QueueListener(records, file_handler)
+    _listener.start()
+    return path
+
+
+def stop_logging() -> None:
+    """write queued records and close the log file, later records are dropped
+    """
+    global _listener, _queue_handler # pylint: disable=global-statement
+    if _listener is None:
+        return
+    logger.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
+
+atexit.register(stop_logging)
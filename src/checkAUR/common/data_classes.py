@@ -1,10 +1,17 @@
 """Module for common data classes
 """
 
-from typing import NamedTuple
+from typing import NamedTuple, Final, Optional
 from pathlib import Path
 
-from checkAUR.common.package import Package
+
+PACMAN_DB_PATH: Final[Path] = Path("/var/lib/pacman")
+GIT_ENGINES: Final[tuple[str,...]] = ("gitpython", "asyncio")
+OUTPUT_FORMATS: Final[tuple[str,...]] = ("text", "json", "ndjson")
+AUR_RPC_URL: Final[str] = "https://aur.archlinux.org/rpc/v5/info"
+# repos are fetched on every run unless the user trusts a recent fetch
+FRESH_FOR: Final[float] = 0.0
+MAX_JOBS: Final[int] = 32
 
 
 class EnvVariables(NamedTuple):
@@ -13,10 +20,21 @@ class EnvVariables(NamedTuple):
     aur_path: Path
 
 
-class TuplePackages(NamedTuple):
-    """tuple type aggregating all used collections of packages
+class RunOptions(NamedTuple):
+    """aggregator class for options of the main program sequence
     """
-    aur_packages: set[Package]
-    pacman_packages: set[Package]
-    pulled_packages: set[Package]
-    invalid_packages: set[str]
+    db_path: Path = PACMAN_DB_PATH
+    git_engine: str = GIT_ENGINES[0]
+    jobs: int = 10
+    max_jobs: int = MAX_JOBS
+    host_rate: Optional[float] = None
+    fetch_only: bool = False
+    refresh: bool = False
+    rpc_url: Optional[str] = None
+    include_orphans: bool = False
+    fresh_for: float = FRESH_FOR
+    timeout: float = 120.0
+    deadline: Optional[float] = None
+    retries: int = 2
+    external_checkrebuild: bool = False
+    metrics_path: Optional[Path] = None
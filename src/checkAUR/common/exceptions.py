@@ -15,3 +15,8 @@ class ProgramNotInstalledError(Exception):
         self.program = program
         self.message = f"Following program could not be launched: {program}\nProbably not installed!"
         super().__init__(self.message, args)
+
+
+class AurRpcError(Exception):
+    """Custom exception for situation, when AUR RPC could not be queried
+    """
@@ -1,13 +1,18 @@
 """Module for Package class
 """
 
-from typing import Self, Optional, Final
-from dataclasses import dataclass
-import subprocess
-import re
+from typing import Self, Optional, Iterable, Iterator, Mapping, Callable
+from dataclasses import dataclass, field
 from pathlib import Path
+import concurrent.futures
 import os
 
+from checkAUR.common.custom_logging import logger
+
+from checkAUR.common.vercmp import vercmp
+from checkAUR.common.srcinfo import PackageMetadata, read_metadata, metadata_cache
+from checkAUR.common.tracing import traced
+
 
 class ComparisonException(Exception):
     """Custom exception for comparing wrong packages
@@ -24,13 +29,11 @@ class Package:
     Attributes:
         name (str): name of the package (can contain suffixes like -bin, -git etc.)
         version (str): description of the version
+        base (Optional[str]): pkgbase the package is built from, None if the same as the name
     """
     name: str
     version: str
-
-    def __post_init__(self):
-        # Hack to go over inconsitencies in PKGBUILDs and pacman
-        object.__setattr__(self, "version", self.version.replace("-", "_"))
+    base: Optional[str] = field(default=None, compare=False)
 
     def __str__(self):
         return self.name + " " + self.version
@@ -39,9 +42,7 @@ class Package:
         assert isinstance(operation, str)
         if self.name != other_package.name or not isinstance(other_package, Package):
             raise ComparisonException
-        vercmp_result = subprocess.run(f"vercmp {self.version} {other_package.version}",
-        capture_output=True, check=True, shell=True)
-        result = int(vercmp_result.stdout.decode(encoding="utf-8"))
+        result = vercmp(self.version, other_package.version)
         match operation:
             case ">" if result > 0:
                 pass
@@ -84,65 +85,241 @@ def find_package(package_name:str, packages: set[Package]) -> Optional[Package]:
     return None
 
 
-VERSION_PATTERN: Final[re.Pattern] = re.compile("pkgver=(.*)\n")
-EPOCH_PATTERN: Final[re.Pattern] = re.compile("epoch=(.*)\n")
+class PackageIndex:
+    """Collection of packages indexed by name and by pkgbase, giving O(1) lookups.
+    Membership can be checked with either Package or the name of the package.
+    """
+    __slots__ = ("_by_name", "_by_base")
+
+    def __init__(self, packages: Iterable[Package] = ()):
+        """Collection of packages indexed by name and by pkgbase
+
+        Args:
+            packages (Iterable[Package], optional): initial packages. Defaults to ().
+        """
+        self._by_name: dict[str, Package] = {}
+        self._by_base: dict[str, set[Package]] = {}
+        for package in packages:
+            self.add(package)
+
+    def add(self, package: Package) -> None:
+        """add package to the index, replacing the package with the same name
+
+        Args:
+            package (Package): package to add
+        """
+        previous = self._by_name.get(package.name)
+        if previous is not None:
+            self._by_base[previous.base or previous.name].discard(previous)
+        self._by_name[package.name] = package
+        self._by_base.setdefault(package.base or package.name, set()).add(package)
+
+    def get(self, package_name: str) -> Optional[Package]:
+        """find package by its name
+
+        Args:
+            package_name (str): name of the looked for package
+
+        Returns:
+            Optional[Package]: if match not found, return None
+        """
+        return self._by_name.get(package_name)
+
+    def members(self, base: str) -> set[Package]:
+        """find all packages built from the given pkgbase
+
+        Args:
+            base (str): pkgbase of the packages
+
+        Returns:
+            set[Package]: packages of the pkgbase, empty if none
+        """
+        return set(self._by_base.get(base, ()))
+
+    def names(self) -> set[str]:
+        """names of all indexed packages
 
+        Returns:
+            set[str]: package names
+        """
+        return set(self._by_name)
 
-def read_version_pkgbuild(repo_path: Path) -> str:
-    """read pkgbuild in the given directory and return read version of the package
+    def __contains__(self, item: object) -> bool:
+        if isinstance(item, Package):
+            return self._by_name.get(item.name) == item
+        return item in self._by_name
+
+    def __iter__(self) -> Iterator[Package]:
+        return iter(self._by_name.values())
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PackageIndex):
+            return set(self) == set(other)
+        if isinstance(other, (set, frozenset)):
+            return set(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PackageIndex({set(self)!r})"
+
+
+def packages_from_metadata(metadata: PackageMetadata) -> set[Package]:
+    """create packages for all package names of the package base
+
+    Args:
+        metadata (PackageMetadata): metadata of the package base
+
+    Returns:
+        set[Package]: packages built from the base
+    """
+    version = metadata.full_version
+    return set(Package(name, version, base=metadata.pkgbase) for name in metadata.pkgnames)
+
+
+@traced(category="metadata")
+def read_pkgbuild(repo_path: Path) -> Package:
+    """read .SRCINFO (or PKGBUILD) in the given directory and return information on the main package
 
     Args:
         repo_path (Path): path to AUR repo
 
     Returns:
-        str: string with package version
+        Package: object describing the first package of the package base
     """
-    epoch: Optional[str] = None
-    result: Optional[str] = None
-    with open(repo_path / "PKGBUILD", "r", buffering=1, encoding="utf-8") as file:
-        for line in file:
-            if epoch is not None and result is not None:
-                break
+    metadata = read_metadata(repo_path)
+    return Package(metadata.pkgnames[0], metadata.full_version, base=metadata.pkgbase)
 
-            search_epoch = re.search(EPOCH_PATTERN, line)
-            if search_epoch is not None and epoch is None:
-                epoch = search_epoch[1]
 
-            search_result = re.search(VERSION_PATTERN, line)
-            if search_result is not None and result is None:
-                result = search_result[1]
+@traced(category="metadata")
+def read_repo_packages(repo_path: Path) -> set[Package]:
+    """read .SRCINFO (or PKGBUILD) in the given directory and return all packages of the split package
 
-    epoch = "" if epoch is None else epoch + ":"
+    Args:
+        repo_path (Path): path to AUR repo
 
-    if result is not None:
-        return epoch + result
+    Returns:
+        set[Package]: packages built from the repo
+    """
+    return packages_from_metadata(read_metadata(repo_path))
 
-    return "NDA"
 
+def scan_aur_folder(aur_path: Path) -> Iterator[Path]:
+    """find all repo folders in AUR folder in a single pass over its entries
 
-def read_pkgbuild(repo_path: Path) -> Package:
-    """read pkgbuild in the given directory and return package information
+    Args:
+        aur_path (Path): path to AUR repos folder
+
+    Returns:
+        Iterator[Path]: paths to folders, symbolic links and files are skipped
+    """
+    with os.scandir(aur_path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield Path(entry.path)
+
+
+def _read_repo_packages_safe(repo_path: Path, reader: Optional[Callable[[Path], set[Package]]]) -> set[Package]:
+    try:
+        return read_repo_packages(repo_path) if reader is None else reader(repo_path)
+    except OSError:
+        logger.warning("No package metadata in %s", repo_path.as_posix())
+        return set()
+
+
+def iter_repo_folders(aur_path: Path,
+    known: Optional[Mapping[str, set[Package]]] = None,
+    max_workers: Optional[int] = None,
+    reader: Optional[Callable[[Path], set[Package]]] = None
+) -> Iterator[tuple[str, set[Package]]]:
+    """read packages of all repos in AUR folder, yielding every repo as soon as it is read
 
     Args:
-        repo_path (Path): path to AUR repo
+        aur_path (Path): path to AUR repos folder
+        known (Optional[Mapping[str, set[Package]]], optional): packages already read,
+            by names of the repo folders. Those repos are not read again. Defaults to None.
+        max_workers (Optional[int], optional): number of repos read at once. Defaults to None.
+        reader (Optional[Callable[[Path], set[Package]]], optional): function reading packages of one repo,
+            e.g. RunState.read_packages. Defaults to None, meaning read_repo_packages.
+
+    Returns:
+        Iterator[tuple[str, set[Package]]]: names of the repo folders with their packages,
+            empty for folders without metadata
+    """
+    known = {} if known is None else known
+    scanned: set[str] = set()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures: dict[concurrent.futures.Future, str] = {}
+            for repo_path in scan_aur_folder(aur_path):
+                scanned.add(repo_path.name)
+                if repo_path.name in known:
+                    yield repo_path.name, known[repo_path.name]
+                    continue
+                futures[executor.submit(_read_repo_packages_safe, repo_path, reader)] = repo_path.name
+            for future in concurrent.futures.as_completed(futures):
+                yield futures[future], future.result()
+        # the whole folder was scanned, so entries of other repos belong to removed folders
+        metadata_cache.prune(aur_path, scanned)
+    finally:
+        # repos read before the consumer stopped, or raised, are kept for the next run
+        metadata_cache.save()
+
+
+def iter_repo_packages(aur_path: Path,
+    known: Optional[Mapping[str, set[Package]]] = None,
+    max_workers: Optional[int] = None,
+    reader: Optional[Callable[[Path], set[Package]]] = None
+) -> Iterator[Package]:
+    """read packages of all repos in AUR folder, yielding them as soon as every repo is read
+
+    Args:
+        aur_path (Path): path to AUR repos folder
+        known (Optional[Mapping[str, set[Package]]], optional): packages already read,
+            by names of the repo folders. Those repos are not read again. Defaults to None.
+        max_workers (Optional[int], optional): number of repos read at once. Defaults to None.
+        reader (Optional[Callable[[Path], set[Package]]], optional): function reading packages of one repo,
+            e.g. RunState.read_packages. Defaults to None, meaning read_repo_packages.
+
+    Returns:
+        Iterator[Package]: packages found
+    """
+    for _, packages in iter_repo_folders(aur_path, known, max_workers, reader):
+        yield from packages
+
+
+def read_repo_folders(aur_path: Path,
+    reader: Optional[Callable[[Path], set[Package]]] = None
+) -> dict[str, set[Package]]:
+    """read packages of all repos in AUR folder, keeping the folder they were found in
+
+    Args:
+        aur_path (Path): path to AUR repos folder
+        reader (Optional[Callable[[Path], set[Package]]], optional): function reading packages of one repo.
+            Defaults to None, meaning read_repo_packages.
 
     Returns:
-        Package: object describing the entire package
+        dict[str, set[Package]]: packages by names of the repo folders, empty for folders without metadata
     """
-    version = read_version_pkgbuild(repo_path)
-    # Todo: should name be taken from PKGBUILD?
-    return Package(repo_path.stem, version)
+    return dict(iter_repo_folders(aur_path, reader=reader))
 
 
-def read_enitre_repo_pkgbuild(aur_path: Path) -> set[Package]:
-    """read all packages from folder using PKGBUILD files as base
+def read_enitre_repo_pkgbuild(aur_path: Path,
+    known: Optional[Mapping[str, set[Package]]] = None,
+    reader: Optional[Callable[[Path], set[Package]]] = None
+) -> set[Package]:
+    """read all packages from folder using .SRCINFO or PKGBUILD files as base
 
     Args:
         aur_path (Path): path to AUR repos folder
+        known (Optional[Mapping[str, set[Package]]], optional): packages already read,
+            by names of the repo folders. Those repos are not read again. Defaults to None.
+        reader (Optional[Callable[[Path], set[Package]]], optional): function reading packages of one repo.
+            Defaults to None, meaning read_repo_packages.
 
     Returns:
         set[Package]: packages found
     """
-    folder_list: list[str] = os.listdir(aur_path)
-    repo_tuple: tuple[Path,...] = tuple((aur_path / folder) for folder in folder_list)
-    return set(read_pkgbuild(repo) for repo in repo_tuple)
+    return set(iter_repo_packages(aur_path, known, reader=reader))
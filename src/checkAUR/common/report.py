@@ -0,0 +1,125 @@
+"""Module for the report of a run, returned by the library interface and rendered by the CLI
+"""
+
+from typing import Optional, Final, Any
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from checkAUR.common.package import Package
+from checkAUR.concurrency import LimiterReport
+
+
+STAGE_FAILED: Final[str] = "stage failed"
+
+
+@dataclass(frozen=True)
+class PackageUpdate:
+    """installed package with a newer version in AUR folder
+
+    Attributes:
+        name (str): name of the package
+        installed_version (str): version installed in the system
+        available_version (str): version in AUR folder
+    """
+    name: str
+    installed_version: str
+    available_version: str
+
+
+@dataclass(frozen=True)
+class UpdatedRepo:
+    """repo brought new commits by the pull
+
+    Attributes:
+        name (str): name of the repo's folder
+        packages (tuple[Package, ...]): packages read from the new commit, sorted by name
+    """
+    name: str
+    packages: tuple[Package, ...]
+
+
+@dataclass(frozen=True)
+class Failure:
+    """repo or stage which did not finish
+
+    Attributes:
+        name (str): name of the repo's folder or of the stage
+        kind (str): REPO_FAILED or REPO_TIMED_OUT for repos, STAGE_FAILED for stages
+        detail (str): reason of the failure
+    """
+    name: str
+    kind: str
+    detail: str = ""
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    """wall time of a stage
+
+    Attributes:
+        name (str): name of the stage
+        duration (float): wall time in seconds
+        failed (bool): if the stage raised an exception
+    """
+    name: str
+    duration: float
+    failed: bool = False
+
+
+@dataclass(frozen=True)
+class CheckReport:
+    """results of a run
+
+    Attributes:
+        aur_path (Optional[Path]): user's AUR folder, None if it's not known
+        updated_repos (tuple[UpdatedRepo, ...]): repos updated by the pull, sorted by name
+        awaiting_packages (Optional[tuple[PackageUpdate, ...]]): installed packages with a newer version
+            in AUR folder, sorted by name. None if packages could not be compared
+        invalid_packages (Optional[tuple[str, ...]]): packages requiring rebuild, sorted.
+            None if the check did not run or failed
+        invalid_without_update (tuple[str, ...]): packages requiring rebuild without a newer version in AUR folder
+        orphan_repos (tuple[str, ...]): repos of packages which are not installed, skipped by the pull
+        failures (tuple[Failure, ...]): repos and stages which did not finish
+        timings (tuple[StageTiming, ...]): wall time of every stage
+        repos (dict[str, int]): number of repos by their outcome, see progress module
+        fetched_bytes (int): bytes of Git objects fetched
+        fetch_limits (Optional[LimiterReport]): limits of fetches chosen during the pull, None if nothing was pulled
+        duration (float): wall time of the run in seconds
+        finished_at (float): end of the run, as UNIX time
+    """
+    aur_path: Optional[Path]
+    updated_repos: tuple[UpdatedRepo, ...] = ()
+    awaiting_packages: Optional[tuple[PackageUpdate, ...]] = None
+    invalid_packages: Optional[tuple[str, ...]] = None
+    invalid_without_update: tuple[str, ...] = ()
+    orphan_repos: tuple[str, ...] = ()
+    failures: tuple[Failure, ...] = ()
+    timings: tuple[StageTiming, ...] = ()
+    repos: dict[str, int] = field(default_factory=dict)
+    fetched_bytes: int = 0
+    fetch_limits: Optional[LimiterReport] = None
+    duration: float = 0.0
+    finished_at: float = 0.0
+
+    @property
+    def pulled_packages(self) -> tuple[Package, ...]:
+        """packages read from all updated repos
+        """
+        return tuple(package for repo in self.updated_repos for package in repo.packages)
+
+    @property
+    def has_work(self) -> bool:
+        """if there are packages to build in AUR folder
+        """
+        return bool(self.awaiting_packages) or bool(self.invalid_packages)
+
+    def to_dict(self) -> dict[str, Any]:
+        """convert the report into types supported by JSON
+
+        Returns:
+            dict[str, Any]: the report, with paths as strings and nested records as dictionaries
+        """
+        result = asdict(self)
+        result["aur_path"] = None if self.aur_path is None else self.aur_path.as_posix()
+        result["fetch_limits"] = None if self.fetch_limits is None else self.fetch_limits._asdict()
+        return result
@@ -0,0 +1,281 @@
+"""Module reading package metadata from .SRCINFO (or PKGBUILD as a fallback), with on-disk cache
+"""
+
+from typing import NamedTuple, Optional, Final, Iterable, Collection
+from pathlib import Path
+import json
+import os
+import re
+import threading
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.xdg import cache_path, write_atomic
+
+
+CACHE_FILE: Final[str] = "metadata.json"
+CACHE_VERSION: Final[int] = 1
+
+
+class PackageMetadata(NamedTuple):
+    """metadata of the package base, as described by .SRCINFO
+
+    Attributes:
+        pkgbase (str): name of the package base
+        pkgnames (tuple[str,...]): names of all packages built from the base
+        epoch (Optional[str]): epoch of the version, None if not set
+        pkgver (str): upstream version
+        pkgrel (Optional[str]): release of the package, None if not set
+        depends (tuple[str,...]): runtime dependencies of all packages
+        makedepends (tuple[str,...]): build dependencies
+        sources (tuple[str,...]): sources of the package
+    """
+    pkgbase: str
+    pkgnames: tuple[str,...]
+    epoch: Optional[str]
+    pkgver: str
+    pkgrel: Optional[str]
+    depends: tuple[str,...] = ()
+    makedepends: tuple[str,...] = ()
+    sources: tuple[str,...] = ()
+
+    @property
+    def full_version(self) -> str:
+        """version in the form used by pacman: [epoch:]pkgver[-pkgrel]
+        """
+        version = self.pkgver if not self.epoch or self.epoch == "0" else f"{self.epoch}:{self.pkgver}"
+        return version if self.pkgrel is None else f"{version}-{self.pkgrel}"
+
+
+def _unique(values: Iterable[str]) -> tuple[str,...]:
+    return tuple(dict.fromkeys(values))
+
+
+def parse_srcinfo(content: str) -> PackageMetadata:
+    """parse content of .SRCINFO file
+
+    Args:
+        content (str): content of the file
+
+    Raises:
+        ValueError: if there is no pkgbase or pkgver in the content
+
+    Returns:
+        PackageMetadata: metadata of the package base
+    """
+    values: dict[str, list[str]] = {}
+    pkgnames: list[str] = []
+    for raw_line in content.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, separator, value = line.partition("=")
+        if not separator:
+            continue
+        key = key.strip()
+        value = value.strip()
+        if key == "pkgname":
+            pkgnames.append(value)
+            continue
+        base_key = key.split("_", 1)[0]
+        if base_key in ("depends", "makedepends", "source"):
+            key = base_key
+        values.setdefault(key, []).append(value)
+
+    if not values.get("pkgbase") or not values.get("pkgver"):
+        raise ValueError(".SRCINFO does not contain pkgbase or pkgver")
+    pkgbase = values["pkgbase"][0]
+    return PackageMetadata(
+        pkgbase=pkgbase,
+        pkgnames=_unique(pkgnames) or (pkgbase,),
+        epoch=values["epoch"][0] if values.get("epoch") else None,
+        pkgver=values["pkgver"][0],
+        pkgrel=values["pkgrel"][0] if values.get("pkgrel") else None,
+        depends=_unique(values.get("depends", ())),
+        makedepends=_unique(values.get("makedepends", ())),
+        sources=_unique(values.get("source", ())),
+    )
+
+
+_PKGBUILD_PATTERN: Final[re.Pattern] = \
+    re.compile(r"^(pkgbase|pkgname|pkgver|pkgrel|epoch)=(\([^)]*\)|\S+)", re.MULTILINE)
+
+
+def _pkgbuild_value(value: str) -> list[str]:
+    if value.startswith("("):
+        return [element.strip("'\"") for element in value[1:-1].split()]
+    return [value.strip("'\"")]
+
+
+def parse_pkgbuild(content: str, default_name: str) -> PackageMetadata:
+    """read metadata from PKGBUILD without executing it. Only literal values can be read
+
+    Args:
+        content (str): content of PKGBUILD
+        default_name (str): name used if PKGBUILD's name could not be read, e.g. name of the folder
+
+    Returns:
+        PackageMetadata: metadata of the package base, pkgver is "NDA" if not found
+    """
+    values: dict[str, list[str]] = {}
+    for found in _PKGBUILD_PATTERN.finditer(content):
+        values.setdefault(found[1], _pkgbuild_value(found[2]))
+
+    pkgnames = tuple(name for name in values.get("pkgname", ()) if name and "$" not in name)
+    pkgbase = next((name for name in values.get("pkgbase", ()) if name and "$" not in name), None)
+    pkgbase = pkgbase or (pkgnames[0] if pkgnames else default_name)
+    return PackageMetadata(
+        pkgbase=pkgbase,
+        pkgnames=pkgnames or (pkgbase,),
+        epoch=values["epoch"][0] if values.get("epoch") else None,
+        pkgver=values["pkgver"][0] if values.get("pkgver") else "NDA",
+        pkgrel=values["pkgrel"][0] if values.get("pkgrel") else None,
+    )
+
+
+class _MetadataCache:
+    """metadata of repos kept on disk, keyed by the metadata file's inode, modification time and size
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Optional[dict[str, dict]] = None
+        self._dirty = False
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            try:
+                with open(cache_path(CACHE_FILE), "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                entries = data["entries"] if data.get("version") == CACHE_VERSION else {}
+            except (OSError, ValueError, KeyError, AttributeError):
+                entries = {}
+            self._entries = entries
+        return self._entries
+
+    def get(self, path: Path, key: list[int]) -> Optional[PackageMetadata]:
+        """get metadata of the file, if it was not changed
+
+        Args:
+            path (Path): path to the metadata file
+            key (list[int]): inode, modification time and size of the file
+
+        Returns:
+            Optional[PackageMetadata]: cached metadata, None if not available
+        """
+        with self._lock:
+            entry = self._load().get(path.as_posix())
+        if entry is None or entry.get("key") != key:
+            return None
+        try:
+            return PackageMetadata(*(tuple(value) if isinstance(value, list) else value \
+                for value in entry["metadata"]))
+        except (TypeError, KeyError):
+            return None
+
+    def put(self, path: Path, key: list[int], metadata: PackageMetadata) -> None:
+        """store metadata of the file
+
+        Args:
+            path (Path): path to the metadata file
+            key (list[int]): inode, modification time and size of the file
+            metadata (PackageMetadata): parsed metadata
+        """
+        with self._lock:
+            self._load()[path.as_posix()] = {"key": key, "metadata": list(metadata)}
+            self._dirty = True
+
+    def prune(self, aur_path: Path, repo_names: Collection[str]) -> None:
+        """forget entries of repos which were not found by a full scan of the AUR folder
+
+        Args:
+            aur_path (Path): path to the scanned AUR folder
+            repo_names (Collection[str]): names of the repo folders found by the scan
+        """
+        folder = aur_path.as_posix()
+        with self._lock:
+            entries = self._load()
+            removed = [path for path in entries \
+                if Path(path).parent.parent.as_posix() == folder and Path(path).parent.name not in repo_names]
+            for path in removed:
+                del entries[path]
+            if removed:
+                logger.debug("Removing %s metadata cache entries of repos no longer in %s", len(removed), folder)
+                self._dirty = True
+
+    def save(self) -> None:
+        """write the cache to disk, if anything changed
+        """
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            content = json.dumps({"version": CACHE_VERSION, "entries": self._entries})
+            self._dirty = False
+        try:
+            write_atomic(cache_path(CACHE_FILE), content)
+        except OSError:
+            logger.warning("Could not save metadata cache")
+
+    def clear(self) -> None:
+        """forget entries loaded into memory
+        """
+        with self._lock:
+            self._entries = None
+            self._dirty = False
+
+
+metadata_cache = _MetadataCache()
+
+
+def _file_key(stat: os.stat_result) -> list[int]:
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def read_metadata(repo_path: Path) -> PackageMetadata:
+    """read metadata of the repo from .SRCINFO, or from PKGBUILD if there is no .SRCINFO.
+    Unchanged files are not parsed again
+
+    Args:
+        repo_path (Path): path to AUR repo
+
+    Raises:
+        OSError: if neither of the files could be read
+
+    Returns:
+        PackageMetadata: metadata of the package base
+    """
+    for file_name in (".SRCINFO", "PKGBUILD"):
+        path = repo_path / file_name
+        try:
+            key = _file_key(path.stat())
+        except FileNotFoundError:
+            continue
+        cached = metadata_cache.get(path, key)
+        if cached is not None:
+            return cached
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            content = file.read()
+        metadata = parse_content(file_name, content, repo_path.name)
+        if metadata is None:
+            continue
+        metadata_cache.put(path, key, metadata)
+        return metadata
+    raise FileNotFoundError(f"No .SRCINFO or PKGBUILD in {repo_path.as_posix()}")
+
+
+def parse_content(file_name: str, content: str, default_name: str) -> Optional[PackageMetadata]:
+    """parse content of .SRCINFO or PKGBUILD
+
+    Args:
+        file_name (str): ".SRCINFO" or "PKGBUILD"
+        content (str): content of the file
+        default_name (str): name used if PKGBUILD's name could not be read
+
+    Returns:
+        Optional[PackageMetadata]: metadata of the package base, None if .SRCINFO was invalid
+    """
+    if file_name == "PKGBUILD":
+        return parse_pkgbuild(content, default_name)
+    try:
+        return parse_srcinfo(content)
+    except ValueError:
+        logger.warning("Invalid .SRCINFO in %s", default_name)
+        return None
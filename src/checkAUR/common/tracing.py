@@ -0,0 +1,237 @@
+"""Module recording spans of the run, written as Chrome trace (readable by Perfetto) and summed per span name.
+Tracing is off unless enable_tracing is called, disabled spans cost a single global lookup
+"""
+
+from typing import NamedTuple, Optional, Callable, Any, Self
+from functools import wraps
+from pathlib import Path
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+from checkAUR.common.custom_logging import logger
+
+
+class Span(NamedTuple):
+    """finished span
+
+    Attributes:
+        name (str): name of the traced operation
+        category (str): group of operations, e.g. git
+        start (int): start in nanoseconds, from time.perf_counter_ns
+        duration (int): duration in nanoseconds
+        track (str): thread or asyncio task the span ran in
+        args (dict[str, Any]): details of the operation, e.g. name of the repo
+    """
+    name: str
+    category: str
+    start: int
+    duration: int
+    track: str
+    args: dict[str, Any]
+
+
+class SpanSummary(NamedTuple):
+    """time spent in all spans of one name
+
+    Attributes:
+        name (str): name of the spans
+        count (int): number of the spans
+        total (float): summed duration in seconds
+        longest (float): duration of the longest span in seconds
+    """
+    name: str
+    count: int
+    total: float
+    longest: float
+
+
+class Tracer:
+    """Thread-safe collection of finished spans
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: list[Span] = []
+        self._origin = time.perf_counter_ns()
+
+    def add(self, finished: Span) -> None:
+        """record finished span
+
+        Args:
+            finished (Span): span to record
+        """
+        with self._lock:
+            self._spans.append(finished)
+
+    @property
+    def spans(self) -> list[Span]:
+        """all spans recorded so far
+        """
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self) -> list[SpanSummary]:
+        """sum spans by their names
+
+        Returns:
+            list[SpanSummary]: time spent in every kind of span, longest total first
+        """
+        totals: dict[str, list[int]] = {}
+        for finished in self.spans:
+            total = totals.setdefault(finished.name, [0, 0, 0])
+            total[0] += 1
+            total[1] += finished.duration
+            total[2] = max(total[2], finished.duration)
+        return sorted((SpanSummary(name, count, total / 1e9, longest / 1e9) \
+            for name, (count, total, longest) in totals.items()), key=lambda item: item.total, reverse=True)
+
+    def print_summary(self) -> None:
+        """print table of time spent in every kind of span to stderr, so it doesn't mix with the report
+        """
+        summary = self.summary()
+        if not summary:
+            return
+        width = max(len(item.name) for item in summary)
+        print(f"{'span':<{width}} {'count':>8} {'total [s]':>10} {'mean [ms]':>10} {'max [ms]':>10}", file=sys.stderr)
+        for item in summary:
+            print(f"{item.name:<{width}} {item.count:>8} {item.total:>10.3f} "
+                f"{item.total / item.count * 1e3:>10.2f} {item.longest * 1e3:>10.2f}", file=sys.stderr)
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """write spans in Chrome trace event format, every thread and asyncio task on its own track
+
+        Args:
+            path (Path): path to the JSON file
+
+        Raises:
+            OSError: if the file could not be written
+        """
+        pid = os.getpid()
+        tracks: dict[str, int] = {}
+        events: list[dict[str, Any]] = []
+        for finished in sorted(self.spans, key=lambda item: item.start):
+            tid = tracks.setdefault(finished.track, len(tracks) + 1)
+            events.append({"name": finished.name, "cat": finished.category, "ph": "X", "pid": pid, "tid": tid,
+                "ts": (finished.start - self._origin) / 1e3, "dur": finished.duration / 1e3,
+                "args": finished.args})
+        events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": track}} \
+            for track, tid in tracks.items())
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        logger.debug("Trace of %s spans written to %s", len(events), path.as_posix())
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable_tracing() -> Tracer:
+    """start recording spans
+
+    Returns:
+        Tracer: collection of the recorded spans
+    """
+    global _tracer # pylint: disable=global-statement
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing() -> None:
+    """stop recording spans
+    """
+    global _tracer # pylint: disable=global-statement
+    _tracer = None
+
+
+def _current_track() -> str:
+    # asyncio is not imported here, without it loaded no task can be running
+    asyncio = sys.modules.get("asyncio")
+    try:
+        task = asyncio.current_task() if asyncio is not None else None
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return task.get_name()
+    return threading.current_thread().name
+
+
+class _ActiveSpan:
+    __slots__ = ("_tracer", "_name", "_category", "_args", "_start")
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: dict[str, Any]):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+        self._start = 0
+
+    def __enter__(self) -> Self:
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self._tracer.add(Span(self._name, self._category, self._start, time.perf_counter_ns() - self._start,
+            _current_track(), self._args))
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, category: str = "checkAUR", **args: Any) -> _ActiveSpan | _NoSpan:
+    """context manager recording the enclosed operation, if tracing is enabled
+
+    Args:
+        name (str): name of the operation
+        category (str, optional): group of operations. Defaults to "checkAUR".
+        args (Any): details of the operation, shown in the trace
+
+    Returns:
+        _ActiveSpan | _NoSpan: context manager
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NO_SPAN
+    return _ActiveSpan(tracer, name, category, args)
+
+
+def traced[**P, R](name: Optional[str] = None, category: str = "checkAUR"
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """decorator recording every call of the function as a span, if tracing is enabled
+
+    Args:
+        name (Optional[str], optional): name of the spans. Defaults to None, meaning name of the function.
+        category (str, optional): group of operations. Defaults to "checkAUR".
+
+    Returns:
+        Callable[[Callable[P, R]], Callable[P, R]]: decorator
+    """
+    def decorator(function: Callable[P, R]) -> Callable[P, R]:
+        span_name = function.__name__ if name is None else name
+        if inspect.iscoroutinefunction(function):
+            @wraps(function)
+            async def traced_coroutine(*args: P.args, **kwargs: P.kwargs) -> Any:
+                with span(span_name, category):
+                    return await function(*args, **kwargs) # type: ignore [misc]
+            return traced_coroutine # type: ignore [return-value]
+
+        @wraps(function)
+        def traced_function(*args: P.args, **kwargs: P.kwargs) -> R:
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            with _ActiveSpan(tracer, span_name, category, {}):
+                return function(*args, **kwargs)
+        return traced_function
+    return decorator
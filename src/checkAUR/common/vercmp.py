@@ -0,0 +1,196 @@
+"""Module implementing version comparison used by pacman (libalpm's vercmp)
+"""
+
+from typing import NamedTuple, Optional, Final
+from functools import lru_cache, cmp_to_key
+import subprocess
+
+from checkAUR.common.custom_logging import logger
+
+
+_DIGITS: Final[frozenset[str]] = frozenset("0123456789")
+_LETTERS: Final[frozenset[str]] = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_ALNUM: Final[frozenset[str]] = _DIGITS | _LETTERS
+
+_cross_check: bool = False
+
+
+class ParsedVersion(NamedTuple):
+    """version split into its epoch, version and release parts
+
+    Attributes:
+        epoch (str): epoch of the version, "0" if not given
+        version (str): upstream version
+        release (Optional[str]): package release, None if not given
+    """
+    epoch: str
+    version: str
+    release: Optional[str]
+
+
+@lru_cache(maxsize=4096)
+def parse_version(full_version: str) -> ParsedVersion:
+    """split full version string in the form of [epoch:]version[-release]
+
+    Args:
+        full_version (str): version to split
+
+    Returns:
+        ParsedVersion: parts of the version
+    """
+    position = 0
+    while position < len(full_version) and full_version[position] in _DIGITS:
+        position += 1
+
+    release_separator = full_version.rfind("-", position)
+    release: Optional[str] = None
+    end = len(full_version)
+    if release_separator != -1:
+        release = full_version[release_separator + 1:]
+        end = release_separator
+
+    if position < len(full_version) and full_version[position] == ":":
+        epoch = full_version[:position] or "0"
+        version = full_version[position + 1:end]
+    else:
+        epoch = "0"
+        version = full_version[:end]
+    return ParsedVersion(epoch=epoch, version=version, release=release)
+
+
+def _rpmvercmp(first: str, second: str) -> int:
+    """compare two version segments, port of rpmvercmp from libalpm
+
+    Args:
+        first (str): first version
+        second (str): second version
+
+    Returns:
+        int: 1 if first is newer, 0 if equal, -1 if second is newer
+    """
+    if first == second:
+        return 0
+
+    len_first = len(first)
+    len_second = len(second)
+    one = ptr1 = 0
+    two = ptr2 = 0
+
+    while one < len_first and two < len_second:
+        while one < len_first and first[one] not in _ALNUM:
+            one += 1
+        while two < len_second and second[two] not in _ALNUM:
+            two += 1
+
+        if not (one < len_first and two < len_second):
+            break
+
+        if (one - ptr1) != (two - ptr2):
+            return -1 if (one - ptr1) < (two - ptr2) else 1
+
+        ptr1 = one
+        ptr2 = two
+        is_number = first[ptr1] in _DIGITS
+        segment_chars = _DIGITS if is_number else _LETTERS
+        while ptr1 < len_first and first[ptr1] in segment_chars:
+            ptr1 += 1
+        while ptr2 < len_second and second[ptr2] in segment_chars:
+            ptr2 += 1
+
+        if two == ptr2:
+            return 1 if is_number else -1
+
+        segment_one = first[one:ptr1]
+        segment_two = second[two:ptr2]
+        if is_number:
+            segment_one = segment_one.lstrip("0")
+            segment_two = segment_two.lstrip("0")
+            if len(segment_one) != len(segment_two):
+                return 1 if len(segment_one) > len(segment_two) else -1
+
+        if segment_one != segment_two:
+            return 1 if segment_one > segment_two else -1
+
+        one = ptr1
+        two = ptr2
+
+    rest_one = first[one] if one < len_first else ""
+    rest_two = second[two] if two < len_second else ""
+    if not rest_one and not rest_two:
+        return 0
+
+    if (not rest_one and rest_two not in _LETTERS) or rest_one in _LETTERS:
+        return -1
+    return 1
+
+
+@lru_cache(maxsize=8192)
+def _vercmp_native(first: str, second: str) -> int:
+    if first == second:
+        return 0
+    parsed_first = parse_version(first)
+    parsed_second = parse_version(second)
+
+    result = _rpmvercmp(parsed_first.epoch, parsed_second.epoch)
+    if result != 0:
+        return result
+    result = _rpmvercmp(parsed_first.version, parsed_second.version)
+    if result == 0 and parsed_first.release is not None and parsed_second.release is not None:
+        result = _rpmvercmp(parsed_first.release, parsed_second.release)
+    return result
+
+
+def vercmp_external(first: str, second: str) -> int:
+    """compare versions using vercmp program shipped with pacman
+
+    Args:
+        first (str): first version
+        second (str): second version
+
+    Raises:
+        subprocess.CalledProcessError: if vercmp could not be run
+
+    Returns:
+        int: 1 if first is newer, 0 if equal, -1 if second is newer
+    """
+    vercmp_result = subprocess.run(["vercmp", first, second], capture_output=True, check=True)
+    return int(vercmp_result.stdout.decode(encoding="utf-8"))
+
+
+def set_cross_check(enabled: bool) -> None:
+    """enable or disable comparing every result with the external vercmp
+
+    Args:
+        enabled (bool): if cross-check should be performed
+    """
+    global _cross_check
+    _cross_check = enabled
+
+
+def vercmp(first: str, second: str) -> int:
+    """compare two package versions the same way pacman does
+
+    Args:
+        first (str): first version
+        second (str): second version
+
+    Returns:
+        int: 1 if first is newer, 0 if equal, -1 if second is newer
+    """
+    result = _vercmp_native(first, second)
+    if not _cross_check:
+        return result
+
+    try:
+        external = vercmp_external(first, second)
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        logger.warning("vercmp cross-check not available")
+        return result
+    if (external > 0) - (external < 0) != result:
+        logger.error("vercmp mismatch for %s and %s: %s instead of %s", first, second, result, external)
+        return (external > 0) - (external < 0)
+    return result
+
+
+version_key = cmp_to_key(vercmp)
+"""key function for sorting version strings the same way as pacman"""
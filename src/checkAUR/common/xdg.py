@@ -0,0 +1,55 @@
+"""Module for locations of files created by the program
+"""
+
+import os
+from pathlib import Path
+
+
+def _xdg_directory(variable: str, fallback: str) -> Path:
+    value = os.environ.get(variable)
+    if value and Path(value).is_absolute():
+        base = Path(value)
+    else:
+        base = Path.home() / fallback
+    return base / "checkAUR"
+
+
+def cache_path(file_name: str) -> Path:
+    """path to the file in user's cache directory, creating the directory if needed
+
+    Args:
+        file_name (str): name of the cache file
+
+    Returns:
+        Path: path inside $XDG_CACHE_HOME/checkAUR
+    """
+    directory = _xdg_directory("XDG_CACHE_HOME", ".cache")
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / file_name
+
+
+def state_path(file_name: str) -> Path:
+    """path to the file in user's state directory, creating the directory if needed
+
+    Args:
+        file_name (str): name of the state file
+
+    Returns:
+        Path: path inside $XDG_STATE_HOME/checkAUR
+    """
+    directory = _xdg_directory("XDG_STATE_HOME", ".local/state")
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / file_name
+
+
+def write_atomic(path: Path, content: str) -> None:
+    """write text file, so readers never see partially written content
+
+    Args:
+        path (Path): destination file
+        content (str): text to write
+    """
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temporary, path)
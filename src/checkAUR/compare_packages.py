@@ -1,27 +1,26 @@
 """Module printing result of the work
 """
 
-from typing import Optional
+from typing import Optional, Iterable, Mapping, Collection
 
-from checkAUR.common.package import Package, find_package
-from checkAUR.common.data_classes import TuplePackages
+from checkAUR.common.package import Package, PackageIndex
+from checkAUR.common.report import CheckReport, PackageUpdate, Failure, STAGE_FAILED
+from checkAUR.progress import REPO_TIMED_OUT
+from checkAUR.common.tracing import traced
 
 type PackageData = set[Package]
 
 
-def print_differences_packages(pulled_packages: PackageData,
-    invalid_packages: set[str]
-) -> None:
+def print_differences_packages(invalid_packages: Collection[str], result: Collection[str]) -> None:
     """print information on packages waiting for update and packages marked by checkrebuild
 
     Args:
-        pulled_packages (PackageData): list of packages updated by Git
-        invalid_packages (set[str]): list of packages marked by checkrebuild
+        invalid_packages (Collection[str]): packages marked by checkrebuild
+        result (Collection[str]): packages marked by checkrebuild, which don't wait for an update
     """
     if len(invalid_packages) == 0:
         return
 
-    result: tuple[str,...] = compare_invalid_packages(pulled_packages, invalid_packages)
     if len(result) == 0:
         print("All packages marked by checkrebuild are among the updated")
         return
@@ -31,49 +30,96 @@ def print_differences_packages(pulled_packages: PackageData,
         print(f"\t{data}")
 
 
-def compare_invalid_packages(pulled_packages: set[Package],
+def compare_invalid_packages(pulled_packages: PackageIndex,
     invalid_packages: set[str]
 ) -> tuple[str,...]:
     """compare invalid packages with pulled packages
 
     Args:
-        pulled_packages (set[str): updated packages
+        pulled_packages (PackageIndex): updated packages, looked up by name
         invalid_packages (set[str]): packages marked by checkrebuild
 
     Returns:
         tuple[str,...]: tuple of packages among the invalid packages, but not updated by Git
     """
-    sorter = set(package.name for package in pulled_packages)
     return tuple(sorted(package for package in invalid_packages \
-        if package not in sorter))
+        if package not in pulled_packages))
 
 
-def compare_packages(aur_packages: PackageData, pacman_packages: PackageData) -> PackageData:
-    """compare data from pacman and data found in AUR directory
+@traced(category="vercmp")
+def compare_packages(aur_packages: Iterable[Package], pacman_packages: PackageIndex) -> PackageIndex:
+    """compare data from pacman and data found in AUR directory.
+    Packages can come from a generator, e.g. iter_repo_packages, while AUR directory is still read
 
     Args:
-        aur_packages (PackageData): set of packages found in AUR directory
-        pacman_packages (PackageData): set of packages found in pacman
+        aur_packages (Iterable[Package]): packages found in AUR directory
+        pacman_packages (PackageIndex): index of packages found in pacman
 
     Returns:
-        PackageData: AUR packages ready for an update
+        PackageIndex: AUR packages ready for an update
     """
-    result: list[Package] = []
+    result = PackageIndex()
     for package in aur_packages:
-        check: Optional[Package] = find_package(package.name, pacman_packages)
+        check: Optional[Package] = pacman_packages.get(package.name)
         if check is None:
             continue
 
         if package > check:
-            result.append(package)
-    return set(result)
+            result.add(package)
+    return result
+
+
+def find_orphan_repos(repo_packages: Mapping[str, set[Package]], installed_packages: Iterable[Package]
+) -> set[str]:
+    """find repos none of whose packages is installed
+
+    Args:
+        repo_packages (Mapping[str, set[Package]]): packages of the repos, by folder name
+        installed_packages (Iterable[Package]): foreign packages installed in the system
+
+    Returns:
+        set[str]: folder names of the orphan repos
+    """
+    installed_names = {package.name for package in installed_packages}
+    return {folder for folder, packages in repo_packages.items() \
+        if not any(package.name in installed_names for package in packages)}
+
+
+def print_orphan_repos(orphan_repos: Collection[str]) -> None:
+    """print repos of packages which are not installed, so they can be removed
 
+    Args:
+        orphan_repos (Collection[str]): folder names of the orphan repos
+    """
+    if len(orphan_repos) == 0:
+        return
+    print(f"{len(orphan_repos)} repos are not used by any installed package and were not pulled:")
+    for folder in sorted(orphan_repos):
+        print(f"\t{folder}")
+
+
+def print_failures(failures: Collection[Failure]) -> None:
+    """print repos which were not pulled in time and stages which failed.
+    Other failures of repos are printed as they happen
 
-def print_pulled_packages(pulled_packages: PackageData) -> None:
+    Args:
+        failures (Collection[Failure]): repos and stages which did not finish
+    """
+    timed_out = sorted(failure.name for failure in failures if failure.kind == REPO_TIMED_OUT)
+    if timed_out:
+        print(f"{len(timed_out)} repos were not pulled in time:")
+        for name in timed_out:
+            print(f"\t{name}")
+    for failure in failures:
+        if failure.kind == STAGE_FAILED:
+            print(f"Stage {failure.name} failed, its results are skipped: {failure.detail}")
+
+
+def print_pulled_packages(pulled_packages: Collection[Package]) -> None:
     """print the set of pulled packages
 
     Args:
-        pulled_packages (PackageData): set of pulled packages
+        pulled_packages (Collection[Package]): pulled packages
     """
     count_pulled_packages = len(pulled_packages)
     print(f"{count_pulled_packages} packages were pulled.")
@@ -84,38 +130,34 @@ def print_pulled_packages(pulled_packages: PackageData) -> None:
         print(f"\t{package}")
 
 
-def print_awaiting_packages(compared_packages: PackageData, pacman_packages: PackageData) -> None:
+def print_awaiting_packages(awaiting_packages: Collection[PackageUpdate]) -> None:
     """print the set of packages awaiting an update
 
     Args:
-        compared_packages (PackageData): set of all awaiting packages
-        pacman_packages (PackageData): set of all manually installed packages
+        awaiting_packages (Collection[PackageUpdate]): all awaiting packages
     """
-    if len(compared_packages) == 0:
+    if len(awaiting_packages) == 0:
         print("No updates detected")
         return
     print("Following AUR packages await an update:")
-    for package in compared_packages:
-        original_package = find_package(package.name, pacman_packages)
-        print(f"\t{original_package} to {package.version}")
+    for package in awaiting_packages:
+        print(f"\t{package.name} {package.installed_version} to {package.available_version}")
 
 
-def show_results(operation_results: TuplePackages) -> bool:
+@traced()
+def show_results(report: CheckReport) -> bool:
     """show the user the results of all the operations
 
     Args:
-        operation_results (TuplePackages): NamedTuple containing all package tuples
+        report (CheckReport): results of the run, with packages compared
     
     Returns:
         bool: True if there packages to build in AUR directiory
     """
     # Todo: there should be sth for AUR package groups!
-    print_pulled_packages(operation_results.pulled_packages)
-    compared_packages = compare_packages(
-        operation_results.aur_packages,
-        operation_results.pacman_packages
-    )
-    print_differences_packages(compared_packages, operation_results.invalid_packages)
-    print_awaiting_packages(compared_packages, operation_results.pacman_packages)
-
-    return bool(len(compared_packages) != 0 or len(operation_results.invalid_packages) != 0)
+    print_pulled_packages(report.pulled_packages)
+    print_orphan_repos(report.orphan_repos)
+    print_differences_packages(report.invalid_packages or (), report.invalid_without_update)
+    print_awaiting_packages(report.awaiting_packages or ())
+
+    return report.has_work
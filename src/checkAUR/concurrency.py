@@ -0,0 +1,324 @@
+"""Module adapting number of fetches running at once to their latency and errors,
+with optional cap of fetch rate per remote host
+"""
+
+from typing import NamedTuple, Optional, Callable, Awaitable, Final
+from urllib.parse import urlsplit
+import asyncio
+import threading
+import time
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.deadlines import Deadline
+
+
+DECREASE_FACTOR: Final[float] = 0.5
+LATENCY_TOLERANCE: Final[float] = 2.0
+RECENT_WEIGHT: Final[float] = 0.3
+USUAL_WEIGHT: Final[float] = 0.05
+
+
+def remote_host(url: Optional[str]) -> str:
+    """find host of the remote, rate of fetches is limited per host
+
+    Args:
+        url (Optional[str]): URL of the remote, also in scp-like form 'user@host:path'
+
+    Returns:
+        str: name of the host, empty for local paths
+    """
+    if not url:
+        return ""
+    if "://" in url:
+        return urlsplit(url).hostname or ""
+    host, colon, _ = url.partition(":")
+    if colon and "/" not in host:
+        return host.rpartition("@")[2]
+    return ""
+
+
+class LimiterReport(NamedTuple):
+    """limits of fetches chosen during the pull
+
+    Attributes:
+        initial (int): number of fetches allowed at once at the start
+        minimum (int): lowest number the limit could drop to
+        maximum (int): highest number the limit could grow to
+        final (int): limit at the end of the pull
+        peak (int): most fetches which were running at once
+        decreases (int): how many times the limit was lowered
+        host_rate (Optional[float]): fetches started per second to one remote host, None if unlimited
+    """
+    initial: int
+    minimum: int
+    maximum: int
+    final: int
+    peak: int
+    decreases: int
+    host_rate: Optional[float] = None
+
+
+class AdaptiveLimit:
+    """Number of fetches allowed at once, changed by AIMD. Every fetch finished in usual time raises
+    the limit by 1/limit, so it grows by one per window of fetches. A failed fetch, or recent latency
+    growing over LATENCY_TOLERANCE times the usual one, multiplies it by DECREASE_FACTOR.
+    Fetches which were running when the limit was lowered do not change it again. Thread-safe
+
+    Attributes:
+        minimum (int): lowest number the limit can drop to
+        maximum (int): highest number the limit can grow to
+    """
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None):
+        """Number of fetches allowed at once
+
+        Args:
+            initial (int): limit at the start
+            minimum (int, optional): lowest number the limit can drop to. Defaults to 1.
+            maximum (Optional[int], optional): highest number the limit can grow to.
+                Defaults to None, meaning the initial limit.
+        """
+        maximum = initial if maximum is None else maximum
+        assert 0 < minimum <= initial <= maximum
+        self.minimum = minimum
+        self.maximum = maximum
+        self._initial = initial
+        self._limit = float(initial)
+        self._recent: Optional[float] = None
+        self._usual: Optional[float] = None
+        self._ignored = 0
+        self._decreases = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """number of fetches allowed at once now
+        """
+        with self._lock:
+            return int(self._limit)
+
+    def record(self, latency: Optional[float], in_flight: int) -> None:
+        """change the limit after a fetch finished
+
+        Args:
+            latency (Optional[float]): duration of the successful fetch in seconds, None if it failed
+            in_flight (int): number of fetches still running
+        """
+        with self._lock:
+            if self._ignored > 0:
+                self._ignored -= 1
+                return
+            congested = latency is None
+            if latency is not None:
+                self._recent = latency if self._recent is None \
+                    else RECENT_WEIGHT * latency + (1 - RECENT_WEIGHT) * self._recent
+                self._usual = latency if self._usual is None \
+                    else USUAL_WEIGHT * latency + (1 - USUAL_WEIGHT) * self._usual
+                congested = self._recent > LATENCY_TOLERANCE * self._usual
+            if not congested:
+                self._limit = min(float(self.maximum), self._limit + 1 / self._limit)
+                return
+            if self._limit > self.minimum:
+                self._limit = max(float(self.minimum), self._limit * DECREASE_FACTOR)
+                self._decreases += 1
+                logger.debug("Fetch %s, lowering limit of fetches at once to %s",
+                    "failed" if latency is None else "slowed down", int(self._limit))
+            # running fetches were started under the old limit, their results would lower it again
+            self._ignored = in_flight
+            self._recent = self._usual
+
+    def report(self, peak: int, host_rate: Optional[float] = None) -> LimiterReport:
+        """summary of the limit
+
+        Args:
+            peak (int): most fetches which were running at once
+            host_rate (Optional[float], optional): rate cap per remote host. Defaults to None.
+
+        Returns:
+            LimiterReport: initial, final and bounds of the limit
+        """
+        with self._lock:
+            return LimiterReport(self._initial, self.minimum, self.maximum, int(self._limit), peak,
+                self._decreases, host_rate)
+
+
+class TokenBucket:
+    """Token bucket letting operations start at the given rate, with bursts up to the capacity. Thread-safe
+    """
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """Token bucket
+
+        Args:
+            rate (float): tokens added per second
+            capacity (float, optional): most tokens kept for a burst. Defaults to 1.0.
+        """
+        assert rate > 0 and capacity >= 1.0
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """take one token, possibly ahead of time
+
+        Returns:
+            float: seconds to wait before the token is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+
+
+class FetchLimiter:
+    """Limiter of fetches running at once, by the adaptive limit, and of fetches started
+    per second to one remote host. Used by threads with limited(), by coroutines with limited_async()
+    """
+    def __init__(self, limit: AdaptiveLimit, host_rate: Optional[float] = None):
+        """Limiter of fetches
+
+        Args:
+            limit (AdaptiveLimit): number of fetches allowed at once
+            host_rate (Optional[float], optional): fetches started per second to one remote host.
+                Defaults to None, meaning unlimited.
+        """
+        self._limit = limit
+        self._host_rate = host_rate
+        self._buckets: dict[str, TokenBucket] = {}
+        self._in_flight = 0
+        self._peak = 0
+        self._condition = threading.Condition()
+        self._async_condition: Optional[asyncio.Condition] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def maximum(self) -> int:
+        """highest number of fetches which can run at once
+        """
+        return self._limit.maximum
+
+    def _reserve(self, host: str) -> float:
+        if self._host_rate is None:
+            return 0.0
+        with self._condition:
+            bucket = self._buckets.setdefault(host, TokenBucket(self._host_rate))
+        return bucket.reserve()
+
+    def _start(self) -> None:
+        self._in_flight += 1
+        self._peak = max(self._peak, self._in_flight)
+
+    def _finish(self, latency: Optional[float]) -> None:
+        self._in_flight -= 1
+        self._limit.record(latency, self._in_flight)
+
+    def _can_start(self) -> bool:
+        return self._in_flight < self._limit.limit
+
+    @staticmethod
+    def _check_delay(delay: float, deadline: Deadline) -> None:
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            raise TimeoutError("Deadline passed before the fetch could start")
+
+    def limited(self, operation: Callable[[float], bool], host: str,
+        deadline: Deadline
+    ) -> Callable[[float], bool]:
+        """wrap fetch, so it waits for its turn
+
+        Args:
+            operation (Callable[[float], bool]): fetch getting its timeout, returning True if successful.
+                It raises TimeoutError if it did not finish in time
+            host (str): host of the remote
+            deadline (Deadline): deadline of the whole pull, waiting ends with TimeoutError after it
+
+        Returns:
+            Callable[[float], bool]: fetch with the same arguments and result
+        """
+        def run(timeout: float) -> bool:
+            delay = self._reserve(host)
+            if delay > 0:
+                self._check_delay(delay, deadline)
+                time.sleep(delay)
+            with self._condition:
+                if not self._condition.wait_for(self._can_start, deadline.remaining()):
+                    raise TimeoutError("Deadline passed before the fetch could start")
+                self._start()
+            latency: Optional[float] = None
+            start = time.monotonic()
+            try:
+                if operation(deadline.clamp(timeout)):
+                    latency = time.monotonic() - start
+                    return True
+                return False
+            finally:
+                with self._condition:
+                    self._finish(latency)
+                    self._condition.notify_all()
+        return run
+
+    def limited_async(self, operation: Callable[[float], Awaitable[bool]], host: str,
+        deadline: Deadline
+    ) -> Callable[[float], Awaitable[bool]]:
+        """wrap fetch coroutine function, so it waits for its turn
+
+        Args:
+            operation (Callable[[float], Awaitable[bool]]): fetch getting its timeout, returning True
+                if successful. It raises TimeoutError if it did not finish in time
+            host (str): host of the remote
+            deadline (Deadline): deadline of the whole pull, waiting ends with TimeoutError after it
+
+        Returns:
+            Callable[[float], Awaitable[bool]]: fetch with the same arguments and result
+        """
+        async def run(timeout: float) -> bool:
+            # condition belongs to the event loop, the limiter may outlive it
+            if self._async_condition is None or self._async_loop is not asyncio.get_running_loop():
+                self._async_condition = asyncio.Condition()
+                self._async_loop = asyncio.get_running_loop()
+            condition = self._async_condition
+            delay = self._reserve(host)
+            if delay > 0:
+                self._check_delay(delay, deadline)
+                await asyncio.sleep(delay)
+            async with condition:
+                await asyncio.wait_for(condition.wait_for(self._can_start), deadline.remaining())
+                self._start()
+            latency: Optional[float] = None
+            start = time.monotonic()
+            try:
+                if await operation(deadline.clamp(timeout)):
+                    latency = time.monotonic() - start
+                    return True
+                return False
+            finally:
+                self._finish(latency)
+                # the limit may have grown by more than one fetch
+                async with condition:
+                    condition.notify_all()
+        return run
+
+    def report(self) -> LimiterReport:
+        """summary of the limits chosen during the pull
+
+        Returns:
+            LimiterReport: initial, final and bounds of the limit, most fetches at once and the rate cap
+        """
+        return self._limit.report(self._peak, self._host_rate)
+
+
+def print_limiter_report(report: LimiterReport) -> None:
+    """print limits chosen during the pull, if anything was fetched
+
+    Args:
+        report (LimiterReport): limits of fetches chosen during the pull
+    """
+    if report.peak == 0:
+        return
+    message = f"Fetched up to {report.peak} repos at once, limit {report.initial} -> {report.final}" \
+        f" (between {report.minimum} and {report.maximum}, lowered {report.decreases} times)"
+    if report.host_rate is not None:
+        message += f", at most {report.host_rate:g} fetches per second to one host"
+    print(message)
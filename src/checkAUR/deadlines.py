@@ -0,0 +1,198 @@
+"""Module bounding time spent on repos: per-command timeouts, global deadline and retries with backoff
+"""
+
+from typing import NamedTuple, Optional, Callable, Awaitable, Final
+import asyncio
+import random
+import threading
+import time
+
+from checkAUR.common.custom_logging import logger
+
+
+MAX_BACKOFF: Final[float] = 30.0
+
+
+class PullLimits(NamedTuple):
+    """limits of pulling repos. Every git command is killed after the timeout, a failed or timed out fetch
+    is repeated after a backoff delay. Once the deadline passes, repos which did not start are cancelled,
+    running ones have their git commands cut at the deadline. Both are reported as timed out
+
+    Attributes:
+        timeout (float): maximal time of a single git command in seconds
+        deadline (Optional[float]): maximal time of pulling all repos in seconds, None if unlimited
+        retries (int): number of repeated attempts after failed or timed out fetch
+        backoff (float): base of the exponential delay between attempts in seconds
+    """
+    timeout: float = 120.0
+    deadline: Optional[float] = None
+    retries: int = 2
+    backoff: float = 1.0
+
+
+class Deadline:
+    """Point in time after which no more work should start, timeouts of the work are clamped to it
+    """
+    def __init__(self, seconds: Optional[float] = None):
+        """Point in time after which no more work should start
+
+        Args:
+            seconds (Optional[float], optional): time from now, None if there is no deadline. Defaults to None.
+        """
+        self._end: Optional[float] = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """time left until the deadline
+
+        Returns:
+            Optional[float]: seconds left, never negative. None if there is no deadline
+        """
+        if self._end is None:
+            return None
+        return max(0.0, self._end - time.monotonic())
+
+    def expired(self) -> bool:
+        """check if the deadline has passed
+
+        Returns:
+            bool: True if there is no time left
+        """
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0.0
+
+    def clamp(self, timeout: float) -> float:
+        """shorten timeout, so it does not exceed the deadline
+
+        Args:
+            timeout (float): timeout of the operation in seconds
+
+        Returns:
+            float: timeout ending no later than the deadline
+        """
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+
+class PullSummary:
+    """Thread-safe collection of repos which could not be pulled in time
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timed_out: set[str] = set()
+
+    def add_timed_out(self, name: str) -> None:
+        """record repo which timed out or was cancelled by the deadline
+
+        Args:
+            name (str): name of the repo's folder
+        """
+        with self._lock:
+            self._timed_out.add(name)
+
+    @property
+    def timed_out(self) -> set[str]:
+        """names of repos which timed out or were cancelled by the deadline
+        """
+        with self._lock:
+            return set(self._timed_out)
+
+
+def backoff_delay(attempt: int, base: float, cap: float = MAX_BACKOFF) -> float:
+    """delay before the next attempt, exponential with full jitter,
+    so repos failing together do not retry together
+
+    Args:
+        attempt (int): number of the failed attempt, starting from 0
+        base (float): delay after the first attempt in seconds
+        cap (float, optional): maximal delay in seconds. Defaults to MAX_BACKOFF.
+
+    Returns:
+        float: delay in seconds
+    """
+    return random.uniform(0.0, min(cap, base * 2 ** attempt))
+
+
+def _next_delay(attempt: int, limits: PullLimits, deadline: Deadline, name: str) -> Optional[float]:
+    if attempt >= limits.retries:
+        return None
+    delay = backoff_delay(attempt, limits.backoff)
+    remaining = deadline.remaining()
+    if remaining is not None and delay >= remaining:
+        raise TimeoutError(f"Deadline passed before {name} finished")
+    return delay
+
+
+def call_with_retries(operation: Callable[[float], bool], limits: PullLimits, deadline: Deadline,
+    name: str
+) -> bool:
+    """run operation until it succeeds, the retries are exhausted or the deadline passes
+
+    Args:
+        operation (Callable[[float], bool]): operation getting its timeout, returning True if successful.
+            It raises TimeoutError if it did not finish in time
+        limits (PullLimits): timeout and retries
+        deadline (Deadline): deadline of the whole pull
+        name (str): name used in the log
+
+    Raises:
+        TimeoutError: if the last attempt timed out or there was no time for any attempt
+
+    Returns:
+        bool: True if operation succeeded, False if all attempts failed
+    """
+    attempt = 0
+    while True:
+        if deadline.expired():
+            raise TimeoutError(f"Deadline passed before {name} finished")
+        timed_out = False
+        try:
+            if operation(deadline.clamp(limits.timeout)):
+                return True
+        except TimeoutError:
+            timed_out = True
+        delay = _next_delay(attempt, limits, deadline, name)
+        if delay is None:
+            if timed_out:
+                raise TimeoutError(f"{name} timed out")
+            return False
+        logger.debug("Attempt %s of %s failed, retrying in %.2f s", attempt + 1, name, delay)
+        time.sleep(delay)
+        attempt += 1
+
+
+async def call_with_retries_async(operation: Callable[[float], Awaitable[bool]], limits: PullLimits,
+    deadline: Deadline, name: str
+) -> bool:
+    """run coroutine until it succeeds, the retries are exhausted or the deadline passes
+
+    Args:
+        operation (Callable[[float], Awaitable[bool]]): coroutine function getting its timeout,
+            returning True if successful. It raises TimeoutError if it did not finish in time
+        limits (PullLimits): timeout and retries
+        deadline (Deadline): deadline of the whole pull
+        name (str): name used in the log
+
+    Raises:
+        TimeoutError: if the last attempt timed out or there was no time for any attempt
+
+    Returns:
+        bool: True if operation succeeded, False if all attempts failed
+    """
+    attempt = 0
+    while True:
+        if deadline.expired():
+            raise TimeoutError(f"Deadline passed before {name} finished")
+        timed_out = False
+        try:
+            if await operation(deadline.clamp(limits.timeout)):
+                return True
+        except TimeoutError:
+            timed_out = True
+        delay = _next_delay(attempt, limits, deadline, name)
+        if delay is None:
+            if timed_out:
+                raise TimeoutError(f"{name} timed out")
+            return False
+        logger.debug("Attempt %s of %s failed, retrying in %.2f s", attempt + 1, name, delay)
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,175 @@
+"""Module reading dynamic sections of ELF files straight from the files, without starting ldd
+"""
+
+from typing import NamedTuple, Optional, Final, BinaryIO
+from pathlib import Path
+import struct
+
+
+ELF_MAGIC: Final[bytes] = b"\x7fELF"
+_ELFCLASS32: Final[int] = 1
+_ELFCLASS64: Final[int] = 2
+_ELFDATA2MSB: Final[int] = 2
+_ET_EXEC: Final[int] = 2
+_ET_DYN: Final[int] = 3
+_PT_LOAD: Final[int] = 1
+_PT_DYNAMIC: Final[int] = 2
+_DT_NULL: Final[int] = 0
+_DT_NEEDED: Final[int] = 1
+_DT_STRTAB: Final[int] = 5
+_DT_STRSZ: Final[int] = 10
+_DT_RPATH: Final[int] = 15
+_DT_RUNPATH: Final[int] = 29
+_MAX_TABLE_SIZE: Final[int] = 16 * 1024 * 1024
+
+# formats of: header after e_ident, program header, dynamic entry
+_FORMATS: Final[dict[int, tuple[str, str, str]]] = {
+    _ELFCLASS32: ("HHIIIIIHHHHHH", "IIIIIIII", "iI"),
+    _ELFCLASS64: ("HHIQQQIHHHHHH", "IIQQQQQQ", "qQ"),
+}
+
+
+class ElfKind(NamedTuple):
+    """kind of ELF file, the dynamic linker loads only libraries of the same kind
+
+    Attributes:
+        elf_class (int): 1 for 32-bit, 2 for 64-bit
+        machine (int): e_machine, architecture of the file
+    """
+    elf_class: int
+    machine: int
+
+
+class DynamicInfo(NamedTuple):
+    """dependencies of dynamically linked ELF file
+
+    Attributes:
+        kind (ElfKind): class and architecture of the file
+        needed (tuple[str,...]): DT_NEEDED entries, sonames of required libraries
+        rpath (tuple[str,...]): DT_RPATH directories, used only if there is no DT_RUNPATH
+        runpath (tuple[str,...]): DT_RUNPATH directories
+    """
+    kind: ElfKind
+    needed: tuple[str,...] = ()
+    rpath: tuple[str,...] = ()
+    runpath: tuple[str,...] = ()
+
+
+def _read_at(file: BinaryIO, offset: int, size: int) -> bytes:
+    file.seek(offset)
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("ELF file is truncated")
+    return data
+
+
+def _read_identification(file: BinaryIO) -> Optional[tuple[str, int, int, int]]:
+    ident = file.read(20)
+    if len(ident) < 20 or ident[:4] != ELF_MAGIC or ident[4] not in _FORMATS:
+        return None
+    order = ">" if ident[5] == _ELFDATA2MSB else "<"
+    elf_type, machine = struct.unpack(f"{order}HH", ident[16:20])
+    return order, ident[4], elf_type, machine
+
+
+def read_elf_kind(path: Path) -> Optional[ElfKind]:
+    """read class and architecture of ELF file from its first bytes
+
+    Args:
+        path (Path): path to the file
+
+    Returns:
+        Optional[ElfKind]: kind of the file, None if it's not an ELF executable or shared library
+    """
+    try:
+        with open(path, "rb") as file:
+            identification = _read_identification(file)
+    except OSError:
+        return None
+    if identification is None or identification[2] not in (_ET_EXEC, _ET_DYN):
+        return None
+    return ElfKind(identification[1], identification[3])
+
+
+def _string(table: bytes, offset: int) -> str:
+    if offset >= len(table):
+        raise ValueError("ELF string out of the table")
+    end = table.find(b"\0", offset)
+    return table[offset:end if end >= 0 else len(table)].decode(encoding="utf-8", errors="surrogateescape")
+
+
+def read_dynamic_info(path: Path) -> Optional[DynamicInfo]:
+    """read required libraries and search paths from the dynamic section of ELF file
+
+    Args:
+        path (Path): path to the file
+
+    Returns:
+        Optional[DynamicInfo]: dependencies of the file, None if it's not a dynamically linked
+            ELF executable or shared library, or it could not be read
+    """
+    try:
+        with open(path, "rb") as file:
+            return _read_dynamic_info(file)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _read_dynamic_info(file: BinaryIO) -> Optional[DynamicInfo]:
+    identification = _read_identification(file)
+    if identification is None:
+        return None
+    order, elf_class, elf_type, machine = identification
+    if elf_type not in (_ET_EXEC, _ET_DYN):
+        return None
+    header_format, segment_format, entry_format = (f"{order}{value}" for value in _FORMATS[elf_class])
+    header = struct.unpack(header_format, _read_at(file, 16, struct.calcsize(header_format)))
+    phoff, phentsize, phnum = header[4], header[8], header[9]
+    segment_size = struct.calcsize(segment_format)
+    if phentsize < segment_size:
+        return None
+
+    loads: list[tuple[int, int, int]] = []
+    dynamic: Optional[tuple[int, int]] = None
+    table = _read_at(file, phoff, phentsize * phnum)
+    for number in range(phnum):
+        fields = struct.unpack_from(segment_format, table, number * phentsize)
+        if elf_class == _ELFCLASS64:
+            p_type, _, p_offset, p_vaddr, _, p_filesz, _, _ = fields
+        else:
+            p_type, p_offset, p_vaddr, _, p_filesz, _, _, _ = fields
+        if p_type == _PT_LOAD:
+            loads.append((p_vaddr, p_filesz, p_offset))
+        elif p_type == _PT_DYNAMIC:
+            dynamic = (p_offset, p_filesz)
+    if dynamic is None or dynamic[1] > _MAX_TABLE_SIZE:
+        return None
+
+    entries: list[tuple[int, int]] = []
+    dynamic_offset, dynamic_size = dynamic
+    entry_size = struct.calcsize(entry_format)
+    for tag, value in struct.iter_unpack(entry_format,
+        _read_at(file, dynamic_offset, dynamic_size - dynamic_size % entry_size)):
+        if tag == _DT_NULL:
+            break
+        entries.append((tag, value))
+    values = dict(entries)
+    if _DT_STRTAB not in values or values.get(_DT_STRSZ, _MAX_TABLE_SIZE + 1) > _MAX_TABLE_SIZE:
+        return None
+    # string table is given by its address in memory, loadable segments map it to the file
+    address = values[_DT_STRTAB]
+    offset = next((p_offset + address - p_vaddr for p_vaddr, p_filesz, p_offset in loads \
+        if p_vaddr <= address < p_vaddr + p_filesz), None)
+    if offset is None:
+        return None
+    strings = _read_at(file, offset, values[_DT_STRSZ])
+
+    def paths(path_tag: int) -> tuple[str,...]:
+        return tuple(directory for tag, value in entries if tag == path_tag \
+            for directory in _string(strings, value).split(":") if directory)
+
+    return DynamicInfo(ElfKind(elf_class, machine),
+        needed=tuple(_string(strings, value) for tag, value in entries if tag == _DT_NEEDED),
+        rpath=paths(_DT_RPATH),
+        runpath=paths(_DT_RUNPATH),
+    )
@@ -0,0 +1,295 @@
+"""Module reading Git references straight from the repository files, without starting git
+"""
+
+from typing import Optional, Final
+from pathlib import Path
+import re
+
+
+_SHA_PATTERN: Final[re.Pattern] = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+_SECTION_PATTERN: Final[re.Pattern] = re.compile(r'^\[\s*([^\s\]"]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+_MAX_SYMREF_DEPTH: Final[int] = 5
+
+type GitConfig = dict[str, dict[str, str]]
+
+
+def find_git_dir(repo_path: Path) -> Optional[Path]:
+    """find git directory of the repository
+
+    Args:
+        repo_path (Path): path to the working tree or to the bare repository
+
+    Returns:
+        Optional[Path]: path to the git directory, None if there is no repository
+    """
+    dot_git = repo_path / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    if dot_git.is_file():
+        try:
+            content = dot_git.read_text(encoding="utf-8").strip()
+        except (OSError, UnicodeError):
+            return None
+        if not content.startswith("gitdir:"):
+            return None
+        git_dir = Path(content[len("gitdir:"):].strip())
+        if not git_dir.is_absolute():
+            git_dir = repo_path / git_dir
+        return git_dir if git_dir.is_dir() else None
+    if (repo_path / "HEAD").is_file() and (repo_path / "objects").is_dir():
+        return repo_path
+    return None
+
+
+def _common_dir(git_dir: Path) -> Path:
+    common_file = git_dir / "commondir"
+    if not common_file.is_file():
+        return git_dir
+    common = Path(common_file.read_text(encoding="utf-8").strip())
+    return common if common.is_absolute() else git_dir / common
+
+
+def read_config(git_dir: Path) -> GitConfig:
+    """read repository's config file. Section names are lower case,
+    subsections keep their case, e.g. 'remote "origin"' becomes 'remote.origin'
+
+    Args:
+        git_dir (Path): path to the git directory
+
+    Returns:
+        GitConfig: values of the config, {section: {key: value}}
+    """
+    result: GitConfig = {}
+    try:
+        content = (_common_dir(git_dir) / "config").read_text(encoding="utf-8")
+    except (OSError, UnicodeError):
+        return result
+
+    section: Optional[dict[str, str]] = None
+    for raw_line in content.splitlines():
+        line = raw_line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            found = _SECTION_PATTERN.match(line)
+            if found is None:
+                section = None
+                continue
+            name = found[1].lower()
+            if found[2] is not None:
+                name += "." + found[2].replace('\\"', '"').replace("\\\\", "\\")
+            section = result.setdefault(name, {})
+            continue
+        if section is None:
+            continue
+        key, separator, value = line.partition("=")
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        section[key.strip().lower()] = value if separator else "true"
+    return result
+
+
+def is_bare(git_dir: Path, config: Optional[GitConfig] = None) -> bool:
+    """check if repository is bare
+
+    Args:
+        git_dir (Path): path to the git directory
+        config (Optional[GitConfig], optional): already read config. Defaults to None.
+
+    Returns:
+        bool: True if the repository has no working tree
+    """
+    config = read_config(git_dir) if config is None else config
+    return config.get("core", {}).get("bare", "false").lower() in ("true", "yes", "on", "1")
+
+
+def has_remote(git_dir: Path, remote: str = "origin", config: Optional[GitConfig] = None) -> bool:
+    """check if repository has the given remote configured
+
+    Args:
+        git_dir (Path): path to the git directory
+        remote (str, optional): name of the remote. Defaults to "origin".
+        config (Optional[GitConfig], optional): already read config. Defaults to None.
+
+    Returns:
+        bool: True if the remote has an URL
+    """
+    config = read_config(git_dir) if config is None else config
+    return bool(config.get(f"remote.{remote}", {}).get("url"))
+
+
+def remote_url(git_dir: Path, remote: str = "origin", config: Optional[GitConfig] = None) -> Optional[str]:
+    """read URL of the given remote
+
+    Args:
+        git_dir (Path): path to the git directory
+        remote (str, optional): name of the remote. Defaults to "origin".
+        config (Optional[GitConfig], optional): already read config. Defaults to None.
+
+    Returns:
+        Optional[str]: URL of the remote, None if it has none
+    """
+    config = read_config(git_dir) if config is None else config
+    return config.get(f"remote.{remote}", {}).get("url") or None
+
+
+def _read_packed_refs(git_dir: Path) -> dict[str, str]:
+    result: dict[str, str] = {}
+    try:
+        content = (_common_dir(git_dir) / "packed-refs").read_text(encoding="utf-8")
+    except (OSError, UnicodeError):
+        return result
+    for line in content.splitlines():
+        if not line or line[0] in "#^":
+            continue
+        sha, _, ref = line.partition(" ")
+        if _SHA_PATTERN.match(sha):
+            result[ref.strip()] = sha
+    return result
+
+
+def _read_loose_ref(git_dir: Path, ref: str) -> Optional[str]:
+    base = git_dir if ref == "HEAD" or not ref.startswith("refs/") else _common_dir(git_dir)
+    for directory in dict.fromkeys((git_dir, base)):
+        try:
+            return (directory / ref).read_text(encoding="utf-8").strip()
+        except (OSError, UnicodeError):
+            continue
+    return None
+
+
+def read_ref(git_dir: Path, ref: str) -> Optional[str]:
+    """resolve reference to commit hash, following symbolic references
+
+    Args:
+        git_dir (Path): path to the git directory
+        ref (str): full name of the reference, e.g. "HEAD" or "refs/heads/master"
+
+    Returns:
+        Optional[str]: hash the reference points to, None if it does not exist
+    """
+    packed_refs: Optional[dict[str, str]] = None
+    for _ in range(_MAX_SYMREF_DEPTH):
+        content = _read_loose_ref(git_dir, ref)
+        if content is None:
+            if packed_refs is None:
+                packed_refs = _read_packed_refs(git_dir)
+            return packed_refs.get(ref)
+        if content.startswith("ref:"):
+            ref = content[len("ref:"):].strip()
+            continue
+        return content if _SHA_PATTERN.match(content) else None
+    return None
+
+
+def read_head(git_dir: Path) -> Optional[str]:
+    """resolve HEAD to commit hash
+
+    Args:
+        git_dir (Path): path to the git directory
+
+    Returns:
+        Optional[str]: hash of the current commit, None if it could not be resolved
+    """
+    return read_ref(git_dir, "HEAD")
+
+
+def head_branch(git_dir: Path) -> Optional[str]:
+    """find the branch HEAD points to
+
+    Args:
+        git_dir (Path): path to the git directory
+
+    Returns:
+        Optional[str]: full name of the branch, None if HEAD is detached
+    """
+    content = _read_loose_ref(git_dir, "HEAD")
+    if content is None or not content.startswith("ref:"):
+        return None
+    return content[len("ref:"):].strip()
+
+
+def upstream_branch(git_dir: Path, config: Optional[GitConfig] = None) -> Optional[tuple[str, str]]:
+    """find remote and remote branch the current branch is tracking
+
+    Args:
+        git_dir (Path): path to the git directory
+        config (Optional[GitConfig], optional): already read config. Defaults to None.
+
+    Returns:
+        Optional[tuple[str, str]]: name of the remote and full name of the branch on the remote,
+            e.g. ("origin", "refs/heads/master")
+    """
+    branch = head_branch(git_dir)
+    if branch is None or not branch.startswith("refs/heads/"):
+        return None
+    config = read_config(git_dir) if config is None else config
+    branch_config = config.get(f"branch.{branch[len('refs/heads/'):]}", {})
+    remote = branch_config.get("remote")
+    merge = branch_config.get("merge")
+    if not remote or not merge or not merge.startswith("refs/heads/"):
+        return None
+    return remote, merge
+
+
+def upstream_ref(git_dir: Path, config: Optional[GitConfig] = None) -> Optional[str]:
+    """find remote-tracking reference of the current branch
+
+    Args:
+        git_dir (Path): path to the git directory
+        config (Optional[GitConfig], optional): already read config. Defaults to None.
+
+    Returns:
+        Optional[str]: full name of the upstream, e.g. "refs/remotes/origin/master"
+    """
+    upstream = upstream_branch(git_dir, config)
+    if upstream is None:
+        return None
+    remote, merge = upstream
+    if remote == ".":
+        return merge
+    return f"refs/remotes/{remote}/{merge[len('refs/heads/'):]}"
+
+
+def read_fetch_head(git_dir: Path) -> Optional[str]:
+    """read hash fetched for merging by the last fetch
+
+    Args:
+        git_dir (Path): path to the git directory
+
+    Returns:
+        Optional[str]: hash of the fetched commit, None if there is none
+    """
+    try:
+        content = (git_dir / "FETCH_HEAD").read_text(encoding="utf-8")
+    except (OSError, UnicodeError):
+        return None
+    first_sha: Optional[str] = None
+    for line in content.splitlines():
+        fields = line.split("\t")
+        if not _SHA_PATTERN.match(fields[0]):
+            continue
+        if len(fields) > 1 and fields[1] != "not-for-merge":
+            return fields[0]
+        first_sha = first_sha or fields[0]
+    return first_sha
+
+
+def read_upstream(git_dir: Path, config: Optional[GitConfig] = None) -> Optional[str]:
+    """resolve upstream of the current branch to commit hash, falling back to FETCH_HEAD
+
+    Args:
+        git_dir (Path): path to the git directory
+        config (Optional[GitConfig], optional): already read config. Defaults to None.
+
+    Returns:
+        Optional[str]: hash of the upstream commit, None if it could not be resolved
+    """
+    ref = upstream_ref(git_dir, config)
+    if ref is not None:
+        result = read_ref(git_dir, ref)
+        if result is not None:
+            return result
+    return read_fetch_head(git_dir)
+
@@ -0,0 +1,238 @@
+"""Module finding foreign packages left behind by an interpreter update: modules installed in versioned
+directories of Python, Perl or Ruby which the installed interpreter doesn't use anymore, and native Node modules
+built for another ABI. Paths of foreign packages are indexed once, the interpreters are checked per directory
+"""
+
+from typing import NamedTuple, Optional, Final
+from pathlib import Path
+import json
+import mmap
+import re
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.data_classes import PACMAN_DB_PATH
+from checkAUR.common.xdg import cache_path, write_atomic
+from checkAUR.common.tracing import traced
+from checkAUR.pacman import read_foreign_entries, read_entry_files, database_state
+
+
+CACHE_FILE: Final[str] = "interpreter_abi.json"
+CACHE_VERSION: Final[int] = 1
+NODE_MODULES: Final[str] = "usr/lib/node_modules/"
+NODE_VERSION_HEADER: Final[str] = "usr/include/node/node_version.h"
+_NODE_MODULE_VERSION: Final[re.Pattern] = re.compile(r"#define\s+NODE_MODULE_VERSION\s+(\d+)")
+# N-API modules register with napi_register_module_v1 and work with every version of Node
+_NODE_REGISTER: Final[re.Pattern] = re.compile(rb"node_register_module_v(\d+)")
+
+
+class Interpreter(NamedTuple):
+    """interpreter keeping modules in directories named after its version
+
+    Attributes:
+        name (str): name of the interpreter
+        pattern (re.Pattern): matches paths of the modules, the group is the version
+        marker (str): file shipped by the interpreter of that version, relative to the root directory
+    """
+    name: str
+    pattern: re.Pattern
+    marker: str
+
+
+INTERPRETERS: Final[tuple[Interpreter,...]] = (
+    Interpreter("Python", re.compile(r"usr/lib/python(\d+\.\d+)/."), "usr/lib/python{}/os.py"),
+    Interpreter("Perl", re.compile(r"usr/lib/perl5/(\d+\.\d+)/."), "usr/lib/perl5/{}/core_perl/strict.pm"),
+    Interpreter("Ruby", re.compile(r"usr/lib/ruby/(?:gems/|vendor_ruby/)?(\d+\.\d+\.\d+)/."),
+        "usr/lib/ruby/{}/rubygems.rb"),
+)
+
+
+class PackagePaths(NamedTuple):
+    """paths of the package depending on the interpreter version, kept between runs
+
+    Attributes:
+        key (str): version and install date of the package, see LocalEntry
+        directories (list[tuple[str, str]]): names and versions of interpreters the package installs modules for
+        node_modules (list[str]): native Node modules of the package, relative to the root directory
+    """
+    key: str
+    directories: list[tuple[str, str]]
+    node_modules: list[str]
+
+
+def index_package(key: str, files: list[str]) -> PackagePaths:
+    """find paths of the package depending on the interpreter version
+
+    Args:
+        key (str): version and install date of the package
+        files (list[str]): paths of the package's files, relative to the root directory
+
+    Returns:
+        PackagePaths: versioned directories and native Node modules of the package
+    """
+    directories: set[tuple[str, str]] = set()
+    node_modules: list[str] = []
+    for file in files:
+        if file.startswith(NODE_MODULES):
+            if file.endswith(".node"):
+                node_modules.append(file)
+            continue
+        for interpreter in INTERPRETERS:
+            found = interpreter.pattern.match(file)
+            if found is not None:
+                directories.add((interpreter.name, found[1]))
+                break
+    return PackagePaths(key, sorted(directories), node_modules)
+
+
+def node_module_version(root: Path = Path("/")) -> Optional[int]:
+    """read ABI version of the installed Node from its headers
+
+    Args:
+        root (Path, optional): root directory of the system. Defaults to Path("/").
+
+    Returns:
+        Optional[int]: NODE_MODULE_VERSION, None if Node headers are not installed
+    """
+    try:
+        found = _NODE_MODULE_VERSION.search((root / NODE_VERSION_HEADER).read_text(encoding="utf-8"))
+    except (OSError, UnicodeError):
+        return None
+    return None if found is None else int(found[1])
+
+
+def read_module_abi(path: Path) -> Optional[int]:
+    """read ABI version which native Node module was built for
+
+    Args:
+        path (Path): path to the module
+
+    Returns:
+        Optional[int]: NODE_MODULE_VERSION of the module, None if it uses N-API or could not be read
+    """
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            found = _NODE_REGISTER.search(content)
+            return None if found is None else int(bytes(found[1]))
+    except (OSError, ValueError):
+        return None
+
+
+def find_stranded(paths: dict[str, PackagePaths], root: Path = Path("/")) -> dict[str, list[str]]:
+    """find packages with modules which the installed interpreters don't load
+
+    Args:
+        paths (dict[str, PackagePaths]): indexed paths by names of the packages
+        root (Path, optional): root directory of the system. Defaults to Path("/").
+
+    Returns:
+        dict[str, list[str]]: reasons by names of the packages, only for packages requiring rebuild
+    """
+    interpreters = {interpreter.name: interpreter for interpreter in INTERPRETERS}
+    packages_by_directory: dict[tuple[str, str], list[str]] = {}
+    for name, package_paths in paths.items():
+        for directory in package_paths.directories:
+            packages_by_directory.setdefault(directory, []).append(name)
+
+    result: dict[str, list[str]] = {}
+    for (interpreter_name, version), names in packages_by_directory.items():
+        if (root / interpreters[interpreter_name].marker.format(version)).is_file():
+            continue
+        for name in names:
+            result.setdefault(name, []).append(f"{interpreter_name} {version} is not installed")
+
+    node_version: Optional[int] = None
+    if any(package_paths.node_modules for package_paths in paths.values()):
+        node_version = node_module_version(root)
+        if node_version is None:
+            logger.debug("Node headers not found, native Node modules won't be checked")
+    if node_version is not None:
+        for name, package_paths in paths.items():
+            for module in package_paths.node_modules:
+                module_version = read_module_abi(root / module)
+                if module_version is not None and module_version != node_version:
+                    result.setdefault(name, []).append(
+                        f"{module} was built for Node ABI {module_version}, installed is {node_version}")
+    return result
+
+
+def _load_cache(db_path: Path, root: Path) -> Optional[dict]:
+    try:
+        with open(cache_path(CACHE_FILE), "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION \
+        or data.get("db_path") != db_path.as_posix() or data.get("root") != root.as_posix():
+        return None
+    try:
+        data["packages"] = {name: PackagePaths(key, [(interpreter, version) for interpreter, version in directories],
+            node_modules) for name, (key, directories, node_modules) in data["packages"].items()}
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    return data
+
+
+def _save_cache(db_path: Path, root: Path, db_key: list[int], paths: dict[str, PackagePaths]) -> None:
+    data = {
+        "version": CACHE_VERSION,
+        "db_path": db_path.as_posix(),
+        "root": root.as_posix(),
+        "db_key": db_key,
+        "packages": {name: list(package_paths) for name, package_paths in paths.items()},
+    }
+    try:
+        write_atomic(cache_path(CACHE_FILE), json.dumps(data))
+    except OSError:
+        logger.warning("Could not save interpreter ABI cache")
+
+
+def index_foreign_packages(db_path: Path = PACMAN_DB_PATH, root: Path = Path("/")) -> dict[str, PackagePaths]:
+    """index paths of foreign packages depending on the interpreter version.
+    File lists are read only for packages installed since the last run
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+        root (Path, optional): root directory of the system. Defaults to Path("/").
+
+    Raises:
+        ProgramNotInstalledError: if there is no pacman's database under db_path
+        tarfile.TarError: if any of sync databases could not be read
+
+    Returns:
+        dict[str, PackagePaths]: indexed paths by names of the packages
+    """
+    db_key = database_state(db_path)
+    cache = _load_cache(db_path, root)
+    if cache is not None and cache.get("db_key") == db_key:
+        logger.debug("Pacman's database didn't change, reusing index of interpreter directories")
+        return cache["packages"]
+    cached: dict[str, PackagePaths] = {} if cache is None else cache["packages"]
+    paths: dict[str, PackagePaths] = {}
+    for name, entry in read_foreign_entries(db_path).items():
+        if name in cached and cached[name].key == entry.key:
+            paths[name] = cached[name]
+        else:
+            paths[name] = index_package(entry.key, read_entry_files(entry))
+    _save_cache(db_path, root, db_key, paths)
+    return paths
+
+
+@traced(category="rebuild")
+def detect_abi_breakage(db_path: Path = PACMAN_DB_PATH, root: Path = Path("/")) -> set[str]:
+    """find foreign packages with modules for interpreter versions which are not installed anymore
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+        root (Path, optional): root directory of the system. Defaults to Path("/").
+
+    Raises:
+        ProgramNotInstalledError: if there is no pacman's database under db_path
+        tarfile.TarError: if any of sync databases could not be read
+
+    Returns:
+        set[str]: names of packages requiring rebuild, like detect_rebuilds gives
+    """
+    stranded = find_stranded(index_foreign_packages(db_path, root), root)
+    for name, reasons in stranded.items():
+        logger.debug("%s: %s", name, "; ".join(reasons))
+    return set(stranded)
@@ -0,0 +1,118 @@
+"""Module exporting metrics of the run in node_exporter textfile format, for monitoring runs started by timers
+"""
+
+from typing import NamedTuple, Optional, Final
+from pathlib import Path
+import sys
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.report import CheckReport
+from checkAUR.common.xdg import write_atomic
+from checkAUR.progress import REPO_OUTCOMES
+
+
+PREFIX: Final[str] = "checkaur"
+
+
+class RunMetrics(NamedTuple):
+    """measurements of one run
+
+    Attributes:
+        finished_at (float): end of the run, as UNIX time
+        duration (float): wall time of the run in seconds
+        stage_durations (dict[str, float]): wall time of every stage in seconds
+        failed_stages (frozenset[str]): names of stages which raised an exception
+        repos (dict[str, int]): number of repos by their outcome, see progress module
+        fetched_bytes (int): bytes of Git objects fetched
+        awaiting_packages (Optional[int]): installed packages with newer version in AUR folder,
+            None if packages were not compared
+        invalid_packages (Optional[int]): packages requiring rebuild, None if the check did not run
+    """
+    finished_at: float
+    duration: float
+    stage_durations: dict[str, float]
+    failed_stages: frozenset[str] = frozenset()
+    repos: dict[str, int] = {}
+    fetched_bytes: int = 0
+    awaiting_packages: Optional[int] = None
+    invalid_packages: Optional[int] = None
+
+
+def metrics_from_report(report: CheckReport) -> RunMetrics:
+    """take measurements of the run from its report
+
+    Args:
+        report (CheckReport): results of the run
+
+    Returns:
+        RunMetrics: measurements of the run
+    """
+    return RunMetrics(
+        finished_at=report.finished_at,
+        duration=report.duration,
+        stage_durations={timing.name: timing.duration for timing in report.timings},
+        failed_stages=frozenset(timing.name for timing in report.timings if timing.failed),
+        repos=dict(report.repos),
+        fetched_bytes=report.fetched_bytes,
+        awaiting_packages=None if report.awaiting_packages is None else len(report.awaiting_packages),
+        invalid_packages=None if report.invalid_packages is None else len(report.invalid_packages),
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _metric(lines: list[str], name: str, description: str, values: dict[str, float] | float,
+    label: str = ""
+) -> None:
+    lines.append(f"# HELP {PREFIX}_{name} {description}")
+    lines.append(f"# TYPE {PREFIX}_{name} gauge")
+    if isinstance(values, dict):
+        lines.extend(f'{PREFIX}_{name}{{{label}="{_escape(key)}"}} {value:g}' for key, value in values.items())
+    else:
+        lines.append(f"{PREFIX}_{name} {values:g}")
+
+
+def format_metrics(metrics: RunMetrics) -> str:
+    """format metrics in Prometheus text exposition format
+
+    Args:
+        metrics (RunMetrics): measurements of the run
+
+    Returns:
+        str: content of the textfile
+    """
+    lines: list[str] = []
+    _metric(lines, "last_run_timestamp_seconds", "End of the last run as UNIX time.", metrics.finished_at)
+    _metric(lines, "run_duration_seconds", "Wall time of the last run.", metrics.duration)
+    _metric(lines, "stage_duration_seconds", "Wall time of every stage of the last run.",
+        metrics.stage_durations, "stage")
+    _metric(lines, "stage_success", "1 if the stage finished without an error, 0 if it failed.",
+        {stage: float(stage not in metrics.failed_stages) for stage in metrics.stage_durations}, "stage")
+    _metric(lines, "repos", "Repos of the last run by their outcome.",
+        {outcome.replace(" ", "_"): metrics.repos.get(outcome, 0) for outcome in REPO_OUTCOMES}, "outcome")
+    _metric(lines, "fetched_bytes", "Bytes of Git objects fetched by the last run.", metrics.fetched_bytes)
+    if metrics.awaiting_packages is not None:
+        _metric(lines, "packages_awaiting_update", "Installed packages with a newer version in AUR folder.",
+            metrics.awaiting_packages)
+    if metrics.invalid_packages is not None:
+        _metric(lines, "invalid_packages", "Installed packages requiring rebuild.", metrics.invalid_packages)
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: Path, metrics: RunMetrics) -> None:
+    """write metrics atomically, so node_exporter never reads a partial file
+
+    Args:
+        path (Path): path to the textfile, its name should end with .prom
+        metrics (RunMetrics): measurements of the run
+    """
+    try:
+        write_atomic(path, format_metrics(metrics))
+    except OSError as exc:
+        message = f"Metrics could not be written to {path.as_posix()}: {exc}"
+        print(message, file=sys.stderr)
+        logger.error(message)
+        return
+    logger.debug("Metrics written to %s", path.as_posix())
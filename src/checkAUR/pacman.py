@@ -2,24 +2,276 @@
 """
 
 import subprocess
-from typing import Optional, Final
+from typing import NamedTuple, Optional, Final
+from pathlib import Path
+import json
+import os
 import re
+import tarfile
 
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.data_classes import PACMAN_DB_PATH
+from checkAUR.common.exceptions import ProgramNotInstalledError
 from checkAUR.common.package import Package
+from checkAUR.common.xdg import cache_path, write_atomic
+from checkAUR.common.tracing import traced
 
 
-def extract_local_packages() -> set[Package]:
-    """use pacman query to get locally installed packages (outside of repos)
+CACHE_FILE: Final[str] = "foreign_packages.json"
+CACHE_VERSION: Final[int] = 2
+
+
+@traced(category="pacman")
+def extract_local_packages(db_path: Path = PACMAN_DB_PATH) -> set[Package]:
+    """get locally installed packages (outside of repos) from pacman's database
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
 
     Raises:
+        ProgramNotInstalledError: if there is no pacman's database under db_path
         UnicodeError: if stdout from pacman could not be read as string
 
     Returns:
         set[Package]: packages installed locally
     """
+    if not (db_path / "local").is_dir():
+        message = f"No pacman database in {db_path.as_posix()}"
+        logger.critical(message)
+        raise ProgramNotInstalledError("pacman")
+
+    key = database_state(db_path)
+    cached = _load_cache(db_path, key)
+    if cached is not None:
+        logger.debug("Foreign packages taken from cache")
+        return cached
+
+    try:
+        sync_names = read_sync_names(db_path)
+    except (tarfile.TarError, OSError) as exc:
+        logger.warning("Sync database could not be read (%s), querying pacman", exc)
+        return _query_pacman()
+
+    result = set(_strip_debug(package) for package in read_local_database(db_path) \
+        if package.name not in sync_names)
+    _save_cache(db_path, key, result)
+    return result
+
+
+def read_desc(desc_path: Path) -> dict[str, list[str]]:
+    """read desc file of pacman's database entry
+
+    Args:
+        desc_path (Path): path to the desc file
+
+    Returns:
+        dict[str, list[str]]: values of all sections, e.g. {"NAME": ["foo"]}
+    """
+    with open(desc_path, "r", encoding="utf-8") as file:
+        return parse_desc(file.read())
+
+
+def parse_desc(content: str) -> dict[str, list[str]]:
+    """parse content of pacman's desc file
+
+    Args:
+        content (str): content of the file
+
+    Returns:
+        dict[str, list[str]]: values of all sections, e.g. {"NAME": ["foo"]}
+    """
+    result: dict[str, list[str]] = {}
+    section: Optional[list[str]] = None
+    for line in content.splitlines():
+        if line.startswith("%") and line.endswith("%") and len(line) > 2:
+            section = result.setdefault(line[1:-1], [])
+        elif not line:
+            section = None
+        elif section is not None:
+            section.append(line)
+    return result
+
+
+def read_local_database(db_path: Path = PACMAN_DB_PATH) -> set[Package]:
+    """read all packages installed according to pacman's local database
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+
+    Returns:
+        set[Package]: installed packages
+    """
+    result: set[Package] = set()
+    with os.scandir(db_path / "local") as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                desc = read_desc(Path(entry.path) / "desc")
+            except (OSError, UnicodeError):
+                logger.warning("Could not read local database entry %s", entry.name)
+                continue
+            package = _package_from_desc(desc)
+            if package is not None:
+                result.add(package)
+    return result
+
+
+class LocalEntry(NamedTuple):
+    """entry of pacman's local database
+
+    Attributes:
+        name (str): name of the package
+        key (str): version and install date, changing whenever the package is installed again
+        path (Path): path to the entry's directory
+    """
+    name: str
+    key: str
+    path: Path
+
+
+def read_foreign_entries(db_path: Path = PACMAN_DB_PATH) -> dict[str, LocalEntry]:
+    """read local database entries of packages installed outside of sync repositories
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+
+    Raises:
+        ProgramNotInstalledError: if there is no pacman's database under db_path
+        tarfile.TarError: if any of sync databases could not be read
+
+    Returns:
+        dict[str, LocalEntry]: entries by names of the packages
+    """
+    if not (db_path / "local").is_dir():
+        message = f"No pacman database in {db_path.as_posix()}"
+        logger.critical(message)
+        raise ProgramNotInstalledError("pacman")
+    sync_names = read_sync_names(db_path)
+    result: dict[str, LocalEntry] = {}
+    with os.scandir(db_path / "local") as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                desc = read_desc(Path(entry.path) / "desc")
+            except (OSError, UnicodeError):
+                logger.warning("Could not read local database entry %s", entry.name)
+                continue
+            if not desc.get("NAME") or desc["NAME"][0] in sync_names:
+                continue
+            key = f"{desc.get('VERSION', [''])[0]}:{desc.get('INSTALLDATE', [''])[0]}"
+            result[desc["NAME"][0]] = LocalEntry(desc["NAME"][0], key, Path(entry.path))
+    return result
+
+
+def read_entry_files(entry: LocalEntry) -> list[str]:
+    """read file list of the package
+
+    Args:
+        entry (LocalEntry): entry of the local database
+
+    Returns:
+        list[str]: paths relative to the root directory, directories end with '/'.
+            Empty if the list could not be read
+    """
+    try:
+        return read_desc(entry.path / "files").get("FILES", [])
+    except (OSError, UnicodeError):
+        logger.warning("Could not read file list of %s", entry.name)
+        return []
+
+
+def _package_from_desc(desc: dict[str, list[str]]) -> Optional[Package]:
+    if not desc.get("NAME") or not desc.get("VERSION"):
+        return None
+    name: str = desc["NAME"][0]
+    version: str = desc["VERSION"][0]
+    base: Optional[str] = desc["BASE"][0] if desc.get("BASE") else None
+    return Package(name=name, version=version, base=base)
+
+
+def _strip_debug(package: Package) -> Package:
+    if not package.name.endswith("-debug"):
+        return package
+    return Package(name=package.name[:-6], version=package.version, base=package.base)
+
+
+def read_sync_names(db_path: Path = PACMAN_DB_PATH) -> set[str]:
+    """read names of all packages available in sync repositories
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+
+    Raises:
+        tarfile.TarError: if any of sync databases could not be read
+
+    Returns:
+        set[str]: names of packages in repositories
+    """
+    result: set[str] = set()
+    sync_path = db_path / "sync"
+    if not sync_path.is_dir():
+        return result
+    for database in sorted(sync_path.glob("*.db")):
+        with tarfile.open(database, "r:*") as archive:
+            for member in archive:
+                entry = member.name.split("/", 1)[0]
+                name = entry.rsplit("-", 2)[0]
+                if name:
+                    result.add(name)
+    return result
+
+
+def database_state(db_path: Path = PACMAN_DB_PATH) -> list[int]:
+    """fingerprint of pacman's database, changing after every transaction or sync
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+
+    Returns:
+        list[int]: modification times of database directories and sync files
+    """
+    key: list[int] = []
+    for directory in (db_path / "local", db_path / "sync"):
+        try:
+            key.append(directory.stat().st_mtime_ns)
+        except OSError:
+            key.append(0)
+    if (db_path / "sync").is_dir():
+        key.extend(database.stat().st_mtime_ns for database in sorted((db_path / "sync").glob("*.db")))
+    return key
+
+
+def _load_cache(db_path: Path, key: list[int]) -> Optional[set[Package]]:
+    try:
+        with open(cache_path(CACHE_FILE), "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION \
+        or data.get("db_path") != db_path.as_posix() or data.get("key") != key:
+        return None
+    return set(Package(name, version, base) for name, version, base in data["packages"])
+
+
+def _save_cache(db_path: Path, key: list[int], packages: set[Package]) -> None:
+    data = {
+        "version": CACHE_VERSION,
+        "db_path": db_path.as_posix(),
+        "key": key,
+        "packages": [[package.name, package.version, package.base] \
+            for package in sorted(packages, key=lambda package: package.name)]
+    }
+    try:
+        write_atomic(cache_path(CACHE_FILE), json.dumps(data))
+    except OSError:
+        logger.warning("Could not save foreign packages cache")
+
+
+def _query_pacman() -> set[Package]:
     query_result = subprocess.run(
-        "pacman -Qm",
-        shell=True,
+        ["pacman", "-Qm"],
         capture_output=True,
         check=True
     )
@@ -31,7 +283,7 @@ def extract_local_packages() -> set[Package]:
     if (package := _extract_package_name(package_string)) is not None)
 
 
-_PACKAGE_NAME_PATTERN: Final[re.Pattern] = re.compile(r"(.+)( )(.+)(-\d+)")
+_PACKAGE_NAME_PATTERN: Final[re.Pattern] = re.compile(r"(.+)( )(.+-\d+(?:\.\d+)?)")
 
 
 def _extract_package_name(checked_name: str) -> Optional[Package]:
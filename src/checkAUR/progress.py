@@ -0,0 +1,156 @@
+"""Module streaming progress of the run: events are emitted as repos and stages finish,
+the recorder collects outcomes of the repos, the console renderer prints updated packages as soon as they are read
+"""
+
+from typing import NamedTuple, Callable, Final
+import json
+import threading
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.package import Package
+
+
+REPO_STARTED: Final[str] = "started"
+REPO_FETCHED: Final[str] = "fetched"
+REPO_UPDATED: Final[str] = "updated"
+REPO_FAILED: Final[str] = "failed"
+REPO_TIMED_OUT: Final[str] = "timed out"
+STAGE_DONE: Final[str] = "stage done"
+REPO_OUTCOMES: Final[tuple[str,...]] = (REPO_STARTED, REPO_FETCHED, REPO_UPDATED, REPO_FAILED, REPO_TIMED_OUT)
+
+
+class ProgressEvent(NamedTuple):
+    """single step of the run
+
+    Attributes:
+        kind (str): one of REPO_STARTED, REPO_FETCHED, REPO_UPDATED, REPO_FAILED, REPO_TIMED_OUT, STAGE_DONE
+        name (str): name of the repo's folder or of the stage
+        packages (frozenset[Package]): packages read from the updated repo
+        detail (str): reason of the failure, or duration of the stage
+        size (int): bytes of Git objects brought by the fetch, 0 if nothing new was fetched
+    """
+    kind: str
+    name: str
+    packages: frozenset[Package] = frozenset()
+    detail: str = ""
+    size: int = 0
+
+
+ProgressListener = Callable[[ProgressEvent], None]
+
+
+def no_progress(_event: ProgressEvent) -> None:
+    """listener ignoring all events
+    """
+
+
+class ProgressRecorder:
+    """Collector of progress events, counting them and keeping updated and failed repos,
+    every event is passed on to the given listener. Events can come from many threads
+    """
+    def __init__(self, listener: ProgressListener = no_progress):
+        self._listener = listener
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] = {}
+        self._fetched_bytes = 0
+        self._updated: dict[str, frozenset[Package]] = {}
+        self._failed: list[ProgressEvent] = []
+
+    def __call__(self, event: ProgressEvent) -> None:
+        """record the event and pass it on
+
+        Args:
+            event (ProgressEvent): event emitted by the run
+        """
+        with self._lock:
+            self._counts[event.kind] = self._counts.get(event.kind, 0) + 1
+            self._fetched_bytes += event.size
+            if event.kind == REPO_UPDATED:
+                self._updated[event.name] = event.packages
+            elif event.kind in (REPO_FAILED, REPO_TIMED_OUT):
+                self._failed.append(event)
+        self._listener(event)
+
+    def count(self, kind: str) -> int:
+        """number of events of the kind recorded so far
+
+        Args:
+            kind (str): kind of the events
+
+        Returns:
+            int: number of the events
+        """
+        with self._lock:
+            return self._counts.get(kind, 0)
+
+    @property
+    def fetched_bytes(self) -> int:
+        """bytes of Git objects fetched so far
+        """
+        with self._lock:
+            return self._fetched_bytes
+
+    @property
+    def updated(self) -> dict[str, frozenset[Package]]:
+        """packages read from the updated repos, by folder name
+        """
+        with self._lock:
+            return dict(self._updated)
+
+    @property
+    def failed(self) -> list[ProgressEvent]:
+        """events of repos which failed or timed out, in the order they came
+        """
+        with self._lock:
+            return list(self._failed)
+
+
+class ConsoleProgress(ProgressRecorder):
+    """Renderer of progress events printing updated repos, failures and finished stages at once,
+    and counts of all events at the end. Events can come from many threads
+    """
+    def __call__(self, event: ProgressEvent) -> None:
+        """render the event
+
+        Args:
+            event (ProgressEvent): event emitted by the run
+        """
+        logger.debug("Progress: %s %s %s", event.kind, event.name, event.detail)
+        super().__call__(event)
+        if event.kind == REPO_UPDATED:
+            packages = ", ".join(str(package) for package in sorted(event.packages, key=lambda item: item.name))
+            print(f"Updated {event.name}: {packages or 'packages could not be read'}")
+        elif event.kind == REPO_FAILED:
+            print(f"Could not pull {event.name}: {event.detail}")
+        elif event.kind == STAGE_DONE:
+            print(f"Stage {event.name} done ({event.detail})")
+
+    def print_summary(self) -> None:
+        """print counts of repos by their outcome, if any repo was pulled
+        """
+        started = self.count(REPO_STARTED)
+        if started == 0:
+            return
+        print(f"Pulled {started} repos: {self.count(REPO_UPDATED)} updated, {self.count(REPO_FAILED)} failed, "
+            f"{self.count(REPO_TIMED_OUT)} timed out, {self.fetched_bytes / 1024:.1f} KiB fetched")
+
+
+class JsonLinesProgress:
+    """Renderer of progress events as JSON objects, one per line, for tools reading the output as it comes.
+    Events can come from many threads
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __call__(self, event: ProgressEvent) -> None:
+        """print the event as one line of JSON
+
+        Args:
+            event (ProgressEvent): event emitted by the run
+        """
+        line = json.dumps({"event": event.kind, "name": event.name,
+            "packages": [{"name": package.name, "version": package.version} \
+                for package in sorted(event.packages, key=lambda item: item.name)],
+            "detail": event.detail, "size": event.size})
+        with self._lock:
+            print(line, flush=True)
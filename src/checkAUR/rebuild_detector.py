@@ -0,0 +1,417 @@
+"""Module finding foreign packages which have to be rebuilt, because libraries they were linked with are gone.
+Built-in replacement of checkrebuild: file lists come from pacman's database, ELF files are read directly.
+Results are cached, only packages whose files or required libraries changed are checked again
+"""
+
+from typing import NamedTuple, Optional, Final, Iterable, Self
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import concurrent.futures
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import stat
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.data_classes import PACMAN_DB_PATH
+from checkAUR.common.xdg import cache_path, write_atomic
+from checkAUR.common.tracing import traced
+from checkAUR.elf import ElfKind, DynamicInfo, read_dynamic_info, read_elf_kind
+from checkAUR.pacman import LocalEntry, read_foreign_entries, read_entry_files, database_state
+
+
+LD_SO_CONF: Final[str] = "/etc/ld.so.conf"
+DEFAULT_LIBRARY_PATHS: Final[tuple[str,...]] = ("/lib", "/usr/lib", "/lib64", "/usr/lib64")
+SKIPPED_PREFIXES: Final[tuple[str,...]] = ("usr/lib/debug/", "usr/share/", "usr/include/")
+_ORIGIN_PATTERN: Final[re.Pattern] = re.compile(r"\$(?:ORIGIN\b|\{ORIGIN\})")
+_CONF_SEPARATORS: Final[re.Pattern] = re.compile(r"[\s:,]+")
+_MAX_INCLUDE_DEPTH: Final[int] = 8
+_STAMP_MISSING: Final[str] = "-"
+CACHE_FILE: Final[str] = "rebuild_detector.json"
+CACHE_VERSION: Final[int] = 1
+
+
+def _in_root(root: Path, path: str) -> Path:
+    return root / path.lstrip("/")
+
+
+def read_ld_so_conf(root: Path = Path("/")) -> list[str]:
+    """read library directories from ld.so.conf, following its include lines
+
+    Args:
+        root (Path, optional): root directory of the system. Defaults to Path("/").
+
+    Returns:
+        list[str]: absolute directories, in the order of the files
+    """
+    result: list[str] = []
+
+    def read(path: Path, depth: int) -> None:
+        try:
+            content = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return
+        for line in content.splitlines():
+            line = line.partition("#")[0].strip()
+            if line.startswith("include") and line[7:8].isspace():
+                if depth >= _MAX_INCLUDE_DEPTH:
+                    continue
+                for pattern in line[8:].split():
+                    pattern_path = _in_root(root, pattern) if pattern.startswith("/") else path.parent / pattern
+                    for included in sorted(glob.glob(pattern_path.as_posix())):
+                        read(Path(included), depth + 1)
+            elif line and not line.startswith("hwcap"):
+                result.extend(directory for directory in _CONF_SEPARATORS.split(line) if directory)
+
+    read(_in_root(root, LD_SO_CONF), 0)
+    return result
+
+
+def linker_search_paths(root: Path = Path("/")) -> list[Path]:
+    """directories searched by the dynamic linker for libraries not found in RPATH or RUNPATH
+
+    Args:
+        root (Path, optional): root directory of the system. Defaults to Path("/").
+
+    Returns:
+        list[Path]: existing directories from ld.so.conf and the default ones, each only once
+    """
+    result: list[Path] = []
+    seen: set[str] = set()
+    for directory in (*read_ld_so_conf(root), *DEFAULT_LIBRARY_PATHS):
+        path = _in_root(root, directory)
+        real_path = os.path.realpath(path)
+        if real_path not in seen and path.is_dir():
+            seen.add(real_path)
+            result.append(path)
+    return result
+
+
+class SonameIndex:
+    """Index of libraries found by the dynamic linker in its search paths, by their file names.
+    Built once by listing the directories, kinds of the libraries are read on first use
+
+    Attributes:
+        root (Path): root directory of the system
+        key (str): fingerprint of the whole index
+    """
+    def __init__(self, libraries: dict[str, tuple[Path,...]], root: Path = Path("/"),
+        stamps: Optional[dict[str, str]] = None
+    ):
+        """Index of libraries
+
+        Args:
+            libraries (dict[str, tuple[Path,...]]): paths to the libraries by their file names
+            root (Path, optional): root directory of the system. Defaults to Path("/").
+            stamps (Optional[dict[str, str]], optional): stat of the libraries by their file names,
+                changing whenever any of them changes. Defaults to None, meaning unknown.
+        """
+        self.root = root
+        self._libraries = libraries
+        self._stamps = {} if stamps is None else stamps
+        self._kinds: dict[Path, Optional[ElfKind]] = {}
+        self.key = hashlib.sha1(json.dumps(sorted(self._stamps.items())).encode(encoding="utf-8")).hexdigest()
+
+    @classmethod
+    def build(cls, root: Path = Path("/")) -> Self:
+        """list libraries in the linker search paths
+
+        Args:
+            root (Path, optional): root directory of the system. Defaults to Path("/").
+
+        Returns:
+            SonameIndex: index of the libraries
+        """
+        libraries: dict[str, list[Path]] = {}
+        stamps: dict[str, list[str]] = {}
+        for directory in linker_search_paths(root):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if ".so" not in entry.name:
+                            continue
+                        libraries.setdefault(entry.name, []).append(Path(entry.path))
+                        try:
+                            library_stat = entry.stat()
+                            stamp = f"{entry.path}:{library_stat.st_mtime_ns}:{library_stat.st_size}"
+                        except OSError:
+                            stamp = f"{entry.path}:{_STAMP_MISSING}"
+                        stamps.setdefault(entry.name, []).append(stamp)
+            except OSError:
+                logger.warning("Could not list libraries in %s", directory.as_posix())
+        return cls({name: tuple(paths) for name, paths in libraries.items()}, root,
+            {name: "|".join(values) for name, values in stamps.items()})
+
+    def fingerprint(self, soname: str) -> str:
+        """fingerprint of the libraries with the given file name
+
+        Args:
+            soname (str): file name of the library
+
+        Returns:
+            str: stat of all libraries with the name, changing whenever any of them changes
+        """
+        return self._stamps.get(soname, _STAMP_MISSING)
+
+    def __len__(self) -> int:
+        return len(self._libraries)
+
+    def kind(self, path: Path) -> Optional[ElfKind]:
+        """kind of the library, read once
+
+        Args:
+            path (Path): path to the library
+
+        Returns:
+            Optional[ElfKind]: class and architecture, None if it's not a loadable ELF file
+        """
+        if path not in self._kinds:
+            self._kinds[path] = read_elf_kind(path)
+        return self._kinds[path]
+
+    def find(self, soname: str, kind: ElfKind) -> bool:
+        """check if the linker finds library of the given kind in its search paths
+
+        Args:
+            soname (str): file name of the library
+            kind (ElfKind): kind of the file needing the library
+
+        Returns:
+            bool: True if the library was found
+        """
+        return any(self.kind(path) == kind for path in self._libraries.get(soname, ()))
+
+
+def _search_directories(path: Path, info: DynamicInfo, root: Path) -> list[Path]:
+    result: list[Path] = []
+    origin = os.path.dirname(os.path.realpath(path))
+    # RPATH is ignored by the linker if there is RUNPATH
+    for directory in info.runpath or info.rpath:
+        if _ORIGIN_PATTERN.search(directory):
+            result.append(Path(_ORIGIN_PATTERN.sub(origin, directory)))
+        elif "$" not in directory:
+            result.append(_in_root(root, directory))
+    return result
+
+
+def missing_libraries(path: Path, info: DynamicInfo, index: SonameIndex) -> list[str]:
+    """find libraries required by ELF file, which the dynamic linker would not find
+
+    Args:
+        path (Path): path to the file
+        info (DynamicInfo): dependencies of the file
+        index (SonameIndex): libraries in the linker search paths
+
+    Returns:
+        list[str]: sonames of the missing libraries
+    """
+    directories = _search_directories(path, info, index.root)
+    result: list[str] = []
+    for soname in info.needed:
+        if "/" in soname:
+            # relative paths are resolved against working directory of the process, they can't be checked
+            if soname.startswith("/") and index.kind(_in_root(index.root, soname)) != info.kind:
+                result.append(soname)
+            continue
+        if not any(index.kind(directory / soname) == info.kind for directory in directories) \
+            and not index.find(soname, info.kind):
+            result.append(soname)
+    return result
+
+
+def _is_candidate(path: Path) -> bool:
+    try:
+        path_stat = os.stat(path, follow_symlinks=False)
+    except OSError:
+        return False
+    return stat.S_ISREG(path_stat.st_mode) and (bool(path_stat.st_mode & 0o111) or ".so" in path.name)
+
+
+class PackageCheck(NamedTuple):
+    """result of checking one package, kept between runs
+
+    Attributes:
+        key (str): version and install date of the package, see LocalEntry
+        libraries (dict[str, str]): fingerprints of the required libraries in the soname index
+        directories (dict[str, int]): modification times of RPATH and RUNPATH directories
+        missing (dict[str, list[str]]): sonames of missing libraries, by paths of the files requiring them
+    """
+    key: str
+    libraries: dict[str, str]
+    directories: dict[str, int]
+    missing: dict[str, list[str]]
+
+
+def _directory_stamp(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def check_package(key: str, files: Iterable[str], index: SonameIndex) -> PackageCheck:
+    """find ELF files of the package requiring libraries which can't be found.
+    Libraries shipped by the package itself count as found, as it may load them with LD_LIBRARY_PATH
+
+    Args:
+        key (str): version and install date of the package
+        files (Iterable[str]): paths of the package's files, relative to the root directory
+        index (SonameIndex): libraries in the linker search paths
+
+    Returns:
+        PackageCheck: missing libraries, with everything the result depends on
+    """
+    dynamic: dict[Path, DynamicInfo] = {}
+    for file in files:
+        if file.endswith("/") or file.startswith(SKIPPED_PREFIXES):
+            continue
+        path = _in_root(index.root, file)
+        if not _is_candidate(path):
+            continue
+        info = read_dynamic_info(path)
+        if info is not None:
+            dynamic[path] = info
+    shipped = {(path.name, info.kind) for path, info in dynamic.items()}
+
+    libraries: dict[str, str] = {}
+    directories: dict[str, int] = {}
+    missing: dict[str, list[str]] = {}
+    for path, info in dynamic.items():
+        libraries.update((soname, index.fingerprint(soname)) for soname in info.needed if "/" not in soname)
+        directories.update((directory.as_posix(), _directory_stamp(directory.as_posix())) \
+            for directory in _search_directories(path, info, index.root))
+        path_missing = [soname for soname in missing_libraries(path, info, index) \
+            if (os.path.basename(soname), info.kind) not in shipped]
+        if path_missing:
+            missing[path.as_posix()] = path_missing
+    return PackageCheck(key, libraries, directories, missing)
+
+
+def is_current(check: PackageCheck, key: str, index: SonameIndex) -> bool:
+    """check if result of the earlier check is still valid
+
+    Args:
+        check (PackageCheck): result of the earlier check
+        key (str): version and install date of the package now
+        index (SonameIndex): libraries in the linker search paths now
+
+    Returns:
+        bool: True if neither the package, nor libraries and directories it uses, changed
+    """
+    return check.key == key \
+        and all(index.fingerprint(soname) == stamp for soname, stamp in check.libraries.items()) \
+        and all(_directory_stamp(directory) == stamp for directory, stamp in check.directories.items())
+
+
+_worker_index: Optional[SonameIndex] = None
+
+
+def _init_worker(index: SonameIndex) -> None:
+    global _worker_index # pylint: disable=global-statement
+    _worker_index = index
+
+
+def _check_entry(entry: LocalEntry, index: SonameIndex) -> PackageCheck:
+    return check_package(entry.key, read_entry_files(entry), index)
+
+
+def _check_in_worker(entry: LocalEntry) -> PackageCheck:
+    assert _worker_index is not None
+    return _check_entry(entry, _worker_index)
+
+
+def _check_packages(entries: list[LocalEntry], index: SonameIndex, workers: int) -> dict[str, PackageCheck]:
+    if workers > 1:
+        try:
+            # forkserver, because pulling threads run at the same time, and forking threaded process is unsafe
+            with concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context("forkserver"),
+                _init_worker, (index,)) as executor:
+                checks = executor.map(_check_in_worker, entries, chunksize=max(1, len(entries) // (workers * 4)))
+                return {entry.name: check for entry, check in zip(entries, checks)}
+        except (OSError, BrokenProcessPool) as exc:
+            logger.warning("Could not check packages in worker processes, checking them serially: %s", exc)
+    return {entry.name: _check_entry(entry, index) for entry in entries}
+
+
+def _load_cache(db_path: Path, root: Path) -> Optional[dict]:
+    try:
+        with open(cache_path(CACHE_FILE), "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION \
+        or data.get("db_path") != db_path.as_posix() or data.get("root") != root.as_posix():
+        return None
+    try:
+        data["packages"] = {name: PackageCheck(*values) for name, values in data["packages"].items()}
+    except (KeyError, TypeError, AttributeError):
+        return None
+    return data
+
+
+def _save_cache(db_path: Path, root: Path, db_key: list[int], index: SonameIndex,
+    checks: dict[str, PackageCheck]
+) -> None:
+    data = {
+        "version": CACHE_VERSION,
+        "db_path": db_path.as_posix(),
+        "root": root.as_posix(),
+        "db_key": db_key,
+        "index_key": index.key,
+        "packages": {name: list(check) for name, check in checks.items()},
+    }
+    try:
+        write_atomic(cache_path(CACHE_FILE), json.dumps(data))
+    except OSError:
+        logger.warning("Could not save rebuild detector cache")
+
+
+@traced(category="rebuild")
+def detect_rebuilds(db_path: Path = PACMAN_DB_PATH, root: Path = Path("/"),
+    max_workers: Optional[int] = None
+) -> set[str]:
+    """find foreign packages with ELF files requiring libraries which the dynamic linker would not find
+
+    Args:
+        db_path (Path, optional): pacman's DBPath. Defaults to PACMAN_DB_PATH.
+        root (Path, optional): root directory of the system. Defaults to Path("/").
+        max_workers (Optional[int], optional): number of processes checking packages.
+            Defaults to None, meaning number of CPUs.
+
+    Raises:
+        ProgramNotInstalledError: if there is no pacman's database under db_path
+        tarfile.TarError: if any of sync databases could not be read
+
+    Returns:
+        set[str]: names of packages requiring rebuild, like extract_packages gives for checkrebuild
+    """
+    index = SonameIndex.build(root)
+    db_key = database_state(db_path)
+    cache = _load_cache(db_path, root)
+    checks: dict[str, PackageCheck]
+    if cache is not None and cache.get("db_key") == db_key and cache.get("index_key") == index.key:
+        logger.debug("Neither pacman's database nor libraries changed, reusing results of rebuild detector")
+        checks = cache["packages"]
+    else:
+        cached: dict[str, PackageCheck] = {} if cache is None else cache["packages"]
+        entries = read_foreign_entries(db_path)
+        checks = {name: cached[name] for name, entry in entries.items() \
+            if name in cached and is_current(cached[name], entry.key, index)}
+        stale = [entry for name, entry in entries.items() if name not in checks]
+        logger.debug("Checking %s of %s foreign packages against %s libraries", len(stale), len(entries),
+            len(index))
+        workers = min(os.cpu_count() or 1 if max_workers is None else max_workers, len(stale))
+        checks.update(_check_packages(stale, index, workers))
+        _save_cache(db_path, root, db_key, index, checks)
+
+    result: set[str] = set()
+    for name, check in checks.items():
+        if not check.missing:
+            continue
+        result.add(name)
+        for path, sonames in check.missing.items():
+            logger.debug("%s: %s requires missing %s", name, path, ", ".join(sonames))
+    return result
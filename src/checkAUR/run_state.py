@@ -0,0 +1,334 @@
+"""Module keeping state of AUR repos between runs, so unchanged repos can skip work
+"""
+
+from typing import NamedTuple, Optional, Final, Self, Iterable
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.package import Package, packages_from_metadata
+from checkAUR.common.srcinfo import PackageMetadata, read_metadata
+from checkAUR.common.xdg import state_path
+
+
+STATE_VERSION: Final[int] = 3
+FETCH_TIME_WEIGHT: Final[float] = 0.5
+_STAT_MISSING: Final[str] = "-"
+
+
+class RepoState(NamedTuple):
+    """state of one repo after the last run
+
+    Attributes:
+        validation_key (Optional[str]): stat of files deciding if the repo is correct
+        valid (bool): if the repo was a correct AUR repo
+        head (Optional[str]): hash of local HEAD
+        remote_tip (Optional[str]): hash of the upstream branch after the last fetch
+        metadata_key (Optional[str]): stat of .SRCINFO and PKGBUILD the metadata was read from
+        metadata (Optional[PackageMetadata]): parsed metadata of the working tree
+        checked_at (Optional[float]): time of the last successful fetch, in seconds since the epoch
+        fetch_time (Optional[float]): expected duration of fetch in seconds, averaged over the runs
+    """
+    validation_key: Optional[str] = None
+    valid: bool = False
+    head: Optional[str] = None
+    remote_tip: Optional[str] = None
+    metadata_key: Optional[str] = None
+    metadata: Optional[PackageMetadata] = None
+    checked_at: Optional[float] = None
+    fetch_time: Optional[float] = None
+
+
+def _stat_key(*paths: Path) -> str:
+    keys: list[str] = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            keys.append(_STAT_MISSING)
+            continue
+        keys.append(f"{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}")
+    return "/".join(keys)
+
+
+def validation_key(repo_path: Path, git_dir: Path) -> str:
+    """key changing whenever result of the repo validation might change
+
+    Args:
+        repo_path (Path): path to the repo's folder
+        git_dir (Path): path to the git directory
+
+    Returns:
+        str: stat of the git config and PKGBUILD
+    """
+    pkgbuild = "pkgbuild" if (repo_path / "PKGBUILD").is_file() else _STAT_MISSING
+    return f"{_stat_key(git_dir / 'config')}/{pkgbuild}"
+
+
+def metadata_key(repo_path: Path) -> str:
+    """key changing whenever metadata of the repo might change
+
+    Args:
+        repo_path (Path): path to the repo's folder
+
+    Returns:
+        str: stat of .SRCINFO and PKGBUILD
+    """
+    return _stat_key(repo_path / ".SRCINFO", repo_path / "PKGBUILD")
+
+
+def state_file(aur_path: Path) -> Path:
+    """path to the state file of the AUR folder. Every AUR folder has its own file, with fetch times
+    of its repos among the rest. It's kept out of the AUR folder, which holds only user's repos
+
+    Args:
+        aur_path (Path): path to user's AUR folder
+
+    Returns:
+        Path: path inside $XDG_STATE_HOME/checkAUR
+    """
+    digest = hashlib.sha1(aur_path.resolve().as_posix().encode(encoding="utf-8")).hexdigest()[:16]
+    return state_path(f"run-state-{digest}.sqlite")
+
+
+class RunState:
+    """State of repos in one AUR folder, stored in SQLite database.
+    Rows are loaded once when opening, changes are written in a single transaction by save()
+
+    Attributes:
+        path (Path): path to the database file
+        fresh_for (float): how many seconds after a fetch the repo is not fetched again, 0 to always fetch
+    """
+    def __init__(self, path: Path, refresh: bool = False, fresh_for: float = 0.0,
+        aur_path: Optional[Path] = None
+    ):
+        """State of repos in one AUR folder
+
+        Args:
+            path (Path): path to the database file
+            refresh (bool, optional): if stored state should be ignored. Defaults to False.
+            fresh_for (float, optional): how many seconds after a fetch the repo is not fetched again.
+                Defaults to 0.0, meaning every repo is fetched.
+            aur_path (Optional[Path], optional): path to the AUR folder, rows of repos no longer in it
+                are removed when saving. Defaults to None, meaning rows are never removed.
+        """
+        self.path = path
+        self.fresh_for = fresh_for
+        self._aur_path = aur_path
+        self._lock = threading.Lock()
+        self._repos: dict[str, RepoState] = {}
+        self._dirty: set[str] = set()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._refresh = refresh
+
+    def __enter__(self) -> Self:
+        self.open()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.save()
+        self.close()
+
+    def open(self) -> None:
+        """open the database and load stored state. Database in unknown version is recreated
+        """
+        if self._connection is not None:
+            return
+        try:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._prepare_schema()
+            if not self._refresh:
+                self._load()
+        except sqlite3.Error as exc:
+            logger.warning("Could not open run state %s: %s", self.path.as_posix(), exc)
+            self.close()
+
+    def _prepare_schema(self) -> None:
+        assert self._connection is not None
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        with self._connection:
+            if version != STATE_VERSION:
+                self._connection.execute("DROP TABLE IF EXISTS repos")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS repos (
+                name TEXT PRIMARY KEY,
+                validation_key TEXT,
+                valid INTEGER NOT NULL,
+                head TEXT,
+                remote_tip TEXT,
+                metadata_key TEXT,
+                metadata TEXT,
+                checked_at REAL,
+                fetch_time REAL
+            )""")
+            self._connection.execute(f"PRAGMA user_version = {STATE_VERSION}")
+
+    def _load(self) -> None:
+        assert self._connection is not None
+        rows = self._connection.execute("SELECT name, validation_key, valid, head, remote_tip, \
+            metadata_key, metadata, checked_at, fetch_time FROM repos")
+        for name, validation, valid, head, remote_tip, stored_key, stored_metadata, checked_at, fetch_time in rows:
+            metadata: Optional[PackageMetadata] = None
+            if stored_metadata is not None:
+                try:
+                    metadata = PackageMetadata(*(tuple(value) if isinstance(value, list) else value \
+                        for value in json.loads(stored_metadata)))
+                except (ValueError, TypeError):
+                    stored_key = None
+            self._repos[name] = RepoState(validation, bool(valid), head, remote_tip, stored_key, metadata,
+                checked_at, fetch_time)
+
+    def _prune(self) -> list[str]:
+        if self._aur_path is None or not self._aur_path.is_dir():
+            return []
+        with self._lock:
+            removed = [name for name in self._repos if not (self._aur_path / name).is_dir()]
+            for name in removed:
+                del self._repos[name]
+                self._dirty.discard(name)
+        if removed:
+            logger.debug("Removing state of %s repos no longer in %s", len(removed), self._aur_path.as_posix())
+        return removed
+
+    def save(self) -> None:
+        """write changed repos to the database, removing repos whose folders no longer exist
+        """
+        removed = self._prune()
+        with self._lock:
+            changed = [(name, self._repos[name]) for name in self._dirty if name in self._repos]
+            self._dirty.clear()
+        if self._connection is None or not (changed or removed):
+            return
+        try:
+            with self._connection:
+                self._connection.executemany("DELETE FROM repos WHERE name = ?", [(name,) for name in removed])
+                self._connection.executemany("INSERT OR REPLACE INTO repos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+                    (name, state.validation_key, int(state.valid), state.head, state.remote_tip,
+                        state.metadata_key, None if state.metadata is None else json.dumps(list(state.metadata)),
+                        state.checked_at, state.fetch_time)
+                    for name, state in changed
+                ])
+        except sqlite3.Error as exc:
+            logger.warning("Could not save run state %s: %s", self.path.as_posix(), exc)
+
+    def close(self) -> None:
+        """close the database, without saving
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get(self, name: str) -> Optional[RepoState]:
+        """get state of the repo
+
+        Args:
+            name (str): name of the repo's folder
+
+        Returns:
+            Optional[RepoState]: state from the last run, None if the repo is not known
+        """
+        with self._lock:
+            return self._repos.get(name)
+
+    def update(self, name: str, **changes) -> None:
+        """change stored state of the repo
+
+        Args:
+            name (str): name of the repo's folder
+            changes: new values of RepoState fields
+        """
+        with self._lock:
+            self._repos[name] = self._repos.get(name, RepoState())._replace(**changes)
+            self._dirty.add(name)
+
+    def is_fresh(self, name: str, head: Optional[str], upstream: Optional[str]) -> bool:
+        """check if the repo was fetched recently enough to skip the network, and its refs did not change since
+
+        Args:
+            name (str): name of the repo's folder
+            head (Optional[str]): hash of local HEAD
+            upstream (Optional[str]): hash of the upstream branch
+
+        Returns:
+            bool: True if the repo does not have to be fetched
+        """
+        if self.fresh_for <= 0:
+            return False
+        state = self.get(name)
+        return state is not None and state.checked_at is not None \
+            and 0 <= time.time() - state.checked_at < self.fresh_for \
+            and state.head == head and state.remote_tip == upstream
+
+    def record_fetch_time(self, name: str, seconds: float) -> None:
+        """remember how long fetch of the repo took, averaged with the earlier runs
+
+        Args:
+            name (str): name of the repo's folder
+            seconds (float): duration of the fetch
+        """
+        with self._lock:
+            state = self._repos.get(name, RepoState())
+            if state.fetch_time is not None:
+                seconds = FETCH_TIME_WEIGHT * seconds + (1 - FETCH_TIME_WEIGHT) * state.fetch_time
+            self._repos[name] = state._replace(fetch_time=seconds)
+            self._dirty.add(name)
+
+    def longest_first(self, repo_paths: Iterable[Path]) -> list[Path]:
+        """order repos by expected fetch time, longest first, so slow repos do not start last
+        and stretch the whole pull. Repos never fetched are expected to take the average time
+
+        Args:
+            repo_paths (Iterable[Path]): paths to the repos' folders
+
+        Returns:
+            list[Path]: the same repos, the longest expected first
+        """
+        times: dict[Path, Optional[float]] = {}
+        with self._lock:
+            for repo_path in repo_paths:
+                state = self._repos.get(repo_path.name)
+                times[repo_path] = None if state is None else state.fetch_time
+        known = [seconds for seconds in times.values() if seconds is not None]
+        average = sum(known) / len(known) if known else 0.0
+        expected = {repo_path: average if seconds is None else seconds for repo_path, seconds in times.items()}
+        # sort is stable, so repos expected to take the same time keep their order
+        return sorted(expected, key=lambda repo_path: expected[repo_path], reverse=True)
+
+    def read_packages(self, repo_path: Path) -> set[Package]:
+        """read packages of the repo, reusing stored metadata if .SRCINFO and PKGBUILD did not change
+
+        Args:
+            repo_path (Path): path to the repo's folder
+
+        Raises:
+            OSError: if there is neither .SRCINFO nor PKGBUILD in the repo
+
+        Returns:
+            set[Package]: packages built from the repo
+        """
+        key = metadata_key(repo_path)
+        state = self.get(repo_path.name)
+        if state is not None and state.metadata is not None and state.metadata_key == key:
+            return packages_from_metadata(state.metadata)
+        metadata = read_metadata(repo_path)
+        self.update(repo_path.name, metadata_key=key, metadata=metadata)
+        return packages_from_metadata(metadata)
+
+
+def open_run_state(aur_path: Path, refresh: bool = False, fresh_for: float = 0.0) -> RunState:
+    """create state of the AUR folder, to be used as context manager
+
+    Args:
+        aur_path (Path): path to user's AUR folder
+        refresh (bool, optional): if stored state should be ignored and replaced. Defaults to False.
+        fresh_for (float, optional): how many seconds after a fetch the repo is not fetched again.
+            Defaults to 0.0, meaning every repo is fetched.
+
+    Returns:
+        RunState: state of the folder, opened when entering the context
+    """
+    return RunState(state_file(aur_path), refresh, fresh_for, aur_path)
+
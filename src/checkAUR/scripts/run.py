@@ -1,30 +1,83 @@
 #! /usr/bin/env python
-"""Executable scripts
+"""Executable scripts. Only modules needed for parsing arguments are imported at the start,
+so --help, --version and the root check return without loading GitPython and the stages
 """
 
 import argparse
+import sys
 from pathlib import Path
 
-from checkAUR.common.custom_logging import logger
-from checkAUR.aur_path import set_aur_path
+from checkAUR import __version__
+from checkAUR.common.custom_logging import logger, setup_logging, LOG_LEVELS
 from checkAUR.check_user import check_if_root
-from checkAUR.__main__ import run_main
+from checkAUR.common.data_classes import RunOptions, PACMAN_DB_PATH, GIT_ENGINES, AUR_RPC_URL, FRESH_FOR, \
+    MAX_JOBS, OUTPUT_FORMATS
 
 
 def main_cli():
     """Main CLI launcher
     """
-    logger.debug("CLI interface start")
-    if check_if_root():
-        return
-
-    logger.debug("Setting parser")
-
     parser = argparse.ArgumentParser(usage="%(prog)s [options]")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
     parser.add_argument("-s", "--set", type=Path, nargs=1, help="set AUR repos localization", metavar="/dir/path")
     parser.add_argument("-i", "--ignore", action="store_false", help="ignore checkrebuild command")
+    parser.add_argument("--checkrebuild", action="store_true",
+        help="run checkrebuild script from rebuild-detector instead of the built-in detector")
+    parser.add_argument("--dbpath", type=Path, default=PACMAN_DB_PATH, help="pacman's database location", metavar="/dir/path")
+    parser.add_argument("--engine", choices=GIT_ENGINES, default=GIT_ENGINES[0], help="engine used for pulling repos")
+    parser.add_argument("-j", "--jobs", type=int, default=10, help="number of repos fetched at once at the start", metavar="N")
+    parser.add_argument("--max-jobs", type=int, default=MAX_JOBS,
+        help="most repos fetched at once, the number adapts to latency and errors between 1 and this", metavar="N")
+    parser.add_argument("--host-rate", type=float, default=None,
+        help="most fetches started per second to one remote host", metavar="N")
+    parser.add_argument("--fetch-only", action="store_true", help="only fetch repos, without updating their working trees")
+    parser.add_argument("--refresh", action="store_true", help="ignore state saved by previous runs and check every repo")
+    parser.add_argument("--fresh-for", type=float, default=FRESH_FOR,
+        help="do not fetch repos fetched less than this many seconds ago, by default every repo is fetched",
+        metavar="SECONDS")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds after which a git command is killed", metavar="SECONDS")
+    parser.add_argument("--deadline", type=float, default=None, help="seconds after which pulling stops", metavar="SECONDS")
+    parser.add_argument("--retries", type=int, default=2, help="number of repeated attempts of failed fetch", metavar="N")
+    parser.add_argument("--include-orphans", action="store_true", help="pull also repos of packages which are not installed")
+    parser.add_argument("--rpc", action="store_true", help="ask AUR RPC for versions and fetch only outdated repos")
+    parser.add_argument("--rpc-url", default=AUR_RPC_URL, help="AUR RPC 'info' endpoint", metavar="URL")
+    parser.add_argument("--vercmp-check", action="store_true", help="cross-check version comparisons with pacman's vercmp")
+    parser.add_argument("--metrics-file", type=Path, default=None,
+        help="write metrics of the run in node_exporter textfile format", metavar="/dir/checkaur.prom")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMATS[0],
+        help="output for the user, one JSON report, or JSON lines of events followed by the report")
+    parser.add_argument("--profile", type=Path, default=None,
+        help="write trace of the run in Chrome trace format and print time spent per operation", metavar="trace.json")
+    parser.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS, default=None,
+        help="level of messages written to the log file, defaults to $CHECKAUR_LOG_LEVEL or WARNING")
+    parser.add_argument("--log-file", type=Path, default=None,
+        help="log file, defaults to checkAUR.log in $XDG_STATE_HOME/checkAUR", metavar="/dir/file.log")
 
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("number of jobs has to be positive")
+    if args.max_jobs < args.jobs:
+        parser.error("maximal number of jobs can't be lower than the number of jobs")
+    if args.host_rate is not None and args.host_rate <= 0:
+        parser.error("rate of fetches has to be positive")
+    if args.fresh_for < 0:
+        parser.error("time of keeping repos fresh can't be negative")
+    if args.timeout <= 0 or (args.deadline is not None and args.deadline <= 0):
+        parser.error("timeout and deadline have to be positive")
+    if args.retries < 0:
+        parser.error("number of retries can't be negative")
+
+    setup_logging(args.log_level, args.log_file)
+    logger.debug("CLI interface start")
+    if check_if_root():
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from checkAUR.aur_path import set_aur_path
+    from checkAUR.common.vercmp import set_cross_check
+    from checkAUR.common.tracing import enable_tracing, disable_tracing
+    from checkAUR.__main__ import run_main
+
     if args.set:
         logger.debug("Setting AUR localization")
         if not set_aur_path(Path(args.set[0])):
@@ -32,7 +85,31 @@ def main_cli():
         else:
             logger.debug("Setting AUR successful.")
 
-    run_main(ignore=args.ignore)
+    set_cross_check(args.vercmp_check)
+
+    options = RunOptions(db_path=args.dbpath, git_engine=args.engine, jobs=args.jobs, max_jobs=args.max_jobs,
+        host_rate=args.host_rate,
+        fetch_only=args.fetch_only, refresh=args.refresh, rpc_url=args.rpc_url if args.rpc else None,
+        include_orphans=args.include_orphans, fresh_for=args.fresh_for, timeout=args.timeout,
+        deadline=args.deadline, retries=args.retries, external_checkrebuild=args.checkrebuild,
+        metrics_path=args.metrics_file)
+    if args.profile is None:
+        run_main(ignore=args.ignore, options=options, output_format=args.format)
+        return
+    tracer = enable_tracing()
+    try:
+        run_main(ignore=args.ignore, options=options, output_format=args.format)
+    finally:
+        disable_tracing()
+        tracer.print_summary()
+        try:
+            tracer.write_chrome_trace(args.profile)
+        except OSError as exc:
+            message = f"Trace could not be written: {exc}"
+            print(message, file=sys.stderr)
+            logger.error(message)
+        else:
+            print(f"Trace written to {args.profile.as_posix()}, open it in https://ui.perfetto.dev", file=sys.stderr)
 
 
 if __name__ == "__main__":
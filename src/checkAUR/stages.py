@@ -0,0 +1,120 @@
+"""Module running independent stages of the program concurrently
+"""
+
+from typing import NamedTuple, Callable, Any, Optional, Collection
+import concurrent.futures
+import threading
+import time
+
+from checkAUR.common.custom_logging import logger
+from checkAUR.common.report import StageTiming
+from checkAUR.common.tracing import span
+from checkAUR.progress import ProgressListener, ProgressEvent, no_progress, STAGE_DONE
+
+
+class StageResult(NamedTuple):
+    """result of a single stage
+
+    Attributes:
+        name (str): name of the stage
+        value (Any): value returned by the stage, None if it failed
+        duration (float): wall time of the stage in seconds
+        error (Optional[BaseException]): exception raised by the stage, None if successful
+    """
+    name: str
+    value: Any
+    duration: float
+    error: Optional[BaseException] = None
+
+    def unwrap(self) -> Any:
+        """get the value of the stage
+
+        Raises:
+            BaseException: exception raised by the stage, if it failed
+
+        Returns:
+            Any: value returned by the stage
+        """
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _timed_stage(name: str, stage: Callable[[], Any], progress: ProgressListener) -> StageResult:
+    logger.debug("Stage %s started", name)
+    start = time.perf_counter()
+    try:
+        with span(f"stage {name}", "stage"):
+            value = stage()
+    except Exception as exc: # pylint: disable=broad-exception-caught
+        duration = time.perf_counter() - start
+        logger.debug("Stage %s failed after %.3f s", name, duration)
+        progress(ProgressEvent(STAGE_DONE, name, detail=f"failed after {duration:.2f} s"))
+        return StageResult(name=name, value=None, duration=duration, error=exc)
+    duration = time.perf_counter() - start
+    logger.debug("Stage %s finished in %.3f s", name, duration)
+    progress(ProgressEvent(STAGE_DONE, name, detail=f"{duration:.2f} s"))
+    return StageResult(name=name, value=value, duration=duration)
+
+
+def run_stages(stages: dict[str, Callable[[], Any]],
+    progress: ProgressListener = no_progress
+) -> dict[str, StageResult]:
+    """run all stages concurrently and wait for all of them to finish
+
+    Args:
+        stages (dict[str, Callable[[], Any]]): stage names with functions producing their results
+        progress (ProgressListener, optional): gets done event of every stage as soon as it finishes.
+            Defaults to no_progress.
+
+    Returns:
+        dict[str, StageResult]: results of the stages, in the order of the given stages
+    """
+    if not stages:
+        return {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(stages),
+        thread_name_prefix="checkAUR-stage") as executor:
+        futures: dict[str, concurrent.futures.Future] = \
+            {name: executor.submit(_timed_stage, name, stage, progress) for name, stage in stages.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def run_once[T](function: Callable[[], T]) -> Callable[[], T]:
+    """wrap function, so it runs only once, even if stages call it at the same time.
+    Later calls wait for the first one and get its result or exception
+
+    Args:
+        function (Callable[[], T]): function to wrap
+
+    Returns:
+        Callable[[], T]: function returning the shared result
+    """
+    lock = threading.Lock()
+    outcome: list[tuple[Optional[T], Optional[Exception]]] = []
+
+    def shared() -> T:
+        with lock:
+            if not outcome:
+                try:
+                    outcome.append((function(), None))
+                except Exception as exc: # pylint: disable=broad-exception-caught
+                    outcome.append((None, exc))
+        value, error = outcome[0]
+        if error is not None:
+            raise error
+        return value # type: ignore [return-value]
+    return shared
+
+
+def print_stage_times(timings: Collection[StageTiming]) -> None:
+    """print wall time of every stage
+
+    Args:
+        timings (Collection[StageTiming]): wall times of the stages
+    """
+    if not timings:
+        return
+    print("Stage times:")
+    for timing in timings:
+        status = " (failed)" if timing.failed else ""
+        print(f"\t{timing.name}: {timing.duration:.2f} s{status}")
@@ -1,17 +1,28 @@
-"""Module responsible for Git operations
+"""Module responsible for Git operations. GitPython is imported at first use, so the asyncio engine,
+the CLI and the other stages don't load it
 """
 
-from typing import Optional
+from typing import Optional, Collection, Callable, Any, TYPE_CHECKING
+from functools import partial
 from pathlib import Path
-import os
 import concurrent.futures
-
-from git import Repo
-import git.exc
+import time
 
 from checkAUR.common.custom_logging import logger
 from checkAUR.common.exceptions import ProgramNotInstalledError
-from checkAUR.common.package import Package, read_pkgbuild
+from checkAUR.common.package import Package, read_repo_packages, packages_from_metadata, scan_aur_folder
+from checkAUR.common.srcinfo import parse_content
+from checkAUR.common.tracing import span, traced
+from checkAUR.cat_file import CatFileBatch
+from checkAUR.git_refs import find_git_dir, read_config, is_bare, has_remote, read_head, read_upstream, remote_url
+from checkAUR.run_state import RunState, RepoState, validation_key
+from checkAUR.deadlines import PullLimits, PullSummary, Deadline, call_with_retries
+from checkAUR.concurrency import FetchLimiter, AdaptiveLimit, remote_host
+from checkAUR.progress import ProgressListener, ProgressEvent, no_progress, REPO_STARTED, REPO_FETCHED, \
+    REPO_UPDATED, REPO_FAILED, REPO_TIMED_OUT
+
+if TYPE_CHECKING:
+    from git import Repo
 
 
 def check_pkg_build(repo_path: Path) -> bool:
@@ -27,8 +38,8 @@ def check_pkg_build(repo_path: Path) -> bool:
     return bool(pkgbuild_file.exists() and pkgbuild_file.is_file())
 
 
-def check_if_correct_repo(repo_path: Path) -> Optional[Repo]:
-    """check if repo has parameters expected from AUR
+def validate_repo(repo_path: Path) -> Optional[Path]:
+    """check if repo has parameters expected from AUR, reading the repository files directly
 
     Args:
         repo_path (Path): absolute path to the repository
@@ -36,15 +47,72 @@ def check_if_correct_repo(repo_path: Path) -> Optional[Repo]:
     Raises:
         OSError: if no repo in the directory
         ValueError: if no directory at the path
-        ProgramNotInstalledError: if Git is not installed
 
     Returns:
-        Optional[Repo]: Repo object if it's correct, None if it's not
+        Optional[Path]: path to the git directory if repo is correct, None if it's not
     """
     assert isinstance(repo_path, Path)
     logger.debug("Checking repo in %s", repo_path.as_posix())
+    if not repo_path.is_dir():
+        message = f"Given directory {repo_path.as_posix()} does not exist"
+        logger.error(message)
+        raise ValueError(message)
+
+    git_dir: Optional[Path] = find_git_dir(repo_path)
+    if git_dir is None:
+        message = f"No repo in {repo_path.as_posix()}"
+        logger.error(message)
+        raise OSError(message)
+
+    config = read_config(git_dir)
+    if git_dir == repo_path or is_bare(git_dir, config):
+        logger.warning("The repo in %s is bare", repo_path.as_posix())
+        return None
+
+    if not has_remote(git_dir, "origin", config):
+        logger.warning("The repo in %s does not have the origin", repo_path.as_posix())
+        return None
+
+    if not check_pkg_build(repo_path):
+        logger.warning("The repo in %s does not have PKGBUILD file", repo_path.as_posix())
+        return None
+
+    return git_dir
+
+
+def validate_with_state(repo_path: Path, state: Optional[RunState] = None) -> Optional[Path]:
+    """check if repo has parameters expected from AUR, reusing result of the last run
+    if the git config and PKGBUILD did not change since
+
+    Args:
+        repo_path (Path): absolute path to the repository
+        state (Optional[RunState], optional): state of the AUR folder. Defaults to None.
+
+    Raises:
+        OSError: if no repo in the directory
+        ValueError: if no directory at the path
+
+    Returns:
+        Optional[Path]: path to the git directory if repo is correct, None if it's not
+    """
+    if state is None:
+        return validate_repo(repo_path)
+    git_dir: Optional[Path] = find_git_dir(repo_path)
+    repo_state: Optional[RepoState] = state.get(repo_path.name)
+    if git_dir is not None and repo_state is not None \
+        and repo_state.validation_key == validation_key(repo_path, git_dir):
+        logger.debug("Reusing validation of %s", repo_path.as_posix())
+        return git_dir if repo_state.valid else None
+    result = validate_repo(repo_path)
+    assert git_dir is not None
+    state.update(repo_path.name, validation_key=validation_key(repo_path, git_dir), valid=result is not None)
+    return result
+
+
+def _open_repo(repo_path: Path) -> "Repo":
+    import git # pylint: disable=import-outside-toplevel
     try:
-        repo = Repo(repo_path.as_posix())
+        return git.Repo(repo_path.as_posix())
     except git.exc.InvalidGitRepositoryError as exc:
         message = f"No repo in {repo_path.as_posix()}"
         logger.error(message)
@@ -54,88 +122,279 @@ def check_if_correct_repo(repo_path: Path) -> Optional[Repo]:
         logger.error(message)
         raise ValueError(message) from exc
     except git.exc.GitCommandNotFound as exc:
-        message = "Git not installed!"
-        print(message)
-        logger.critical(message)
+        logger.critical("Git not installed!")
         raise ProgramNotInstalledError("Git") from exc
 
-    if repo.bare:
-        message = "The repo is bare"
-        print(message)
-        logger.warning(message)
-        return None
 
-    if not repo.remotes.origin.exists():
-        message = "The repo does not have the origin"
-        print(message)
-        logger.warning(message)
-        return None
+def check_if_correct_repo(repo_path: Path, state: Optional[RunState] = None) -> Optional["Repo"]:
+    """check if repo has parameters expected from AUR
 
-    if not check_pkg_build(repo_path):
-        message = "The repo does not have PKGBUILD file"
-        print(message)
-        logger.warning(message)
+    Args:
+        repo_path (Path): absolute path to the repository
+        state (Optional[RunState], optional): state of the AUR folder. Defaults to None.
+
+    Raises:
+        OSError: if no repo in the directory
+        ValueError: if no directory at the path
+        ProgramNotInstalledError: if Git is not installed
+
+    Returns:
+        Optional[Repo]: Repo object if it's correct, None if it's not
+    """
+    if validate_with_state(repo_path, state) is None:
         return None
+    return _open_repo(repo_path)
 
-    return repo
+
+def _run_with_timeout(command: Callable[..., Any], args: tuple[str,...], timeout: float) -> bool:
+    import git.exc # pylint: disable=import-outside-toplevel
+    start = time.monotonic()
+    try:
+        command(*args, kill_after_timeout=timeout)
+    except git.exc.GitCommandError as exc:
+        if time.monotonic() - start >= timeout:
+            raise TimeoutError(f"git did not finish in {timeout:.1f} s") from exc
+        return False
+    return True
+
+
+def _fetched_size(repo: "Repo", old_tip: Optional[str], new_tip: Optional[str]) -> int:
+    if new_tip is None or new_tip == old_tip:
+        return 0
+    import git.exc # pylint: disable=import-outside-toplevel
+    try:
+        return int(repo.git.rev_list("--objects", "--disk-usage", new_tip, *([f"^{old_tip}"] if old_tip else [])))
+    except (git.exc.GitCommandError, ValueError):
+        return 0
 
 
-def pull_repo(repo_path: Path) -> bool:
-    """perform 'git pull' on one repository under the given path
+@traced(category="git")
+def pull_repo(repo_path: Path, fetch_only: bool = False, state: Optional[RunState] = None,
+    limits: PullLimits = PullLimits(), deadline: Optional[Deadline] = None, limiter: Optional[FetchLimiter] = None,
+    progress: ProgressListener = no_progress
+) -> bool:
+    """perform 'git pull' on one repository under the given path.
+    Fetch and fast-forward run as plain git commands, without GitPython's remote and progress handling.
+    Whether anything changed is decided from the refs on disk, so only fetch runs git if nothing did.
+    With the run state, fetch is skipped for repos fetched recently enough, see RunState.is_fresh.
+    Failed fetch is repeated with backoff, every git command is killed after the timeout
 
     Args:
         repo_path (Path): path to the repo's folder
+        fetch_only (bool, optional): if working tree should be left untouched. Defaults to False.
+        state (Optional[RunState], optional): state of the AUR folder. Defaults to None.
+        limits (PullLimits, optional): timeout and retries of git commands. Defaults to PullLimits().
+        deadline (Optional[Deadline], optional): deadline of the whole pull. Defaults to None.
+        limiter (Optional[FetchLimiter], optional): limiter every fetch attempt waits for.
+            Defaults to None, meaning fetch starts at once.
+        progress (ProgressListener, optional): gets fetched and failed events of the repo.
+            Defaults to no_progress.
 
     Returns:
         bool: True if operation was successful, False if not
     
     Raises:
         ProgramNotInstalledError: if Git is not installed
+        TimeoutError: if git did not finish in time
     """
     assert isinstance(repo_path, Path)
+    deadline = Deadline() if deadline is None else deadline
     try:
-        repo: Optional[Repo] = check_if_correct_repo(repo_path)
+        with span("validate", "git", repo=repo_path.name):
+            repo: Optional["Repo"] = check_if_correct_repo(repo_path, state)
     except (OSError, ValueError):
-        return False
+        repo = None
     except ProgramNotInstalledError as exc:
         raise ProgramNotInstalledError(exc.program) from exc
 
     if repo is None:
+        progress(ProgressEvent(REPO_FAILED, repo_path.name, detail="not a valid AUR repo"))
         return False
 
-    result: list[git.FetchInfo] = repo.remotes.origin.fetch()
-    if result[0].commit.hexsha == repo.head.commit.hexsha:
-        return False
-    try:
-        repo.remotes.origin.pull()
-    except git.exc.GitCommandError:
-        return False
-    return True
+    git_dir = Path(repo.git_dir)
+    old_tip = read_upstream(git_dir)
+    if state is not None and state.is_fresh(repo_path.name, read_head(git_dir), old_tip):
+        logger.debug("%s was fetched recently, skipping fetch", repo_path.as_posix())
+    else:
+        fetch = partial(_run_with_timeout, repo.git.fetch, ("--quiet", "--no-tags", "origin"))
+        if limiter is not None:
+            fetch = limiter.limited(fetch, remote_host(remote_url(git_dir)), deadline)
+        start = time.monotonic()
+        with span("fetch", "git", repo=repo_path.name):
+            fetched = call_with_retries(fetch, limits, deadline, f"fetch of {repo_path.name}")
+        if not fetched:
+            progress(ProgressEvent(REPO_FAILED, repo_path.name, detail="fetch failed"))
+            return False
+        if state is not None:
+            state.update(repo_path.name, checked_at=time.time())
+            state.record_fetch_time(repo_path.name, time.monotonic() - start)
+    new_tip = read_upstream(git_dir)
+    progress(ProgressEvent(REPO_FETCHED, repo_path.name, size=_fetched_size(repo, old_tip, new_tip)))
+
+    result = True
+    if new_tip == read_head(git_dir):
+        result = False
+    elif not fetch_only:
+        with span("fast-forward", "git", repo=repo_path.name):
+            merged = _run_with_timeout(repo.git.merge, ("--ff-only", "--quiet", "@{upstream}"),
+                deadline.clamp(limits.timeout))
+        if not merged:
+            progress(ProgressEvent(REPO_FAILED, repo_path.name, detail="fast-forward failed"))
+            return False
+    if state is not None:
+        state.update(repo_path.name, head=read_head(git_dir), remote_tip=read_upstream(git_dir))
+    return result
+
+
+def read_fetched_packages(repo_path: Path) -> set[Package]:
+    """read packages from the fetched upstream commit, without touching the working tree
+
+    Args:
+        repo_path (Path): path to the repo's folder
+
+    Raises:
+        ProgramNotInstalledError: if Git is not installed
+
+    Returns:
+        set[Package]: packages at the upstream commit, empty if they could not be read
+    """
+    git_dir: Optional[Path] = find_git_dir(repo_path)
+    revision: Optional[str] = None if git_dir is None else read_upstream(git_dir)
+    if revision is None:
+        return set()
+    with CatFileBatch(repo_path) as cat_file:
+        for file_name in (".SRCINFO", "PKGBUILD"):
+            try:
+                content = cat_file.read_text(f"{revision}:{file_name}")
+            except OSError:
+                return set()
+            if content is None:
+                continue
+            metadata = parse_content(file_name, content, repo_path.name)
+            if metadata is not None:
+                return packages_from_metadata(metadata)
+    return set()
+
 
+def read_pulled_packages(repo_path: Path, fetch_only: bool, state: Optional[RunState],
+    progress: ProgressListener = no_progress
+) -> set[Package]:
+    """read packages of the updated repo, from the fetched commit in fetch-only mode
 
-def pull_entire_aur(aur_path: Path) -> set[Package]:
-    """perform 'git pull' on user's entire AUR folder
+    Args:
+        repo_path (Path): path to the repo's folder
+        fetch_only (bool): if the working tree was left untouched
+        state (Optional[RunState]): state of the AUR folder, caching metadata of the repos
+        progress (ProgressListener, optional): gets updated event with the packages. Defaults to no_progress.
+
+    Raises:
+        ProgramNotInstalledError: if Git is not installed
+
+    Returns:
+        set[Package]: packages of the repo
+    """
+    if fetch_only:
+        packages = read_fetched_packages(repo_path)
+    elif state is None:
+        packages = read_repo_packages(repo_path)
+    else:
+        packages = state.read_packages(repo_path)
+    progress(ProgressEvent(REPO_UPDATED, repo_path.name, frozenset(packages)))
+    return packages
+
+
+def _pull_and_read(repo_path: Path, fetch_only: bool, state: Optional[RunState],
+    limits: PullLimits, deadline: Deadline, limiter: FetchLimiter, progress: ProgressListener
+) -> set[Package]:
+    progress(ProgressEvent(REPO_STARTED, repo_path.name))
+    if not pull_repo(repo_path, fetch_only, state, limits, deadline, limiter, progress):
+        return set()
+    return read_pulled_packages(repo_path, fetch_only, state, progress)
+
+
+def pull_aur_repos(aur_path: Path, max_workers: int = 10, fetch_only: bool = False,
+    state: Optional[RunState] = None, repos: Optional[Collection[str]] = None,
+    limits: PullLimits = PullLimits(), summary: Optional[PullSummary] = None,
+    limiter: Optional[FetchLimiter] = None, progress: ProgressListener = no_progress
+) -> dict[str, set[Package]]:
+    """perform 'git pull' on user's entire AUR folder, keeping the folder every package was pulled in.
+    Timeouts, the deadline and retries work as described in PullLimits
 
     Args:
         aur_path (Path): path to user's AUR folder
+        max_workers (int, optional): number of repos pulled at once, if there is no limiter. Defaults to 10.
+        fetch_only (bool, optional): if working trees should be left untouched. Defaults to False.
+        state (Optional[RunState], optional): state of the AUR folder. Defaults to None.
+        repos (Optional[Collection[str]], optional): names of repo folders to pull. Defaults to None, meaning all.
+        limits (PullLimits, optional): timeouts, deadline and retries. Defaults to PullLimits().
+        summary (Optional[PullSummary], optional): collects repos not pulled in time. Defaults to None.
+        limiter (Optional[FetchLimiter], optional): limiter of fetches. Defaults to None, meaning max_workers.
+        progress (ProgressListener, optional): gets events of every repo. Defaults to no_progress.
+
+    Raises:
+        ProgramNotInstalledError: if Git is not installed
 
     Returns:
-        set[Package]: tuple of pulled packages
+        dict[str, set[Package]]: pulled packages by names of the updated repo folders
     """
     assert isinstance(aur_path, Path)
-    folder_list: list[str] = os.listdir(aur_path)
-    repo_list: tuple[Path,...] = tuple(checked_path for element in folder_list \
-        if (checked_path := aur_path/element).is_dir(follow_symlinks=False))
-
-    pull_result: list[Package] = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        git_futures: dict[concurrent.futures.Future, Path] = \
-            {executor.submit(pull_repo, repo_path) : repo_path for repo_path in repo_list}
-        for future in concurrent.futures.as_completed(git_futures):
-            try:
-                if future.result():
-                    repo: Path = git_futures[future]
-                    pull_result.append(read_pkgbuild(repo))
-            except ProgramNotInstalledError as exc:
-                raise ProgramNotInstalledError(exc.program) from exc
-    return set(pull_result)
+    repo_list: tuple[Path,...] = tuple(repo_path for repo_path in scan_aur_folder(aur_path) \
+        if repos is None or repo_path.name in repos)
+    if state is not None:
+        repo_list = tuple(state.longest_first(repo_list))
+    summary = PullSummary() if summary is None else summary
+    limiter = FetchLimiter(AdaptiveLimit(max_workers, max_workers)) if limiter is None else limiter
+    deadline = Deadline(limits.deadline)
+
+    pull_result: dict[str, set[Package]] = {}
+    def collect(future: concurrent.futures.Future, name: str) -> None:
+        try:
+            packages = future.result()
+        except TimeoutError:
+            summary.add_timed_out(name)
+            progress(ProgressEvent(REPO_TIMED_OUT, name))
+        except ProgramNotInstalledError as exc:
+            raise ProgramNotInstalledError(exc.program) from exc
+        except Exception as exc: # pylint: disable=broad-exception-caught
+            logger.error("Pulling %s failed: %r", name, exc)
+            progress(ProgressEvent(REPO_FAILED, name, detail=str(exc) or type(exc).__name__))
+        else:
+            if packages:
+                pull_result[name] = packages
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=limiter.maximum)
+    try:
+        git_futures: dict[concurrent.futures.Future, Path] = {executor.submit(_pull_and_read,
+            repo_path, fetch_only, state, limits, deadline, limiter, progress) : repo_path for repo_path in repo_list}
+        running: set[concurrent.futures.Future] = set(git_futures)
+        try:
+            for future in concurrent.futures.as_completed(git_futures, timeout=deadline.remaining()):
+                running.discard(future)
+                collect(future, git_futures[future].name)
+        except TimeoutError:
+            # repos which did not start are dropped, running ones touch the state, so they are waited for.
+            # Their git commands are clamped to the deadline, so they end with TimeoutError soon
+            for future in list(running):
+                if future.cancel():
+                    running.discard(future)
+                    summary.add_timed_out(git_futures[future].name)
+                    progress(ProgressEvent(REPO_TIMED_OUT, git_futures[future].name))
+            for future in concurrent.futures.as_completed(running):
+                collect(future, git_futures[future].name)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return pull_result
+
+
+def pull_entire_aur(aur_path: Path, max_workers: int = 10, fetch_only: bool = False,
+    state: Optional[RunState] = None, repos: Optional[Collection[str]] = None,
+    limits: PullLimits = PullLimits(), summary: Optional[PullSummary] = None,
+    limiter: Optional[FetchLimiter] = None, progress: ProgressListener = no_progress
+) -> set[Package]:
+    """perform 'git pull' on user's entire AUR folder, arguments are the same as in pull_aur_repos
+
+    Returns:
+        set[Package]: pulled packages
+    """
+    return set().union(*pull_aur_repos(aur_path, max_workers, fetch_only, state, repos, limits,
+        summary, limiter, progress).values())
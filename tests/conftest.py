@@ -1,3 +1,91 @@
+from pathlib import Path
+import subprocess
+
+import pytest
+
 from checkAUR.common.custom_logging import logger # type: ignore [import-untyped]
+from checkAUR.common.srcinfo import metadata_cache # type: ignore [import-untyped]
+from checkAUR.aur_path import find_env_file # type: ignore [import-untyped]
 
 logger.debug("**** Tests ****")
+
+
+@pytest.fixture(autouse=True)
+def isolated_xdg_fixture(monkeypatch, tmp_path):
+    """keep caches and state files of the tests out of user's home
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", (tmp_path / "xdg_cache").as_posix())
+    monkeypatch.setenv("XDG_STATE_HOME", (tmp_path / "xdg_state").as_posix())
+    metadata_cache.clear()
+    find_env_file.cache_clear()
+
+
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "checkAUR",
+    "GIT_AUTHOR_EMAIL": "checkaur@localhost",
+    "GIT_COMMITTER_NAME": "checkAUR",
+    "GIT_COMMITTER_EMAIL": "checkaur@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+
+def run_git(*args: str, cwd: Path) -> str:
+    """run git command for preparing test repositories
+    """
+    result = subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+    return result.stdout.decode().strip()
+
+
+def write_pkgbuild(repo_path: Path, name: str, version: str) -> None:
+    """write minimal PKGBUILD into the repository
+    """
+    (repo_path / "PKGBUILD").write_text(f"pkgname={name}\npkgver={version}\npkgrel=1\n", encoding="utf-8")
+
+
+class AurTree:
+    """AUR folder with clones of local bare remotes
+    """
+    def __init__(self, root: Path):
+        self.aur_path = root / "aur"
+        self.remotes_path = root / "remotes"
+        self.work_path = root / "work"
+        for path in (self.aur_path, self.remotes_path, self.work_path):
+            path.mkdir()
+
+    def add_repo(self, name: str, version: str = "1.0") -> Path:
+        """create remote with one commit and clone it into the AUR folder
+        """
+        remote = self.remotes_path / f"{name}.git"
+        run_git("init", "--quiet", "--bare", "--initial-branch=master", remote.as_posix(), cwd=self.remotes_path)
+        work = self.work_path / name
+        run_git("clone", "--quiet", remote.as_posix(), work.as_posix(), cwd=self.work_path)
+        write_pkgbuild(work, name, version)
+        run_git("add", "PKGBUILD", cwd=work)
+        run_git("commit", "--quiet", "-m", version, cwd=work)
+        run_git("push", "--quiet", "origin", "HEAD:master", cwd=work)
+        clone = self.aur_path / name
+        run_git("clone", "--quiet", remote.as_posix(), clone.as_posix(), cwd=self.aur_path)
+        return clone
+
+    def push_version(self, name: str, version: str) -> None:
+        """push new version of the package to its remote
+        """
+        work = self.work_path / name
+        write_pkgbuild(work, name, version)
+        run_git("commit", "--quiet", "-am", version, cwd=work)
+        run_git("push", "--quiet", "origin", "HEAD:master", cwd=work)
+
+    def set_remote(self, name: str, url: str) -> None:
+        """point origin of the cloned repo to another URL
+        """
+        run_git("remote", "set-url", "origin", url, cwd=self.aur_path / name)
+
+
+@pytest.fixture(name="aur_tree")
+def aur_tree_fixture(monkeypatch, tmp_path):
+    """AUR folder backed by local bare remotes
+    """
+    for variable, value in GIT_IDENTITY.items():
+        monkeypatch.setenv(variable, value)
+    monkeypatch.setenv("HOME", tmp_path.as_posix())
+    return AurTree(tmp_path)
@@ -0,0 +1,110 @@
+"""Tests for the library interface and the formats of its report in the CLI
+"""
+
+from pathlib import Path
+import json
+
+import pytest
+
+from checkAUR.api import CheckConfig, check # type: ignore [import-untyped]
+from checkAUR.__main__ import run_main # type: ignore [import-untyped]
+from checkAUR.common.exceptions import ProgramNotInstalledError # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.common.report import CheckReport, PackageUpdate, UpdatedRepo, \
+    STAGE_FAILED # type: ignore [import-untyped]
+from checkAUR.progress import ProgressEvent, REPO_UPDATED # type: ignore [import-untyped]
+
+
+REPORT = CheckReport(aur_path=Path("/aur"),
+    updated_repos=(UpdatedRepo("package_1", (Package("package_1", "1.1"),)),),
+    awaiting_packages=(PackageUpdate("package_1", "1.0", "1.1"),),
+    invalid_packages=("package_2",), invalid_without_update=("package_2",))
+
+
+def test_check_report(monkeypatch, capsys, aur_tree):
+    """test that the checks return updated repos and packages to build, without printing anything
+    """
+    for name in ("package_1", "package_2", "package_3"):
+        aur_tree.add_repo(name)
+    aur_tree.push_version("package_1", "2.0")
+    monkeypatch.setattr("checkAUR.api.extract_local_packages",
+        lambda *_: {Package("package_1", "1.0-1"), Package("package_2", "1.0-1")})
+    monkeypatch.setattr("checkAUR.api.detect_rebuilds", lambda *_: {"package_2"})
+    monkeypatch.setattr("checkAUR.api.detect_abi_breakage", lambda *_: set())
+
+    report = check(CheckConfig(aur_path=aur_tree.aur_path))
+    assert capsys.readouterr().out == ""
+    assert report.updated_repos == (UpdatedRepo("package_1", (Package("package_1", "2.0-1"),)),)
+    assert report.awaiting_packages == (PackageUpdate("package_1", "1.0-1", "2.0-1"),)
+    assert report.invalid_packages == report.invalid_without_update == ("package_2",)
+    assert report.orphan_repos == ("package_3",)
+    assert not report.failures and report.has_work
+    assert {timing.name for timing in report.timings} == {"checkrebuild", "aur", "pacman"}
+    assert report.repos["updated"] == 1 and report.fetched_bytes > 0
+    content = json.loads(json.dumps(report.to_dict()))
+    assert content["aur_path"] == aur_tree.aur_path.as_posix()
+    assert content["awaiting_packages"] == [
+        {"name": "package_1", "installed_version": "1.0-1", "available_version": "2.0-1"}]
+
+
+def test_check_failures(monkeypatch, capsys):
+    """test that failed stages are reported, and their results are not mistaken for empty ones
+    """
+    def failing_stage(*_):
+        raise ProgramNotInstalledError("checkrebuild")
+    def missing_env():
+        raise EnvironmentError("no .env")
+
+    monkeypatch.setattr("checkAUR.api.load_env", missing_env)
+    monkeypatch.setattr("checkAUR.api.detect_rebuilds", failing_stage)
+
+    report = check()
+    assert capsys.readouterr().out == ""
+    assert report.aur_path is None
+    assert report.invalid_packages is None and report.awaiting_packages is None
+    assert [(failure.name, failure.kind) for failure in report.failures] == \
+        [("aur", STAGE_FAILED), ("checkrebuild", STAGE_FAILED)]
+    assert not report.has_work
+    assert json.loads(json.dumps(report.to_dict()))["failures"][1]["detail"] == \
+        "checkrebuild could not be launched, probably it's not installed"
+
+
+def test_cli_json(monkeypatch, capsys):
+    """test that JSON format prints only the report
+    """
+    monkeypatch.setattr("checkAUR.__main__.check", lambda *_: REPORT)
+    monkeypatch.setattr("checkAUR.__main__.copy_aur_wd", lambda _: pytest.fail("command copied"))
+    run_main(ignore=True, output_format="json")
+    content = json.loads(capsys.readouterr().out)
+    assert content["invalid_packages"] == ["package_2"]
+    assert content["updated_repos"][0]["packages"][0]["version"] == "1.1"
+
+
+def test_cli_ndjson(monkeypatch, capsys):
+    """test that JSON lines format prints events as they happen, followed by the report
+    """
+    def fake_check(_config, progress):
+        progress(ProgressEvent(REPO_UPDATED, "package_1", frozenset({Package("package_1", "1.1")})))
+        return REPORT
+
+    monkeypatch.setattr("checkAUR.__main__.check", fake_check)
+    run_main(ignore=True, output_format="ndjson")
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert lines[0] == {"event": REPO_UPDATED, "name": "package_1",
+        "packages": [{"name": "package_1", "version": "1.1"}], "detail": "", "size": 0}
+    assert lines[1]["event"] == "report"
+    assert lines[1]["awaiting_packages"][0]["available_version"] == "1.1"
+    assert len(lines) == 2
+
+
+def test_cli_text(monkeypatch, capsys):
+    """test that text format renders the report for the user
+    """
+    copied: list[Path] = []
+    monkeypatch.setattr("checkAUR.__main__.check", lambda *_: REPORT)
+    monkeypatch.setattr("checkAUR.__main__.copy_aur_wd", copied.append)
+    run_main(ignore=True)
+    output = capsys.readouterr().out
+    assert "Starting checkrebuild..." in output
+    assert "\tpackage_1 1.0 to 1.1" in output
+    assert copied == [Path("/aur")]
@@ -0,0 +1,102 @@
+"""Tests for asyncio based Git engine
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from checkAUR import async_git # type: ignore [import-untyped]
+from checkAUR import use_git # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.common.exceptions import ProgramNotInstalledError # type: ignore [import-untyped]
+
+
+def test_pull_updated_repos(aur_tree):
+    """test that only repos with new commits on remote are fast-forwarded
+    """
+    for name in ("package_1", "package_2", "package_3"):
+        aur_tree.add_repo(name)
+    aur_tree.push_version("package_2", "2.0")
+
+    assert async_git.pull_entire_aur(aur_tree.aur_path, concurrency=2) == {Package("package_2", "2.0-1")}
+    assert "pkgver=2.0" in (aur_tree.aur_path / "package_2" / "PKGBUILD").read_text(encoding="utf-8")
+    assert not async_git.pull_entire_aur(aur_tree.aur_path)
+
+
+def test_engines_equal(aur_tree):
+    """test that both engines report the same pulled packages
+    """
+    for name in ("package_1", "package_2", "package_3"):
+        aur_tree.add_repo(name)
+    aur_tree.push_version("package_1", "1.1")
+    aur_tree.push_version("package_2", "2.0")
+    expected = {Package("package_1", "1.1-1"), Package("package_2", "2.0-1")}
+
+    assert use_git.pull_entire_aur(aur_tree.aur_path) == expected
+    for name in ("package_1", "package_2"):
+        asyncio.run(async_git.run_git(aur_tree.aur_path / name, "reset", "--quiet", "--hard", "HEAD~1"))
+    assert async_git.pull_entire_aur(aur_tree.aur_path) == expected
+
+
+@pytest.mark.parametrize("content", ["no_git", "no_pkgbuild", "file"], scope="function")
+def test_incorrect_repos(aur_tree, content):
+    """test skipping folders which are not AUR repos
+    """
+    if content == "no_git":
+        (aur_tree.aur_path / "folder").mkdir()
+        (aur_tree.aur_path / "folder" / "PKGBUILD").touch()
+    elif content == "no_pkgbuild":
+        clone = aur_tree.add_repo("package_1")
+        (clone / "PKGBUILD").unlink()
+    else:
+        (aur_tree.aur_path / "file").touch()
+    assert not async_git.pull_entire_aur(aur_tree.aur_path)
+
+
+def test_missing_remote(aur_tree):
+    """test that unreachable remote is reported as not pulled
+    """
+    aur_tree.add_repo("package_1")
+    (aur_tree.remotes_path / "package_1.git").rename(aur_tree.remotes_path / "moved.git")
+    assert not async_git.pull_entire_aur(aur_tree.aur_path)
+
+
+def test_git_not_installed(monkeypatch, tmp_path):
+    """test reaction for missing git executable
+    """
+    async def raise_not_found(*_, **__):
+        raise FileNotFoundError
+
+    monkeypatch.setattr("checkAUR.async_git.asyncio.create_subprocess_exec", raise_not_found)
+    with pytest.raises(ProgramNotInstalledError):
+        asyncio.run(async_git.run_git(tmp_path, "status"))
+
+
+def test_fetch_only(aur_tree):
+    """test that fetch-only mode reads new version without touching the working tree
+    """
+    clone = aur_tree.add_repo("package_1")
+    aur_tree.add_repo("package_2")
+    aur_tree.push_version("package_1", "2.0")
+    head = (clone / ".git" / "refs" / "heads" / "master").read_text(encoding="utf-8")
+
+    assert async_git.pull_entire_aur(aur_tree.aur_path, fetch_only=True) == {Package("package_1", "2.0-1")}
+    assert "pkgver=1.0" in (clone / "PKGBUILD").read_text(encoding="utf-8")
+    assert (clone / ".git" / "refs" / "heads" / "master").read_text(encoding="utf-8") == head
+
+
+def test_packages_read_off_loop(monkeypatch, aur_tree):
+    """test that packages of updated repos are read outside of the event loop's thread
+    """
+    threads = []
+    read_packages = async_git.read_pulled_packages
+    def recording(*args):
+        threads.append(threading.get_ident())
+        return read_packages(*args)
+
+    aur_tree.add_repo("package_1")
+    aur_tree.push_version("package_1", "2.0")
+    monkeypatch.setattr("checkAUR.async_git.read_pulled_packages", recording)
+    assert async_git.pull_entire_aur(aur_tree.aur_path, fetch_only=True) == {Package("package_1", "2.0-1")}
+    assert threads and threading.get_ident() not in threads
@@ -5,7 +5,7 @@ import os
 import pytest
 
 from checkAUR.aur_path import set_aur_path,setting_path_env_variable # type: ignore [import-untyped]
-from checkAUR.aur_path import load_env # type: ignore [import-untyped]
+from checkAUR.aur_path import load_env, find_env_file # type: ignore [import-untyped]
 from checkAUR.common.data_classes import EnvVariables # type: ignore [import-untyped]
 
 
@@ -22,7 +22,7 @@ def test_no_env(monkeypatch):
     """test no access to environment variables
     """
     monkeypatch.delenv("aur_path", raising=False)
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.find_dotenv", raise_io_exception, raising=True)
+    monkeypatch.setattr("dotenv.find_dotenv", raise_io_exception, raising=True)
     assert os.environ.get("aur_path", ROOT_PATH.as_posix())
 
 
@@ -33,7 +33,7 @@ def test_only_dotenv(monkeypatch):
         monkeypatch.setenv("aur_path", ROOT_PATH.as_posix())
 
     monkeypatch.delenv("aur_path", raising=False)
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.set_key", mock_aur_path)
+    monkeypatch.setattr("dotenv.set_key", mock_aur_path)
 
     setting_path_env_variable(aur_path=ROOT_PATH)
     assert os.environ.get("aur_path") is ROOT_PATH.as_posix()
@@ -42,7 +42,7 @@ def test_only_dotenv(monkeypatch):
 def test_only_environ(monkeypatch):
     """test only system environment variable
     """
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.find_dotenv", raise_io_exception, raising=True)
+    monkeypatch.setattr("dotenv.find_dotenv", raise_io_exception, raising=True)
     monkeypatch.setenv("aur_path", ROOT_PATH.as_posix())
 
     setting_path_env_variable(aur_path=ROOT_PATH)
@@ -56,7 +56,7 @@ def test_both_env_var(monkeypatch):
         monkeypatch.setenv("aur_path", ROOT_PATH.as_posix())
 
     monkeypatch.setenv("aur_path", ROOT_PATH.as_posix())
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.set_key", mock_aur_path)
+    monkeypatch.setattr("dotenv.set_key", mock_aur_path)
 
     setting_path_env_variable(aur_path=ROOT_PATH)
     assert os.environ.get("aur_path") is ROOT_PATH.as_posix()
@@ -127,9 +127,10 @@ def test_load_env_error(monkeypatch, dotenv_status, variable_status):
     def mock_find_dotenv(**_):
         if not dotenv_status:
             raise IOError
+        return "/.env"
 
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.find_dotenv", mock_find_dotenv)
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.load_dotenv", lambda *_: "/")
+    monkeypatch.setattr("dotenv.find_dotenv", mock_find_dotenv)
+    monkeypatch.setattr("dotenv.load_dotenv", lambda *_: "/")
     if variable_status:
         monkeypatch.setenv("aur_path", "value")
     else:
@@ -149,15 +150,32 @@ def test_load_env(monkeypatch, dotenv_status, env_status):
     def mock_find_dotenv(**_):
         if not dotenv_status:
             raise IOError
+        return "/.env"
 
     def mock_load_dotenv(*_):
         if not env_status:
             monkeypatch.setenv("aur_path", "/")
 
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.find_dotenv", mock_find_dotenv)
-    monkeypatch.setattr("checkAUR.aur_path.dotenv.load_dotenv", mock_load_dotenv)
+    monkeypatch.setattr("dotenv.find_dotenv", mock_find_dotenv)
+    monkeypatch.setattr("dotenv.load_dotenv", mock_load_dotenv)
     if env_status:
         monkeypatch.setenv("aur_path", "/")
     else:
         monkeypatch.delenv("aur_path")
     assert load_env() == EnvVariables(aur_path=Path("/"))
+
+
+def test_find_env_file_once(monkeypatch, tmp_path):
+    """test that .env file is searched for once, when setting the path and loading it in one run
+    """
+    calls: list[bool] = []
+    def mock_find_dotenv(**_):
+        calls.append(True)
+        return (tmp_path / ".env").as_posix()
+
+    monkeypatch.setattr("dotenv.find_dotenv", mock_find_dotenv)
+    monkeypatch.setattr("dotenv.set_key", lambda *_: monkeypatch.setenv("aur_path", "/"))
+    setting_path_env_variable(aur_path=ROOT_PATH)
+    assert load_env() == EnvVariables(aur_path=ROOT_PATH)
+    assert find_env_file() == (tmp_path / ".env").as_posix()
+    assert len(calls) == 1
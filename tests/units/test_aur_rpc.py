@@ -0,0 +1,193 @@
+"""Tests for checking versions with AUR RPC, against a local stand-in server
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import hashlib
+import json
+import threading
+
+import pytest
+
+from checkAUR.aur_rpc import AurRpcClient, batch_names, find_outdated_repos, \
+    check_with_rpc # type: ignore [import-untyped]
+from checkAUR.common.exceptions import AurRpcError # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.use_git import pull_entire_aur # type: ignore [import-untyped]
+from checkAUR.api import update_aur # type: ignore [import-untyped]
+from checkAUR.common.data_classes import RunOptions # type: ignore [import-untyped]
+
+
+class FakeAur:
+    """stand-in AUR RPC server, recording requests and connections
+    """
+    def __init__(self, packages: dict[str, tuple[str, str]]):
+        self.packages = packages
+        self.requests: list[list[str]] = []
+        self.connections: set[int] = set()
+        self.not_modified = 0
+        self.broken = False
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """handler of 'info' requests
+            """
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self): # pylint: disable=invalid-name
+                """answer info request
+                """
+                fake.connections.add(self.client_address[1])
+                names = parse_qs(urlsplit(self.path).query).get("arg[]", [])
+                fake.requests.append(names)
+                if fake.broken:
+                    body = b"not json"
+                else:
+                    results = [{"Name": name, "PackageBase": fake.packages[name][0], "Version": fake.packages[name][1]}
+                        for name in names if name in fake.packages]
+                    body = json.dumps({"version": 5, "type": "multiinfo", "resultcount": len(results),
+                        "results": results}).encode()
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    fake.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_): # pylint: disable=arguments-differ
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/rpc/v5/info"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """stop the server
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(name="fake_aur")
+def fake_aur_fixture():
+    """stand-in AUR RPC server with a few packages
+    """
+    fake = FakeAur({f"package_{number}": (f"package_{number}", "2.0-1") for number in range(400)})
+    fake.packages["python-split"] = ("split", "1.0-2")
+    fake.packages["split"] = ("split", "1.0-2")
+    yield fake
+    fake.stop()
+
+
+@pytest.mark.parametrize("count, max_names, batches", [
+    (0, 150, 0),
+    (10, 150, 1),
+    (150, 150, 1),
+    (151, 150, 2),
+    (400, 100, 4),
+], scope="function")
+def test_batch_names(count, max_names, batches):
+    """test splitting names into requests
+    """
+    names = [f"package_{number}" for number in range(count)]
+    result = list(batch_names(names, max_names))
+    assert len(result) == batches
+    assert sorted(name for batch in result for name in batch) == sorted(names)
+
+
+def test_batch_length():
+    """test that query string stays under the limit
+    """
+    names = [f"very-long-package-name-{number:04d}" for number in range(500)]
+    for batch in batch_names(names, max_names=1000, max_length=1000):
+        assert len("&".join(f"arg%5B%5D={name}" for name in batch)) <= 1000
+
+
+def test_info_single_connection(fake_aur):
+    """test that all batches are sent over one kept-alive connection
+    """
+    with AurRpcClient(fake_aur.url) as client:
+        result = client.info(f"package_{number}" for number in range(400))
+    assert len(result) == 400
+    assert result["package_7"] == Package("package_7", "2.0-1")
+    assert len(fake_aur.requests) == 3
+    assert len(fake_aur.connections) == 1
+
+
+def test_info_etag(fake_aur):
+    """test that unchanged responses are served from cache
+    """
+    with AurRpcClient(fake_aur.url) as client:
+        first = client.info(["package_1", "package_2"])
+    with AurRpcClient(fake_aur.url) as client:
+        second = client.info(["package_1", "package_2"])
+    assert first == second
+    assert fake_aur.not_modified == 1
+
+
+def test_find_outdated_repos(fake_aur):
+    """test that only repos with newer version in AUR are selected, by name of their folder
+    """
+    repo_packages = {
+        "package_1": {Package("package_1", "1.0-1", base="package_1")},
+        "package_2": {Package("package_2", "2.0-1", base="package_2")},
+        "package_3": {Package("package_3", "3.0-1", base="package_3")},
+        "split-clone": {Package("split", "1.0-1", base="split"), Package("python-split", "1.0-1", base="split")},
+        "removed": {Package("removed", "1.0-1", base="removed")},
+    }
+    with AurRpcClient(fake_aur.url) as client:
+        assert find_outdated_repos(repo_packages, client) == {"package_1", "split-clone"}
+    assert len(fake_aur.requests) == 1
+
+
+def test_invalid_response(fake_aur, tmp_path):
+    """test that invalid answer makes all repos fetched
+    """
+    fake_aur.broken = True
+    with AurRpcClient(fake_aur.url) as client:
+        with pytest.raises(AurRpcError):
+            client.info(["package_1"])
+    assert check_with_rpc(tmp_path, {"package_1": {Package("package_1", "1.0-1")}}, fake_aur.url) is None
+
+
+@pytest.mark.parametrize("url", ["ftp://aur.archlinux.org/rpc", "aur.archlinux.org"], scope="function")
+def test_unsupported_url(url):
+    """test rejecting URL which is not HTTP
+    """
+    with pytest.raises(AurRpcError):
+        AurRpcClient(url)
+
+
+def test_rpc_pull(aur_tree, fake_aur):
+    """test that only repos reported as outdated are pulled
+    """
+    for name in ("package_1", "package_2"):
+        aur_tree.add_repo(name)
+        aur_tree.push_version(name, "2.0")
+    fake_aur.packages["package_2"] = ("package_2", "1.0-1")
+    repos = check_with_rpc(aur_tree.aur_path, {
+        "package_1": {Package("package_1", "1.0-1", base="package_1")},
+        "package_2": {Package("package_2", "1.0-1", base="package_2")},
+    }, fake_aur.url)
+    assert repos == {"package_1"}
+    assert pull_entire_aur(aur_tree.aur_path, repos=repos) == {Package("package_1", "2.0-1")}
+
+
+def test_rpc_ignores_fresh_repos(aur_tree, fake_aur):
+    """test that repo reported as outdated is fetched, even if it was fetched recently
+    """
+    aur_tree.add_repo("package_1")
+    assert not update_aur(aur_tree.aur_path, RunOptions(fresh_for=300.0))[0]
+    aur_tree.push_version("package_1", "2.0")
+    assert not update_aur(aur_tree.aur_path, RunOptions(fresh_for=300.0))[0]
+    options = RunOptions(rpc_url=fake_aur.url, fresh_for=300.0)
+    assert update_aur(aur_tree.aur_path, options)[0] == {Package("package_1", "2.0-1")}
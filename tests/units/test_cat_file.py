@@ -0,0 +1,41 @@
+"""Tests for reading objects through persistent git cat-file process
+"""
+
+import pytest
+
+from checkAUR.cat_file import CatFileBatch # type: ignore [import-untyped]
+from checkAUR.common.exceptions import ProgramNotInstalledError # type: ignore [import-untyped]
+
+
+def test_read_objects(aur_tree):
+    """test reading existing and missing objects with one process
+    """
+    clone = aur_tree.add_repo("package_1", "1.5")
+    with CatFileBatch(clone) as cat_file:
+        process = cat_file._process # pylint: disable=protected-access
+        assert cat_file.read_text("HEAD:PKGBUILD") == "pkgname=package_1\npkgver=1.5\npkgrel=1\n"
+        assert cat_file.read("HEAD:.SRCINFO") is None
+        assert cat_file.read("not existing object") is None
+        assert cat_file.read("HEAD:PKGBUILD") is not None
+        assert cat_file._process is process # pylint: disable=protected-access
+    assert cat_file._process is None # pylint: disable=protected-access
+
+
+def test_wrong_object_name(aur_tree):
+    """test rejecting object names breaking the protocol
+    """
+    clone = aur_tree.add_repo("package_1")
+    with CatFileBatch(clone) as cat_file:
+        with pytest.raises(ValueError):
+            cat_file.read("HEAD:PKGBUILD\nHEAD")
+
+
+def test_git_not_installed(monkeypatch, tmp_path):
+    """test reaction for missing git executable
+    """
+    def raise_not_found(*_, **__):
+        raise FileNotFoundError
+
+    monkeypatch.setattr("checkAUR.cat_file.subprocess.Popen", raise_not_found)
+    with pytest.raises(ProgramNotInstalledError):
+        CatFileBatch(tmp_path).open()
@@ -3,7 +3,9 @@
 
 import pytest
 
-from checkAUR.compare_packages import compare_invalid_packages # type: ignore [import-untyped]
+from checkAUR.compare_packages import compare_invalid_packages, compare_packages, \
+    find_orphan_repos # type: ignore [import-untyped]
+from checkAUR.common.package import Package, PackageIndex # type: ignore [import-untyped]
 
 
 @pytest.mark.parametrize("invalid_packages, pulled_packages, result", [
@@ -19,3 +21,36 @@ def test_compare_invalid_packages(invalid_packages, pulled_packages, result):
     """test of comparing invalid packages with pulled ones
     """
     assert compare_invalid_packages(pulled_packages, invalid_packages) == result
+
+
+@pytest.mark.parametrize("aur_packages, pacman_packages, result", [
+    ((("package_1", "1.1"),), (("package_1", "1.0"),), ("package_1",)),
+    ((("package_1", "1.0"),), (("package_1", "1.0"),), ()),
+    ((("package_1", "1.0"),), (("package_1", "1.1"),), ()),
+    ((("package_1", "1.1"), ("package_2", "2.0")), (("package_1", "1.0"),), ("package_1",)),
+    ((("package_1", "1.1"), ("package_2", "2.1")), (("package_1", "1.0"), ("package_2", "2.0")),
+        ("package_1", "package_2")),
+    ((), (("package_1", "1.0"),), ()),
+], scope="function")
+def test_compare_packages(aur_packages, pacman_packages, result):
+    """test of finding AUR packages newer than the installed ones
+    """
+    aur_set = set(Package(name, version) for name, version in aur_packages)
+    pacman_index = PackageIndex(Package(name, version) for name, version in pacman_packages)
+    assert sorted(package.name for package in compare_packages(aur_set, pacman_index)) == list(result)
+
+
+@pytest.mark.parametrize("installed, result", [
+    (("foo", "bar"), set()),
+    (("python-foo",), {"bar"}),
+    ((), {"foo", "bar"}),
+    (("baz",), {"foo", "bar"}),
+], scope="function")
+def test_find_orphan_repos(installed, result):
+    """test finding repos without any installed package
+    """
+    repo_packages = {
+        "foo": {Package("foo", "1.0-1", base="foo"), Package("python-foo", "1.0-1", base="foo")},
+        "bar": {Package("bar", "1.0-1")},
+    }
+    assert find_orphan_repos(repo_packages, (Package(name, "1.0-1") for name in installed)) == result
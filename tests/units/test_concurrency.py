@@ -0,0 +1,173 @@
+"""Tests for adaptive limit of fetches running at once and rate cap per host
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from checkAUR import async_git, use_git # type: ignore [import-untyped]
+from checkAUR.concurrency import AdaptiveLimit, TokenBucket, FetchLimiter, \
+    remote_host # type: ignore [import-untyped]
+from checkAUR.deadlines import Deadline # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+
+
+ENGINES = {
+    "gitpython": use_git.pull_entire_aur,
+    "asyncio": async_git.pull_entire_aur,
+}
+
+
+@pytest.mark.parametrize("url, host", [
+    ("https://aur.archlinux.org/package.git", "aur.archlinux.org"),
+    ("ssh://aur@aur.archlinux.org/package.git", "aur.archlinux.org"),
+    ("aur@aur.archlinux.org:package.git", "aur.archlinux.org"),
+    ("/home/user/remotes/package.git", ""),
+    ("./package.git", ""),
+    (None, ""),
+], scope="function")
+def test_remote_host(url, host):
+    """test finding host of the remote
+    """
+    assert remote_host(url) == host
+
+
+def test_limit_increase():
+    """test that the limit grows by one per window of successful fetches, up to the maximum
+    """
+    limit = AdaptiveLimit(2, maximum=4)
+    for _ in range(3):
+        limit.record(1.0, 0)
+    assert limit.limit == 3
+    for _ in range(20):
+        limit.record(1.0, 0)
+    assert limit.limit == 4
+
+
+def test_limit_decrease_on_failure():
+    """test that failure halves the limit once for all fetches running at the time
+    """
+    limit = AdaptiveLimit(8, maximum=8)
+    limit.record(None, 3)
+    assert limit.limit == 4
+    for _ in range(3):
+        limit.record(None, 0)
+    assert limit.limit == 4
+    limit.record(None, 0)
+    assert limit.limit == 2
+    for _ in range(5):
+        limit.record(None, 0)
+    assert limit.limit == 1
+    assert limit.report(peak=8).decreases == 3
+
+
+def test_limit_decrease_on_latency():
+    """test that latency growing over the usual one lowers the limit
+    """
+    limit = AdaptiveLimit(8, maximum=8)
+    for _ in range(10):
+        limit.record(1.0, 0)
+    assert limit.limit == 8
+    limit.record(3.0, 0)
+    assert limit.limit == 8
+    limit.record(10.0, 0)
+    assert limit.limit == 4
+
+
+def test_token_bucket():
+    """test that tokens taken ahead of time make the later operations wait
+    """
+    bucket = TokenBucket(10.0)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_limited_threads():
+    """test that no more fetches than the limit run at once in threads
+    """
+    limiter = FetchLimiter(AdaptiveLimit(2))
+    running: list[int] = [0, 0]
+    lock = threading.Lock()
+    def fetch(_timeout: float) -> bool:
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return True
+    limited = limiter.limited(fetch, "", Deadline())
+    threads = [threading.Thread(target=limited, args=(1.0,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert running[1] <= 2
+    assert limiter.report().peak == running[1]
+
+
+def test_limited_async():
+    """test that no more fetches than the limit run at once in coroutines
+    """
+    limiter = FetchLimiter(AdaptiveLimit(2))
+    running: list[int] = [0, 0]
+    async def fetch(_timeout: float) -> bool:
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+        return True
+    async def fetch_all() -> list[bool]:
+        limited = limiter.limited_async(fetch, "", Deadline())
+        return await asyncio.gather(*(limited(1.0) for _ in range(8)))
+    assert all(asyncio.run(fetch_all()))
+    assert running[1] == 2
+    assert limiter.report().peak == 2
+
+
+def test_limited_deadline():
+    """test that fetch waiting for its turn gives up at the deadline
+    """
+    limiter = FetchLimiter(AdaptiveLimit(1))
+    release = threading.Event()
+    holder = threading.Thread(target=limiter.limited(lambda _timeout: release.wait(), "", Deadline()),
+        args=(1.0,))
+    holder.start()
+    try:
+        with pytest.raises(TimeoutError):
+            limiter.limited(lambda _timeout: True, "", Deadline(0.1))(1.0)
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_host_rate():
+    """test that fetches to one host start no faster than the rate, other hosts are not delayed
+    """
+    limiter = FetchLimiter(AdaptiveLimit(4), host_rate=20.0)
+    start = time.monotonic()
+    for _ in range(5):
+        assert limiter.limited(lambda _timeout: True, "aur.archlinux.org", Deadline())(1.0)
+    assert time.monotonic() - start >= 0.19
+    start = time.monotonic()
+    assert limiter.limited(lambda _timeout: True, "other.host", Deadline())(1.0)
+    assert time.monotonic() - start < 0.05
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_engine_limit_grows(aur_tree, engine):
+    """test that engines pull through the limiter, which grows after successful fetches
+    """
+    for name in ("package_1", "package_2", "package_3"):
+        aur_tree.add_repo(name)
+        aur_tree.push_version(name, "2.0")
+    limiter = FetchLimiter(AdaptiveLimit(1, maximum=4))
+    assert ENGINES[engine](aur_tree.aur_path, 1, limiter=limiter) == {
+        Package("package_1", "2.0-1"), Package("package_2", "2.0-1"), Package("package_3", "2.0-1")}
+    report = limiter.report()
+    # latency of local fetches may vary enough to lower the limit
+    assert report.final == 2 or report.decreases
+    assert 1 <= report.peak <= 2
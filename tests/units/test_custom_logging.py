@@ -0,0 +1,74 @@
+"""Tests for the logging setup
+"""
+
+import logging
+import threading
+
+import pytest
+
+from checkAUR.common.custom_logging import logger, setup_logging, stop_logging, resolve_level, \
+    LOG_LEVEL_VARIABLE # type: ignore [import-untyped]
+
+
+@pytest.fixture(name="restore_logger")
+def restore_logger_fixture():
+    """stop the listener and restore level of the logger after the test
+    """
+    level = logger.level
+    yield
+    stop_logging()
+    logger.setLevel(level)
+
+
+@pytest.mark.parametrize("level, variable, expected", [
+    (None, None, logging.WARNING),
+    (None, "debug", logging.DEBUG),
+    (None, "verbose", logging.WARNING),
+    ("error", "debug", logging.ERROR),
+], scope="function")
+def test_resolve_level(monkeypatch, level, variable, expected):
+    """test that given level takes precedence over the environment variable
+    """
+    if variable is None:
+        monkeypatch.delenv(LOG_LEVEL_VARIABLE, raising=False)
+    else:
+        monkeypatch.setenv(LOG_LEVEL_VARIABLE, variable)
+    assert resolve_level(level) == expected
+
+
+def test_unknown_level():
+    """test that unknown level given explicitly is refused
+    """
+    with pytest.raises(ValueError):
+        resolve_level("verbose")
+
+
+def test_state_location(monkeypatch, tmp_path, restore_logger):
+    """test that records from many threads land in the state directory, without the current directory
+    """
+    monkeypatch.chdir(tmp_path)
+    path = setup_logging("info")
+    assert path == tmp_path / "xdg_state" / "checkAUR" / "checkAUR.log"
+    threads = [threading.Thread(target=logger.info, args=("record %s", index)) for index in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logger.debug("hidden %s", 1)
+    stop_logging()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert sorted(line.rsplit(" | ", 1)[1] for line in lines) == sorted(f"record {index}" for index in range(10))
+    assert not (tmp_path / "logs.log").exists()
+    logger.info("after stop")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 10
+
+
+def test_rotation(tmp_path, restore_logger):
+    """test that the log file is rotated after reaching its size
+    """
+    path = setup_logging("debug", tmp_path / "test.log", max_bytes=200, backups=2)
+    for index in range(20):
+        logger.debug("record number %s", index)
+    setup_logging("debug", path)
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["test.log", "test.log.1", "test.log.2"]
+    assert all(file.stat().st_size <= 200 for file in tmp_path.iterdir())
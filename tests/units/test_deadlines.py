@@ -0,0 +1,180 @@
+"""Tests for timeouts, deadline and retries of pulling repos
+"""
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from checkAUR import async_git, use_git # type: ignore [import-untyped]
+from checkAUR.deadlines import PullLimits, PullSummary, Deadline, backoff_delay, call_with_retries, \
+    call_with_retries_async # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+
+
+ENGINES = {
+    "gitpython": use_git.pull_entire_aur,
+    "asyncio": async_git.pull_entire_aur,
+}
+QUICK_LIMITS = PullLimits(timeout=0.5, retries=0, backoff=0.01)
+# far below the default timeout, only proving that nothing waited for the hung remote
+HANG_LIMIT = 30.0
+
+
+class FakeRemote:
+    """git:// remote which never answers, or drops every connection
+    """
+    def __init__(self, drop: bool):
+        self.drop = drop
+        self.connections = 0
+        self._held: list[socket.socket] = []
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.url = f"git://127.0.0.1:{self._server.getsockname()[1]}/package.git"
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            if self.drop:
+                connection.close()
+            else:
+                self._held.append(connection)
+
+    def close(self) -> None:
+        """stop accepting connections and close the held ones
+        """
+        self._server.close()
+        for connection in self._held:
+            connection.close()
+
+
+@pytest.fixture(name="fake_remote")
+def fake_remote_fixture(request):
+    """remote never answering, or dropping connections if parametrized with True
+    """
+    remote = FakeRemote(getattr(request, "param", False))
+    yield remote
+    remote.close()
+
+
+@pytest.mark.parametrize("attempt, maximum", [(0, 1.0), (1, 2.0), (3, 8.0), (10, 30.0)], scope="function")
+def test_backoff_delay(attempt, maximum):
+    """test that delay is jittered between zero and the capped exponential
+    """
+    delays = [backoff_delay(attempt, 1.0) for _ in range(50)]
+    assert all(0.0 <= delay <= maximum for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_deadline():
+    """test clamping timeouts to the deadline
+    """
+    assert Deadline().clamp(5.0) == 5.0
+    assert not Deadline().expired()
+    assert Deadline(1.0).clamp(5.0) <= 1.0
+    assert Deadline(0.0).expired()
+
+
+@pytest.mark.parametrize("outcomes, retries, result", [
+    ((True,), 2, True),
+    ((False, True), 2, True),
+    ((False, False, False), 2, False),
+    ((TimeoutError, True), 1, True),
+    ((TimeoutError, TimeoutError), 1, TimeoutError),
+    ((False, TimeoutError), 1, TimeoutError),
+    ((TimeoutError, False), 1, False),
+], scope="function")
+def test_call_with_retries(outcomes, retries, result):
+    """test repeating failed and timed out operations
+    """
+    calls = []
+    def operation(timeout):
+        outcome = outcomes[len(calls)]
+        calls.append(timeout)
+        if outcome is TimeoutError:
+            raise TimeoutError()
+        return outcome
+
+    async def async_operation(timeout):
+        return operation(timeout)
+
+    limits = PullLimits(timeout=1.0, retries=retries, backoff=0.001)
+    for call in (lambda: call_with_retries(operation, limits, Deadline(), "test"),
+        lambda: asyncio.run(call_with_retries_async(async_operation, limits, Deadline(), "test"))):
+        calls.clear()
+        if result is TimeoutError:
+            with pytest.raises(TimeoutError):
+                call()
+        else:
+            assert call() is result
+        assert len(calls) == len(outcomes)
+
+
+def test_retries_stop_at_deadline():
+    """test that no attempt starts after the deadline
+    """
+    calls = []
+    def operation(timeout):
+        calls.append(timeout)
+        time.sleep(0.05)
+        return False
+    limits = PullLimits(timeout=1.0, retries=100, backoff=0.001)
+    with pytest.raises(TimeoutError):
+        call_with_retries(operation, limits, Deadline(0.2), "test")
+    assert len(calls) < 10
+    assert all(timeout <= 0.2 for timeout in calls)
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_hung_remote(aur_tree, fake_remote, engine):
+    """test that hung remote is killed after the timeout and reported
+    """
+    aur_tree.add_repo("package_1")
+    aur_tree.add_repo("package_2")
+    aur_tree.push_version("package_1", "2.0")
+    aur_tree.set_remote("package_2", fake_remote.url)
+
+    summary = PullSummary()
+    start = time.perf_counter()
+    result = ENGINES[engine](aur_tree.aur_path, 2, False, None, None, QUICK_LIMITS, summary)
+    assert time.perf_counter() - start < HANG_LIMIT
+    assert result == {Package("package_1", "2.0-1")}
+    assert summary.timed_out == {"package_2"}
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_global_deadline(aur_tree, fake_remote, engine):
+    """test that repos not finished before the deadline are cancelled and reported
+    """
+    for number in range(4):
+        aur_tree.add_repo(f"package_{number}")
+        aur_tree.set_remote(f"package_{number}", fake_remote.url)
+
+    summary = PullSummary()
+    limits = PullLimits(timeout=10.0, deadline=0.5, retries=0)
+    start = time.perf_counter()
+    assert not ENGINES[engine](aur_tree.aur_path, 1, False, None, None, limits, summary)
+    assert time.perf_counter() - start < HANG_LIMIT
+    assert summary.timed_out == {f"package_{number}" for number in range(4)}
+
+
+@pytest.mark.parametrize("fake_remote", [True], indirect=True)
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_dropped_connections_retried(aur_tree, fake_remote, engine):
+    """test that fetch failing on dropped connection is retried
+    """
+    aur_tree.add_repo("package_1")
+    aur_tree.set_remote("package_1", fake_remote.url)
+
+    summary = PullSummary()
+    limits = PullLimits(timeout=5.0, retries=2, backoff=0.01)
+    assert not ENGINES[engine](aur_tree.aur_path, 1, False, None, None, limits, summary)
+    assert fake_remote.connections == 3
+    assert not summary.timed_out
@@ -0,0 +1,118 @@
+"""Tests for reading Git references without git
+"""
+
+from pathlib import Path
+import subprocess
+
+import pytest
+
+from checkAUR.git_refs import find_git_dir, read_config, read_head, read_ref, read_upstream, \
+    read_fetch_head, upstream_ref, upstream_branch, head_branch, is_bare, has_remote, \
+    remote_url # type: ignore [import-untyped]
+
+
+def rev_parse(repo_path: Path, revision: str) -> str:
+    """resolve revision with git for comparison
+    """
+    return subprocess.run(["git", "rev-parse", revision], cwd=repo_path, check=True,
+        capture_output=True).stdout.decode().strip()
+
+
+def git(repo_path: Path, *args: str) -> None:
+    """run git command in the repository
+    """
+    subprocess.run(["git", *args], cwd=repo_path, check=True, capture_output=True)
+
+
+@pytest.mark.parametrize("packed", [False, True], scope="function")
+def test_read_refs(aur_tree, packed):
+    """test resolving loose and packed references
+    """
+    clone = aur_tree.add_repo("package_1")
+    aur_tree.push_version("package_1", "2.0")
+    git(clone, "fetch", "--quiet", "origin")
+    if packed:
+        git(clone, "pack-refs", "--all")
+    git_dir = find_git_dir(clone)
+
+    assert git_dir == clone / ".git"
+    assert read_head(git_dir) == rev_parse(clone, "HEAD")
+    assert head_branch(git_dir) == "refs/heads/master"
+    assert upstream_ref(git_dir) == "refs/remotes/origin/master"
+    assert read_upstream(git_dir) == rev_parse(clone, "@{upstream}")
+    assert read_upstream(git_dir) != read_head(git_dir)
+    assert read_ref(git_dir, "refs/heads/missing") is None
+
+
+def test_detached_head(aur_tree):
+    """test resolving detached HEAD, which has no upstream
+    """
+    clone = aur_tree.add_repo("package_1")
+    git(clone, "checkout", "--quiet", "--detach")
+    git_dir = find_git_dir(clone)
+    assert head_branch(git_dir) is None
+    assert upstream_ref(git_dir) is None
+    assert read_head(git_dir) == rev_parse(clone, "HEAD")
+
+
+def test_worktree(aur_tree):
+    """test repository with .git file pointing to the git directory
+    """
+    clone = aur_tree.add_repo("package_1")
+    worktree = aur_tree.work_path / "worktree"
+    git(clone, "worktree", "add", "--quiet", "-b", "other", worktree.as_posix())
+    git_dir = find_git_dir(worktree)
+    assert git_dir is not None and git_dir != worktree / ".git"
+    assert read_head(git_dir) == rev_parse(worktree, "HEAD")
+    assert head_branch(git_dir) == "refs/heads/other"
+    assert has_remote(git_dir)
+
+
+def test_bare_repo(aur_tree):
+    """test recognizing bare repository
+    """
+    aur_tree.add_repo("package_1")
+    remote = aur_tree.remotes_path / "package_1.git"
+    assert find_git_dir(remote) == remote
+    assert is_bare(remote)
+    assert not has_remote(remote)
+    assert remote_url(remote) is None
+
+
+def test_no_repo(tmp_path):
+    """test folder without repository
+    """
+    assert find_git_dir(tmp_path) is None
+
+
+def test_read_config(tmp_path):
+    """test parsing of git config file
+    """
+    (tmp_path / "config").write_text(
+        "[core]\n\tbare = false\n\tfilemode\n# comment\n"
+        '[remote "origin"]\n\turl = "https://aur.archlinux.org/foo.git"\n'
+        '[Branch "Main"]\n\tremote = origin\n\tmerge = refs/heads/Main\n', encoding="utf-8")
+    assert read_config(tmp_path) == {
+        "core": {"bare": "false", "filemode": "true"},
+        "remote.origin": {"url": "https://aur.archlinux.org/foo.git"},
+        "branch.Main": {"remote": "origin", "merge": "refs/heads/Main"},
+    }
+    assert remote_url(tmp_path) == "https://aur.archlinux.org/foo.git"
+
+
+def test_read_fetch_head(tmp_path):
+    """test choosing the commit fetched for merge
+    """
+    (tmp_path / "FETCH_HEAD").write_text(
+        f"{'a' * 40}\tnot-for-merge\tbranch 'other' of url\n"
+        f"{'b' * 40}\t\tbranch 'master' of url\n", encoding="utf-8")
+    assert read_fetch_head(tmp_path) == "b" * 40
+    assert read_upstream(tmp_path) == "b" * 40
+
+
+def test_upstream_branch(aur_tree):
+    """test finding remote branch tracked by the current branch
+    """
+    clone = aur_tree.add_repo("package_1")
+    assert upstream_branch(clone / ".git") == ("origin", "refs/heads/master")
+
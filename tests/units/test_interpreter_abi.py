@@ -0,0 +1,110 @@
+"""Tests for finding packages with modules left behind by an interpreter update
+"""
+
+from pathlib import Path
+import os
+
+import pytest
+
+from checkAUR import interpreter_abi # type: ignore [import-untyped]
+from checkAUR.interpreter_abi import detect_abi_breakage, index_package, read_module_abi, \
+    PackagePaths # type: ignore [import-untyped]
+
+
+def write_package(db_path: Path, name: str, files: list[str], install_date: int = 1700000000) -> None:
+    """create entry of the local database with the file list
+    """
+    entry = db_path / "local" / f"{name}-1.0-1"
+    entry.mkdir(parents=True, exist_ok=True)
+    (entry / "desc").write_text(f"%NAME%\n{name}\n\n%VERSION%\n1.0-1\n\n%INSTALLDATE%\n{install_date}\n\n",
+        encoding="utf-8")
+    (entry / "files").write_text("%FILES%\n" + "\n".join(files) + "\n\n", encoding="utf-8")
+
+
+def write_file(path: Path, content: bytes = b"") -> None:
+    """create file with its parent directories
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+@pytest.fixture(name="system")
+def system_fixture(tmp_path):
+    """root directory with Python 3.13, Perl 5.40, Ruby 3.3 and Node of ABI 127,
+    and foreign packages built for them or for older versions
+    """
+    root = tmp_path / "root"
+    db_path = tmp_path / "pacman"
+    (db_path / "local").mkdir(parents=True)
+    for marker in ("usr/lib/python3.13/os.py", "usr/lib/perl5/5.40/core_perl/strict.pm",
+        "usr/lib/ruby/3.3.0/rubygems.rb"):
+        write_file(root / marker)
+    write_file(root / "usr/include/node/node_version.h", b"#define NODE_MODULE_VERSION 127\n")
+    packages = {
+        "python-current": ["usr/lib/python3.13/site-packages/current/__init__.py"],
+        "python-stranded": ["usr/lib/python3.12/", "usr/lib/python3.12/site-packages/",
+            "usr/lib/python3.12/site-packages/stranded/__init__.py"],
+        "perl-stranded": ["usr/lib/perl5/5.38/vendor_perl/Stranded.pm"],
+        "ruby-stranded": ["usr/lib/ruby/gems/3.2.0/gems/stranded/lib/stranded.rb"],
+        "node-stranded": ["usr/lib/node_modules/stranded/build/Release/stranded.node"],
+        "node-api": ["usr/lib/node_modules/api/build/Release/api.node"],
+        "unrelated": ["usr/bin/unrelated", "usr/share/doc/python3.12/README"],
+    }
+    for name, files in packages.items():
+        write_package(db_path, name, files)
+    write_file(root / packages["node-stranded"][0], b"\x7fELF...node_register_module_v115\0...")
+    write_file(root / packages["node-api"][0], b"\x7fELF...napi_register_module_v1\0...")
+    return root, db_path
+
+
+def test_index_package():
+    """test finding versioned directories and native Node modules among package's files
+    """
+    assert index_package("1.0-1:0", ["usr/lib/python3.12/", "usr/lib/python3.12/site-packages/a.py",
+        "usr/lib/python3.12/site-packages/b.py", "usr/lib/perl5/5.38/vendor_perl/A.pm",
+        "usr/lib/node_modules/a/index.js", "usr/lib/node_modules/a/a.node"]) == PackagePaths("1.0-1:0",
+            [("Perl", "5.38"), ("Python", "3.12")], ["usr/lib/node_modules/a/a.node"])
+
+
+def test_read_module_abi(tmp_path):
+    """test reading ABI version of native Node modules
+    """
+    write_file(tmp_path / "old.node", b"node_register_module_v108")
+    write_file(tmp_path / "api.node", b"napi_register_module_v1")
+    write_file(tmp_path / "empty.node")
+    assert read_module_abi(tmp_path / "old.node") == 108
+    for name in ("api.node", "empty.node", "missing.node"):
+        assert read_module_abi(tmp_path / name) is None
+
+
+def test_detect_abi_breakage(system):
+    """test finding packages built for interpreters which are not installed anymore
+    """
+    root, db_path = system
+    assert detect_abi_breakage(db_path, root) == {"python-stranded", "perl-stranded", "ruby-stranded",
+        "node-stranded"}
+
+
+def test_index_cache(system, monkeypatch):
+    """test that file lists are read again only for packages installed since the last run
+    """
+    root, db_path = system
+    assert detect_abi_breakage(db_path, root)
+    indexed: list[str] = []
+    index = interpreter_abi.index_package
+    def counting(key, files):
+        indexed.append(key)
+        return index(key, files)
+    monkeypatch.setattr(interpreter_abi, "index_package", counting)
+
+    # interpreters are checked on every run, only the index is cached
+    write_file(root / "usr/lib/python3.12/os.py")
+    assert "python-stranded" not in detect_abi_breakage(db_path, root)
+    assert not indexed
+
+    write_package(db_path, "python-current", ["usr/lib/python3.11/site-packages/current/__init__.py"],
+        install_date=1800000000)
+    local_stat = (db_path / "local").stat()
+    os.utime(db_path / "local", ns=(local_stat.st_atime_ns, local_stat.st_mtime_ns + 10**9))
+    assert "python-current" in detect_abi_breakage(db_path, root)
+    assert indexed == ["1.0-1:1800000000"]
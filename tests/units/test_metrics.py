@@ -0,0 +1,109 @@
+"""Tests for metrics of the run in node_exporter textfile format
+"""
+
+from pathlib import Path
+import threading
+
+import pytest
+
+from checkAUR import async_git, use_git # type: ignore [import-untyped]
+from checkAUR.__main__ import run_main # type: ignore [import-untyped]
+from checkAUR.common.data_classes import RunOptions, EnvVariables # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.metrics import RunMetrics, format_metrics, write_metrics # type: ignore [import-untyped]
+from checkAUR.progress import ProgressEvent, REPO_STARTED, REPO_FETCHED, REPO_UPDATED # type: ignore [import-untyped]
+
+
+ENGINES = {
+    "gitpython": use_git.pull_aur_repos,
+    "asyncio": async_git.pull_aur_repos,
+}
+
+
+def read_samples(path: Path) -> dict[str, float]:
+    """read samples of the textfile, without comments
+    """
+    samples: dict[str, float] = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_format_metrics():
+    """test formatting all metrics of the run
+    """
+    content = format_metrics(RunMetrics(finished_at=1700000000.0, duration=2.5,
+        stage_durations={"aur": 2.0, "checkrebuild": 0.5}, failed_stages=frozenset({"checkrebuild"}),
+        repos={"started": 3, "updated": 1, "timed out": 1}, fetched_bytes=2048, awaiting_packages=1))
+    lines = content.splitlines()
+    assert "# TYPE checkaur_stage_duration_seconds gauge" in lines
+    assert 'checkaur_stage_duration_seconds{stage="aur"} 2' in lines
+    assert 'checkaur_stage_success{stage="checkrebuild"} 0' in lines
+    assert 'checkaur_repos{outcome="timed_out"} 1' in lines
+    assert 'checkaur_repos{outcome="failed"} 0' in lines
+    assert "checkaur_fetched_bytes 2048" in lines
+    assert "checkaur_packages_awaiting_update 1" in lines
+    assert "checkaur_last_run_timestamp_seconds 1.7e+09" in lines
+    assert not any(line.startswith("checkaur_invalid_packages") for line in lines)
+    assert content.endswith("\n")
+
+
+def test_write_metrics(tmp_path, capsys):
+    """test that metrics replace the earlier file, and unwritable path does not stop the run nor mix with the report
+    """
+    path = tmp_path / "checkaur.prom"
+    path.write_text("old", encoding="utf-8")
+    write_metrics(path, RunMetrics(1.0, 1.0, {}))
+    assert read_samples(path)["checkaur_run_duration_seconds"] == 1.0
+    assert [file.name for file in tmp_path.iterdir()] == ["checkaur.prom"]
+    write_metrics(tmp_path / "missing" / "checkaur.prom", RunMetrics(1.0, 1.0, {}))
+    captured = capsys.readouterr()
+    assert not captured.out and "Metrics could not be written" in captured.err
+
+
+def test_run_main_metrics(monkeypatch, tmp_path):
+    """test that run_main writes metrics of its stages, repos and packages
+    """
+    def pull(*args, **_kwargs):
+        progress = args[-1]
+        progress(ProgressEvent(REPO_STARTED, "package_1"))
+        progress(ProgressEvent(REPO_FETCHED, "package_1", size=100))
+        progress(ProgressEvent(REPO_UPDATED, "package_1", frozenset({Package("package_1", "1.1")})))
+        return {"package_1": {Package("package_1", "1.1")}}
+
+    monkeypatch.setattr("checkAUR.api.load_env", lambda: EnvVariables(aur_path=Path("/")))
+    monkeypatch.setattr("checkAUR.api.detect_rebuilds", lambda *_: {"package_2"})
+    monkeypatch.setattr("checkAUR.api.detect_abi_breakage", lambda *_: set())
+    monkeypatch.setattr("checkAUR.api.pull_aur_repos", pull)
+    monkeypatch.setattr("checkAUR.api.read_enitre_repo_pkgbuild", lambda *_: {Package("package_1", "1.1")})
+    monkeypatch.setattr("checkAUR.api.extract_local_packages", lambda *_: {Package("package_1", "1.0")})
+    monkeypatch.setattr("checkAUR.__main__.show_results", lambda _: False)
+
+    path = tmp_path / "checkaur.prom"
+    run_main(ignore=True, options=RunOptions(metrics_path=path, include_orphans=True))
+    samples = read_samples(path)
+    assert samples['checkaur_stage_success{stage="aur"}'] == 1
+    assert samples['checkaur_repos{outcome="updated"}'] == 1
+    assert samples["checkaur_fetched_bytes"] == 100
+    assert samples["checkaur_packages_awaiting_update"] == 1
+    assert samples["checkaur_invalid_packages"] == 1
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_fetched_bytes(aur_tree, engine):
+    """test that both engines measure Git objects fetched for the updated repo only
+    """
+    aur_tree.add_repo("updated")
+    aur_tree.add_repo("unchanged")
+    aur_tree.push_version("updated", "2.0")
+    sizes: dict[str, int] = {}
+    lock = threading.Lock()
+    def listener(event: ProgressEvent) -> None:
+        if event.kind == REPO_FETCHED:
+            with lock:
+                sizes[event.name] = event.size
+
+    ENGINES[engine](aur_tree.aur_path, 2, progress=listener)
+    assert sizes["updated"] > 0 and sizes["unchanged"] == 0
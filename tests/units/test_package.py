@@ -0,0 +1,111 @@
+"""Tests for Package class and collections of packages
+"""
+
+import pytest
+
+from checkAUR.common import package as package_module # type: ignore [import-untyped]
+from checkAUR.common.package import Package, PackageIndex, iter_repo_packages, iter_repo_folders, \
+    read_enitre_repo_pkgbuild # type: ignore [import-untyped]
+
+
+@pytest.fixture(name="index")
+def index_fixture():
+    """index with split and standalone packages
+    """
+    return PackageIndex((
+        Package("python-foo", "1.0", base="foo"),
+        Package("foo", "1.0", base="foo"),
+        Package("bar", "2.0"),
+    ))
+
+
+@pytest.mark.parametrize("name, result", [
+    ("python-foo", Package("python-foo", "1.0")),
+    ("bar", Package("bar", "2.0")),
+    ("baz", None),
+], scope="function")
+def test_index_get(index, name, result):
+    """test looking up packages by name
+    """
+    assert index.get(name) == result
+
+
+@pytest.mark.parametrize("base, result", [
+    ("foo", {"foo", "python-foo"}),
+    ("bar", {"bar"}),
+    ("python-foo", set()),
+], scope="function")
+def test_index_members(index, base, result):
+    """test looking up packages by pkgbase
+    """
+    assert set(package.name for package in index.members(base)) == result
+
+
+@pytest.mark.parametrize("item, result", [
+    ("foo", True),
+    ("baz", False),
+    (Package("bar", "2.0"), True),
+    (Package("bar", "2.1"), False),
+], scope="function")
+def test_index_contains(index, item, result):
+    """test membership by name and by package
+    """
+    assert (item in index) is result
+
+
+def test_index_replace(index):
+    """test that adding package with the same name replaces the old one
+    """
+    index.add(Package("foo", "1.1", base="foo"))
+    assert len(index) == 3
+    assert index.get("foo") == Package("foo", "1.1")
+    assert set(package.version for package in index.members("foo")) == {"1.0", "1.1"}
+    assert Package("foo", "1.0") not in index.members("foo")
+
+
+@pytest.fixture(name="aur_folder")
+def aur_folder_fixture(tmp_path):
+    """AUR folder with two repos, a folder without metadata and a stray file
+    """
+    for name, version in (("foo", "1.0"), ("bar", "2.0")):
+        (tmp_path/name).mkdir()
+        (tmp_path/name/"PKGBUILD").write_text(f"pkgname={name}\npkgver={version}\npkgrel=1\n", encoding="utf-8")
+    (tmp_path/"empty").mkdir()
+    (tmp_path/"notes.txt").write_text("not a repo", encoding="utf-8")
+    return tmp_path
+
+
+def test_scan_skips_non_repos(aur_folder):
+    """test that files and folders without metadata are skipped
+    """
+    assert read_enitre_repo_pkgbuild(aur_folder) == {Package("foo", "1.0-1"), Package("bar", "2.0-1")}
+
+
+def test_scan_reuses_known(aur_folder, monkeypatch):
+    """test that repos already read are not read again
+    """
+    original = package_module.read_repo_packages
+    read_paths = []
+    def replace_read_repo_packages(repo_path):
+        read_paths.append(repo_path.name)
+        return original(repo_path)
+    monkeypatch.setattr(package_module, "read_repo_packages", replace_read_repo_packages)
+
+    known = {"foo": {Package("foo", "1.1-1", base="foo")}}
+    result = set(iter_repo_packages(aur_folder, known))
+    assert result == {Package("foo", "1.1-1"), Package("bar", "2.0-1")}
+    assert "foo" not in read_paths
+
+
+def test_cache_saved_on_early_stop(aur_folder, monkeypatch):
+    """test that metadata read before the consumer stopped is saved, without pruning repos never scanned
+    """
+    calls = []
+    monkeypatch.setattr(package_module.metadata_cache, "save", lambda: calls.append("save"))
+    monkeypatch.setattr(package_module.metadata_cache, "prune", lambda *_: calls.append("prune"))
+    folders = iter_repo_folders(aur_folder)
+    next(folders)
+    folders.close()
+    assert calls == ["save"]
+    assert dict(iter_repo_folders(aur_folder))["foo"] == {Package("foo", "1.0-1")}
+    assert calls == ["save", "prune", "save"]
@@ -0,0 +1,115 @@
+"""Tests for reading pacman's database
+"""
+
+from pathlib import Path
+import io
+import os
+import tarfile
+
+import pytest
+
+from checkAUR.pacman import extract_local_packages, parse_desc, read_sync_names # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.common.exceptions import ProgramNotInstalledError # type: ignore [import-untyped]
+
+
+def write_local_entry(db_path: Path, name: str, version: str, base: str | None = None) -> None:
+    """create entry of the local database
+    """
+    entry = db_path / "local" / f"{name}-{version}"
+    entry.mkdir(parents=True)
+    content = f"%NAME%\n{name}\n\n%VERSION%\n{version}\n\n"
+    if base is not None:
+        content += f"%BASE%\n{base}\n\n"
+    (entry / "desc").write_text(content, encoding="utf-8")
+
+
+def write_sync_database(db_path: Path, repo: str, packages: tuple[str, ...]) -> None:
+    """create gzip compressed sync database with given package entries
+    """
+    (db_path / "sync").mkdir(parents=True, exist_ok=True)
+    with tarfile.open(db_path / "sync" / f"{repo}.db", "w:gz") as archive:
+        for package in packages:
+            content = f"%NAME%\n{package.rsplit('-', 2)[0]}\n".encode()
+            info = tarfile.TarInfo(f"{package}/desc")
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+
+@pytest.fixture(name="db_path")
+def db_path_fixture(tmp_path):
+    """synthetic pacman database with repo and foreign packages
+    """
+    db_path = tmp_path / "pacman"
+    write_local_entry(db_path, "glibc", "2.40-1")
+    write_local_entry(db_path, "python", "3.12.7-1")
+    write_local_entry(db_path, "yay-bin", "12.4.2-1")
+    write_local_entry(db_path, "python-foo", "1:0.3-2", base="foo")
+    write_local_entry(db_path, "python-foo-debug", "1:0.3-2", base="foo")
+    (db_path / "local" / "ALPM_DB_VERSION").write_text("9\n", encoding="utf-8")
+    write_sync_database(db_path, "core", ("glibc-2.40-1",))
+    write_sync_database(db_path, "extra", ("python-3.12.7-1", "python-bar-1.0-1"))
+    return db_path
+
+
+def test_parse_desc():
+    """test parsing of desc files
+    """
+    content = "%NAME%\nfoo\n\n%DEPENDS%\nglibc\npython>=3.12\n\n%BASE%\nfoo-base\n"
+    assert parse_desc(content) == {"NAME": ["foo"], "DEPENDS": ["glibc", "python>=3.12"], "BASE": ["foo-base"]}
+
+
+def test_read_sync_names(db_path):
+    """test reading names from sync databases
+    """
+    assert read_sync_names(db_path) == {"glibc", "python", "python-bar"}
+
+
+def test_extract_local_packages(db_path):
+    """test finding foreign packages
+    """
+    result = extract_local_packages(db_path)
+    assert result == {Package("yay-bin", "12.4.2-1"), Package("python-foo", "1:0.3-2")}
+    assert {package.base for package in result} == {None, "foo"}
+
+
+def test_extract_local_packages_cache(monkeypatch, db_path):
+    """test that unchanged database is not read again
+    """
+    first_result = extract_local_packages(db_path)
+
+    def raise_read(*_):
+        raise AssertionError("database should not be read")
+
+    monkeypatch.setattr("checkAUR.pacman.read_local_database", raise_read)
+    assert extract_local_packages(db_path) == first_result
+
+
+def test_extract_local_packages_invalidation(db_path):
+    """test that pacman transaction invalidates the cache
+    """
+    extract_local_packages(db_path)
+    write_local_entry(db_path, "paru", "2.0.4-1")
+    local_path = db_path / "local"
+    stat = local_path.stat()
+    os.utime(local_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert Package("paru", "2.0.4-1") in extract_local_packages(db_path)
+
+
+def test_unreadable_sync_database(monkeypatch, db_path):
+    """test falling back to pacman query, when sync database has unknown format
+    """
+    (db_path / "sync" / "multilib.db").write_bytes(b"\x28\xb5\x2f\xfd not a tar")
+
+    class MockRunOutput:
+        stdout = b"yay-bin 12.4.2-1\npython-foo 1:0.3-2\n"
+
+    monkeypatch.setattr("checkAUR.pacman.subprocess.run", lambda *_, **__: MockRunOutput())
+    assert extract_local_packages(db_path) == {Package("yay-bin", "12.4.2-1"), Package("python-foo", "1:0.3-2")}
+
+
+def test_missing_database(tmp_path):
+    """test reaction for wrong database path
+    """
+    with pytest.raises(ProgramNotInstalledError):
+        extract_local_packages(tmp_path)
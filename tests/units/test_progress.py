@@ -0,0 +1,73 @@
+"""Tests for progress events emitted by the engines and stages, and for their console renderer
+"""
+
+import threading
+
+import pytest
+
+from checkAUR import async_git, use_git # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.deadlines import PullLimits # type: ignore [import-untyped]
+from checkAUR.progress import ProgressEvent, ConsoleProgress, REPO_STARTED, REPO_FETCHED, REPO_UPDATED, \
+    REPO_FAILED, REPO_TIMED_OUT, STAGE_DONE # type: ignore [import-untyped]
+from checkAUR.stages import run_stages # type: ignore [import-untyped]
+
+
+ENGINES = {
+    "gitpython": use_git.pull_aur_repos,
+    "asyncio": async_git.pull_aur_repos,
+}
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_engine_events(aur_tree, engine):
+    """test that every repo gets its events, updated one with its packages
+    """
+    for name in ("updated", "unchanged", "broken"):
+        aur_tree.add_repo(name)
+    aur_tree.push_version("updated", "2.0")
+    aur_tree.set_remote("broken", (aur_tree.remotes_path / "missing.git").as_posix())
+    events: list[ProgressEvent] = []
+    lock = threading.Lock()
+    def listener(event: ProgressEvent) -> None:
+        with lock:
+            events.append(event)
+
+    ENGINES[engine](aur_tree.aur_path, 2, limits=PullLimits(retries=0), progress=listener)
+    by_repo: dict[str, list[str]] = {}
+    for event in events:
+        by_repo.setdefault(event.name, []).append(event.kind)
+    assert by_repo == {
+        "updated": [REPO_STARTED, REPO_FETCHED, REPO_UPDATED],
+        "unchanged": [REPO_STARTED, REPO_FETCHED],
+        "broken": [REPO_STARTED, REPO_FAILED],
+    }
+    assert next(event.packages for event in events if event.kind == REPO_UPDATED) == {Package("updated", "2.0-1")}
+
+
+def test_stage_events():
+    """test that stages emit their events when they finish
+    """
+    events: list[ProgressEvent] = []
+    def failing() -> None:
+        raise ValueError("stage failed")
+    run_stages({"ok": lambda: 1, "failing": failing}, events.append)
+    assert sorted(event.name for event in events) == ["failing", "ok"]
+    assert all(event.kind == STAGE_DONE for event in events)
+    assert next(event.detail for event in events if event.name == "failing").startswith("failed")
+
+
+def test_console_progress(capsys):
+    """test that updates and failures are printed at once, and counted in the summary
+    """
+    progress = ConsoleProgress()
+    for name in ("package_1", "package_2", "package_3", "package_4"):
+        progress(ProgressEvent(REPO_STARTED, name))
+    progress(ProgressEvent(REPO_UPDATED, "package_1", frozenset({Package("package_1", "2.0-1")})))
+    assert capsys.readouterr().out == "Updated package_1: package_1 2.0-1\n"
+    progress(ProgressEvent(REPO_FAILED, "package_2", detail="fetch failed"))
+    progress(ProgressEvent(REPO_TIMED_OUT, "package_3"))
+    progress(ProgressEvent(REPO_FETCHED, "package_4", size=2048))
+    assert capsys.readouterr().out == "Could not pull package_2: fetch failed\n"
+    progress.print_summary()
+    assert capsys.readouterr().out == "Pulled 4 repos: 1 updated, 1 failed, 1 timed out, 2.0 KiB fetched\n"
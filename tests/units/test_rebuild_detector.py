@@ -0,0 +1,226 @@
+"""Tests for the built-in detector of packages requiring rebuild, on synthetic ELF files and pacman's database
+"""
+
+from pathlib import Path
+import io
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tarfile
+
+import pytest
+
+from checkAUR.elf import ElfKind, DynamicInfo, read_dynamic_info, read_elf_kind # type: ignore [import-untyped]
+from checkAUR import rebuild_detector # type: ignore [import-untyped]
+from checkAUR.rebuild_detector import detect_rebuilds, read_ld_so_conf, linker_search_paths, \
+    SonameIndex # type: ignore [import-untyped]
+from checkAUR.api import find_invalid_packages # type: ignore [import-untyped]
+from checkAUR.common.exceptions import ProgramNotInstalledError # type: ignore [import-untyped]
+
+
+X86_64 = ElfKind(2, 62)
+I386 = ElfKind(1, 3)
+
+
+def write_elf(path: Path, kind: ElfKind = X86_64, needed: tuple[str,...] = (), rpath: str = "",
+    runpath: str = "", shared: bool = True
+) -> None:
+    """create minimal little-endian ELF file, with one loadable segment mapping the whole file
+    and dynamic section after the program headers
+    """
+    is_64 = kind.elf_class == 2
+    header_size, segment_size, entry_format = (64, 56, "<qQ") if is_64 else (52, 32, "<iI")
+    strings = b"\0"
+    offsets: list[int] = []
+    for name in (*needed, rpath, runpath):
+        offsets.append(len(strings))
+        strings += name.encode() + b"\0"
+    tags = [(1, offset) for offset in offsets[:len(needed)]]
+    if rpath:
+        tags.append((15, offsets[-2]))
+    if runpath:
+        tags.append((29, offsets[-1]))
+    dynamic_offset = header_size + 2 * segment_size
+    dynamic_size = (len(tags) + 3) * struct.calcsize(entry_format)
+    strings_offset = dynamic_offset + dynamic_size
+    tags += [(5, strings_offset), (10, len(strings)), (0, 0)]
+    total = strings_offset + len(strings)
+
+    ident = b"\x7fELF" + bytes([kind.elf_class, 1, 1, 0]) + bytes(8)
+    elf_type = 3 if shared else 2
+    if is_64:
+        header = struct.pack("<HHIQQQIHHHHHH", elf_type, kind.machine, 1, 0, header_size, 0, 0, header_size,
+            segment_size, 2, 64, 0, 0)
+        segments = struct.pack("<IIQQQQQQ", 1, 5, 0, 0, 0, total, total, 0x1000) \
+            + struct.pack("<IIQQQQQQ", 2, 6, dynamic_offset, dynamic_offset, dynamic_offset, dynamic_size,
+                dynamic_size, 8)
+    else:
+        header = struct.pack("<HHIIIIIHHHHHH", elf_type, kind.machine, 1, 0, header_size, 0, 0, header_size,
+            segment_size, 2, 40, 0, 0)
+        segments = struct.pack("<IIIIIIII", 1, 0, 0, 0, total, total, 5, 0x1000) \
+            + struct.pack("<IIIIIIII", 2, dynamic_offset, dynamic_offset, dynamic_offset, dynamic_size,
+                dynamic_size, 6, 4)
+    dynamic = b"".join(struct.pack(entry_format, tag, value) for tag, value in tags)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(ident + header + segments + dynamic + strings)
+    path.chmod(0o755)
+
+
+def write_package(db_path: Path, name: str, files: list[str], install_date: int = 1700000000) -> None:
+    """create entry of the local database with the file list
+    """
+    entry = db_path / "local" / f"{name}-1.0-1"
+    entry.mkdir(parents=True, exist_ok=True)
+    (entry / "desc").write_text(f"%NAME%\n{name}\n\n%VERSION%\n1.0-1\n\n%INSTALLDATE%\n{install_date}\n\n",
+        encoding="utf-8")
+    (entry / "files").write_text("%FILES%\n" + "\n".join(files) + "\n\n", encoding="utf-8")
+
+
+def write_sync_database(db_path: Path, packages: tuple[str, ...]) -> None:
+    """create sync database with the given package entries
+    """
+    (db_path / "sync").mkdir(parents=True, exist_ok=True)
+    with tarfile.open(db_path / "sync" / "core.db", "w:gz") as archive:
+        for package in packages:
+            content = f"%NAME%\n{package}\n".encode()
+            info = tarfile.TarInfo(f"{package}-1.0-1/desc")
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+
+@pytest.fixture(name="system")
+def system_fixture(tmp_path):
+    """root directory with libraries and foreign packages, some of them missing libraries
+    """
+    root = tmp_path / "root"
+    db_path = tmp_path / "pacman"
+    (root / "etc" / "ld.so.conf.d").mkdir(parents=True)
+    (root / "etc" / "ld.so.conf").write_text("include ld.so.conf.d/*.conf\n", encoding="utf-8")
+    (root / "etc" / "ld.so.conf.d" / "lib32.conf").write_text("# 32-bit\n/usr/lib32\n", encoding="utf-8")
+    write_elf(root / "usr/lib/libfoo.so.1")
+    write_elf(root / "usr/lib32/libfoo32.so.1", I386)
+    packages = {
+        "good": {"usr/bin/good": ("libfoo.so.1",)},
+        "broken": {"usr/bin/broken": ("libfoo.so.1", "libgone.so.2")},
+        "wrong-class": {"usr/bin/wrong": ("libfoo32.so.1",)},
+        "bundled": {"opt/bundled/bin/bundled": ("libbundled.so",), "opt/bundled/lib/libbundled.so": ()},
+        "core-package": {"usr/bin/core": ("libgone.so.2",)},
+    }
+    for name, files in packages.items():
+        for file, needed in files.items():
+            write_elf(root / file, needed=needed)
+        write_package(db_path, name, ["usr/", "usr/bin/", *files])
+    write_elf(root / "opt/app/bin/app", needed=("libapp.so.1", "libfoo.so.1"), runpath="$ORIGIN/../lib")
+    write_elf(root / "opt/app/lib/libapp.so.1")
+    (root / "opt/app/bin/start").write_text("#!/bin/sh\nexec app\n", encoding="utf-8")
+    (root / "opt/app/bin/start").chmod(0o755)
+    write_package(db_path, "app", ["opt/app/bin/app", "opt/app/bin/start", "opt/app/lib/libapp.so.1"])
+    write_sync_database(db_path, ("core-package",))
+    return root, db_path
+
+
+@pytest.mark.parametrize("kind", [X86_64, I386], scope="function")
+def test_read_dynamic_info(tmp_path, kind):
+    """test reading required libraries and search paths
+    """
+    write_elf(tmp_path / "binary", kind, ("libfoo.so.1", "libc.so.6"), rpath="/opt/a:/opt/b", runpath="$ORIGIN")
+    assert read_dynamic_info(tmp_path / "binary") == DynamicInfo(kind, ("libfoo.so.1", "libc.so.6"),
+        ("/opt/a", "/opt/b"), ("$ORIGIN",))
+    assert read_elf_kind(tmp_path / "binary") == kind
+
+
+def test_read_invalid_files(tmp_path):
+    """test that files which are not ELF, or are broken, give no information
+    """
+    (tmp_path / "script").write_text("#!/bin/sh\n", encoding="utf-8")
+    write_elf(tmp_path / "binary", needed=("libfoo.so.1",))
+    (tmp_path / "truncated").write_bytes((tmp_path / "binary").read_bytes()[:100])
+    for name in ("script", "truncated", "missing"):
+        assert read_dynamic_info(tmp_path / name) is None
+    assert read_elf_kind(tmp_path / "script") is None
+
+
+@pytest.mark.skipif(shutil.which("readelf") is None, reason="readelf not installed")
+def test_real_binary():
+    """test that dependencies of the Python interpreter are read like readelf reads them
+    """
+    executable = Path(sys.executable).resolve()
+    output = subprocess.run(["readelf", "-d", executable.as_posix()], capture_output=True, check=True, text=True)
+    needed = tuple(line.rsplit("[", 1)[1].rstrip("]") for line in output.stdout.splitlines() if "(NEEDED)" in line)
+    info = read_dynamic_info(executable)
+    assert info is not None and info.needed == needed
+
+
+def test_read_ld_so_conf(system):
+    """test following include lines of ld.so.conf
+    """
+    root, _ = system
+    assert read_ld_so_conf(root) == ["/usr/lib32"]
+    assert linker_search_paths(root) == [root / "usr/lib32", root / "usr/lib"]
+    index = SonameIndex.build(root)
+    assert index.find("libfoo.so.1", X86_64)
+    assert not index.find("libfoo.so.1", I386)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2], scope="function")
+def test_detect_rebuilds(system, max_workers):
+    """test finding foreign packages with missing libraries, serially and in worker processes
+    """
+    root, db_path = system
+    assert detect_rebuilds(db_path, root, max_workers) == {"broken", "wrong-class"}
+
+
+def test_detector_without_database(tmp_path):
+    """test that missing pacman's database fails the rebuild step, so its results are not mistaken for empty ones
+    """
+    with pytest.raises(ProgramNotInstalledError):
+        find_invalid_packages(tmp_path / "missing")
+
+
+@pytest.fixture(name="checked")
+def checked_fixture(monkeypatch):
+    """names of packages checked by the detector, instead of being taken from its cache
+    """
+    checked: list[str] = []
+    check_entry = rebuild_detector._check_entry # pylint: disable=protected-access
+    def counting(entry, index):
+        checked.append(entry.name)
+        return check_entry(entry, index)
+    monkeypatch.setattr(rebuild_detector, "_check_entry", counting)
+    return checked
+
+
+def test_detector_cache(system, checked):
+    """test that results are reused until the package or libraries it requires change
+    """
+    root, db_path = system
+    assert detect_rebuilds(db_path, root, 1) == {"broken", "wrong-class"}
+    assert len(checked) == 5
+    checked.clear()
+    assert detect_rebuilds(db_path, root, 1) == {"broken", "wrong-class"}
+    assert not checked
+
+    # pacman replaces the entry, changing the local database directory
+    shutil.rmtree(db_path / "local" / "good-1.0-1")
+    write_package(db_path, "good", ["usr/bin/good"], install_date=1800000000)
+    local_stat = (db_path / "local").stat()
+    os.utime(db_path / "local", ns=(local_stat.st_atime_ns, local_stat.st_mtime_ns + 10**9))
+    assert detect_rebuilds(db_path, root, 1) == {"broken", "wrong-class"}
+    assert checked == ["good"]
+    checked.clear()
+
+    write_elf(root / "usr/lib/libgone.so.2")
+    assert detect_rebuilds(db_path, root, 1) == {"wrong-class"}
+    assert checked == ["broken"]
+
+
+def test_detector_invalid_cache(system, checked):
+    """test that unreadable cache is ignored
+    """
+    root, db_path = system
+    rebuild_detector.cache_path(rebuild_detector.CACHE_FILE).write_text('{"version": 1, "packages": 3}',
+        encoding="utf-8")
+    assert detect_rebuilds(db_path, root, 1) == {"broken", "wrong-class"}
+    assert len(checked) == 5
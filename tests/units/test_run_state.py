@@ -0,0 +1,164 @@
+"""Tests for state of AUR repos kept between runs
+"""
+
+import sqlite3
+
+import pytest
+
+from checkAUR import async_git, use_git # type: ignore [import-untyped]
+from checkAUR import run_state # type: ignore [import-untyped]
+from checkAUR.run_state import RunState, RepoState, open_run_state # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.common.data_classes import RunOptions # type: ignore [import-untyped]
+
+
+ENGINES = {
+    "gitpython": use_git.pull_entire_aur,
+    "asyncio": async_git.pull_entire_aur,
+}
+
+
+def test_state_saved(tmp_path):
+    """test that state is stored and loaded by the next run
+    """
+    with RunState(tmp_path / "state.sqlite") as state:
+        state.update("package_1", valid=True, head="1" * 40, remote_tip="2" * 40)
+    with RunState(tmp_path / "state.sqlite") as state:
+        assert state.get("package_1") == RepoState(valid=True, head="1" * 40, remote_tip="2" * 40)
+        assert state.get("package_2") is None
+    with RunState(tmp_path / "state.sqlite", refresh=True) as state:
+        assert state.get("package_1") is None
+
+
+def test_state_other_version(tmp_path):
+    """test that state saved in unknown version is discarded
+    """
+    with RunState(tmp_path / "state.sqlite") as state:
+        state.update("package_1", valid=True)
+    connection = sqlite3.connect(tmp_path / "state.sqlite")
+    connection.execute("PRAGMA user_version = 1000")
+    connection.close()
+    with RunState(tmp_path / "state.sqlite") as state:
+        assert state.get("package_1") is None
+
+
+def test_read_packages(monkeypatch, tmp_path):
+    """test that metadata is parsed again only after PKGBUILD changed
+    """
+    repo_path = tmp_path / "package_1"
+    repo_path.mkdir()
+    (repo_path / "PKGBUILD").write_text("pkgname=package_1\npkgver=1.0\npkgrel=1\n", encoding="utf-8")
+    read_paths = []
+    original = run_state.read_metadata
+    def replace_read_metadata(path):
+        read_paths.append(path)
+        return original(path)
+    monkeypatch.setattr(run_state, "read_metadata", replace_read_metadata)
+
+    with RunState(tmp_path / "state.sqlite") as state:
+        assert state.read_packages(repo_path) == {Package("package_1", "1.0-1")}
+    with RunState(tmp_path / "state.sqlite") as state:
+        assert state.read_packages(repo_path) == {Package("package_1", "1.0-1")}
+        assert len(read_paths) == 1
+        (repo_path / "PKGBUILD").write_text("pkgname=package_1\npkgver=1.10\npkgrel=1\n", encoding="utf-8")
+        assert state.read_packages(repo_path) == {Package("package_1", "1.10-1")}
+        assert len(read_paths) == 2
+
+
+def test_state_pruned(tmp_path):
+    """test that state of repos whose folders were removed is dropped when saving
+    """
+    (tmp_path / "package_1").mkdir()
+    with RunState(tmp_path / "state.sqlite", aur_path=tmp_path) as state:
+        state.update("package_1", valid=True)
+        state.update("package_2", valid=True)
+    with RunState(tmp_path / "state.sqlite") as state:
+        assert state.get("package_1") is not None
+        assert state.get("package_2") is None
+
+
+def test_longest_first(tmp_path):
+    """test that repos are ordered by averaged fetch time, unknown repos taking the average
+    """
+    repo_paths = [tmp_path / name for name in ("package_1", "package_2", "package_3", "package_4")]
+    with RunState(tmp_path / "state.sqlite") as state:
+        assert state.longest_first(repo_paths) == repo_paths
+        state.record_fetch_time("package_1", 1.0)
+        state.record_fetch_time("package_3", 10.0)
+        state.record_fetch_time("package_3", 2.0)
+        state.record_fetch_time("package_4", 8.0)
+    with RunState(tmp_path / "state.sqlite") as state:
+        assert state.get("package_3").fetch_time == 6.0
+        assert state.longest_first(repo_paths) == [repo_paths[3], repo_paths[2], repo_paths[1], repo_paths[0]]
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_fetch_time_recorded(aur_tree, engine):
+    """test that fetch durations are stored for the next run
+    """
+    for name in ("package_1", "package_2"):
+        aur_tree.add_repo(name)
+    with open_run_state(aur_tree.aur_path) as state:
+        assert not ENGINES[engine](aur_tree.aur_path, 2, False, state)
+    with open_run_state(aur_tree.aur_path) as state:
+        for name in ("package_1", "package_2"):
+            assert state.get(name).fetch_time > 0
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_warm_run(aur_tree, engine):
+    """test that warm run does not fetch repos fetched recently, until they stop being fresh
+    """
+    pull_entire_aur = ENGINES[engine]
+    for name in ("package_1", "package_2"):
+        aur_tree.add_repo(name)
+    with open_run_state(aur_tree.aur_path, fresh_for=300.0) as state:
+        assert not pull_entire_aur(aur_tree.aur_path, 2, False, state)
+    fetch_heads = {name: (aur_tree.aur_path / name / ".git" / "FETCH_HEAD").stat().st_mtime_ns \
+        for name in ("package_1", "package_2")}
+
+    aur_tree.push_version("package_2", "2.0")
+    with open_run_state(aur_tree.aur_path, fresh_for=300.0) as state:
+        assert not pull_entire_aur(aur_tree.aur_path, 2, False, state)
+    for name in ("package_1", "package_2"):
+        assert (aur_tree.aur_path / name / ".git" / "FETCH_HEAD").stat().st_mtime_ns == fetch_heads[name]
+
+    with open_run_state(aur_tree.aur_path) as state:
+        assert pull_entire_aur(aur_tree.aur_path, 2, False, state) == {Package("package_2", "2.0-1")}
+    assert "pkgver=2.0" in (aur_tree.aur_path / "package_2" / "PKGBUILD").read_text(encoding="utf-8")
+
+
+def test_fresh_repo_changed(aur_tree):
+    """test that repo whose refs changed since the last fetch is not fresh
+    """
+    aur_tree.add_repo("package_1")
+    with open_run_state(aur_tree.aur_path, fresh_for=300.0) as state:
+        assert not use_git.pull_entire_aur(aur_tree.aur_path, 1, False, state)
+        git_dir = aur_tree.aur_path / "package_1" / ".git"
+        head = use_git.read_head(git_dir)
+        assert state.is_fresh("package_1", head, head)
+        assert not state.is_fresh("package_1", "0" * 40, head)
+        state.fresh_for = 0.0
+        assert not state.is_fresh("package_1", head, head)
+
+
+def test_cached_validation(aur_tree):
+    """test that validation is repeated after the repo changed
+    """
+    clone = aur_tree.add_repo("package_1")
+    with open_run_state(aur_tree.aur_path) as state:
+        assert use_git.validate_with_state(clone, state) == clone / ".git"
+        (clone / "PKGBUILD").unlink()
+        assert use_git.validate_with_state(clone, state) is None
+        assert not state.get("package_1").valid
+
+
+def test_fetched_by_default(aur_tree):
+    """test that repos fetched a moment ago are fetched again, unless freshness is asked for
+    """
+    aur_tree.add_repo("package_1")
+    with open_run_state(aur_tree.aur_path) as state:
+        use_git.pull_entire_aur(aur_tree.aur_path, state=state)
+    aur_tree.push_version("package_1", "2.0")
+    with open_run_state(aur_tree.aur_path, fresh_for=RunOptions().fresh_for) as state:
+        assert use_git.pull_entire_aur(aur_tree.aur_path, state=state) == {Package("package_1", "2.0-1")}
@@ -0,0 +1,135 @@
+"""Tests for reading package metadata
+"""
+
+import json
+
+import pytest
+
+from checkAUR.common.srcinfo import parse_srcinfo, parse_pkgbuild, read_metadata, metadata_cache, \
+    PackageMetadata, CACHE_FILE # type: ignore [import-untyped]
+from checkAUR.common.package import Package, read_repo_packages, read_pkgbuild, \
+    read_enitre_repo_pkgbuild # type: ignore [import-untyped]
+from checkAUR.common.xdg import cache_path # type: ignore [import-untyped]
+
+
+SRCINFO = """pkgbase = foo
+\tpkgdesc = Example split package
+\tpkgver = 1.2.3
+\tpkgrel = 2
+\tepoch = 1
+\tarch = x86_64
+\tmakedepends = cmake
+\tdepends = glibc
+\tdepends_x86_64 = lib32-glibc
+\tsource = foo-1.2.3.tar.gz::https://example.com/foo-1.2.3.tar.gz
+\tsource_x86_64 = foo.patch
+\tsha256sums = SKIP
+
+pkgname = foo
+\tdepends = glibc
+\tdepends = zlib
+
+pkgname = python-foo
+"""
+
+
+def test_parse_srcinfo():
+    """test parsing full .SRCINFO of split package
+    """
+    assert parse_srcinfo(SRCINFO) == PackageMetadata(
+        pkgbase="foo",
+        pkgnames=("foo", "python-foo"),
+        epoch="1",
+        pkgver="1.2.3",
+        pkgrel="2",
+        depends=("glibc", "lib32-glibc", "zlib"),
+        makedepends=("cmake",),
+        sources=("foo-1.2.3.tar.gz::https://example.com/foo-1.2.3.tar.gz", "foo.patch"),
+    )
+
+
+def test_parse_srcinfo_invalid():
+    """test rejecting .SRCINFO without version
+    """
+    with pytest.raises(ValueError):
+        parse_srcinfo("pkgbase = foo\n")
+
+
+@pytest.mark.parametrize("epoch, pkgrel, result", [
+    (None, "1", "2.0-1"),
+    ("0", "1", "2.0-1"),
+    ("3", "1", "3:2.0-1"),
+    (None, None, "2.0"),
+], scope="function")
+def test_full_version(epoch, pkgrel, result):
+    """test version in the form used by pacman
+    """
+    assert PackageMetadata("foo", ("foo",), epoch, "2.0", pkgrel).full_version == result
+
+
+@pytest.mark.parametrize("content, result", [
+    ("pkgname=foo\npkgver=1.0\npkgrel=3\n", ("foo", ("foo",), "1.0-3")),
+    ("pkgname=('foo' 'foo-docs')\npkgbase=foo-base\npkgver=1.0\npkgrel=1\nepoch=2\n",
+        ("foo-base", ("foo", "foo-docs"), "2:1.0-1")),
+    ("pkgname=$_name\npkgver=1.0\npkgrel=1\n", ("folder", ("folder",), "1.0-1")),
+    ("pkgname=foo\n  pkgver=2.0\n", ("foo", ("foo",), "NDA")),
+], scope="function")
+def test_parse_pkgbuild(content, result):
+    """test reading literal values from PKGBUILD
+    """
+    metadata = parse_pkgbuild(content, "folder")
+    assert (metadata.pkgbase, metadata.pkgnames, metadata.full_version) == result
+
+
+def test_read_repo_packages(tmp_path):
+    """test reading split packages, preferring .SRCINFO over PKGBUILD
+    """
+    (tmp_path / "PKGBUILD").write_text("pkgname=other\npkgver=0.1\npkgrel=1\n", encoding="utf-8")
+    (tmp_path / ".SRCINFO").write_text(SRCINFO, encoding="utf-8")
+    assert read_repo_packages(tmp_path) == {Package("foo", "1:1.2.3-2"), Package("python-foo", "1:1.2.3-2")}
+    assert read_pkgbuild(tmp_path) == Package("foo", "1:1.2.3-2")
+    assert read_pkgbuild(tmp_path).base == "foo"
+
+
+def test_metadata_cache(monkeypatch, tmp_path):
+    """test that unchanged files are not parsed again, also in the next run
+    """
+    (tmp_path / ".SRCINFO").write_text(SRCINFO, encoding="utf-8")
+    expected = read_metadata(tmp_path)
+    metadata_cache.save()
+    metadata_cache.clear()
+
+    def raise_parse(*_):
+        raise AssertionError("file should not be parsed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("checkAUR.common.srcinfo.parse_content", raise_parse)
+        assert read_metadata(tmp_path) == expected
+
+    (tmp_path / ".SRCINFO").write_text(SRCINFO.replace("pkgrel = 2", "pkgrel = 3"), encoding="utf-8")
+    assert read_metadata(tmp_path).pkgrel == "3"
+
+
+def test_metadata_cache_prune(tmp_path):
+    """test that full scan of AUR folder drops cached metadata of removed repos
+    """
+    for name in ("foo", "removed"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / ".SRCINFO").write_text(SRCINFO, encoding="utf-8")
+        read_metadata(tmp_path / name)
+    metadata_cache.save()
+    (tmp_path / "removed" / ".SRCINFO").unlink()
+    (tmp_path / "removed").rmdir()
+
+    assert read_enitre_repo_pkgbuild(tmp_path) == {Package("foo", "1:1.2.3-2"), Package("python-foo", "1:1.2.3-2")}
+    metadata_cache.clear()
+    with open(cache_path(CACHE_FILE), "r", encoding="utf-8") as file:
+        entries = json.load(file)["entries"]
+    assert set(entries) == {(tmp_path / "foo" / ".SRCINFO").as_posix()}
+
+
+def test_no_metadata(tmp_path):
+    """test folder without metadata files
+    """
+    with pytest.raises(OSError):
+        read_metadata(tmp_path)
@@ -0,0 +1,171 @@
+"""Tests for running stages concurrently
+"""
+
+from pathlib import Path
+import threading
+import time
+
+import pytest
+
+from checkAUR.stages import run_stages, run_once, StageResult # type: ignore [import-untyped]
+from checkAUR.__main__ import run_main # type: ignore [import-untyped]
+from checkAUR.api import update_aur # type: ignore [import-untyped]
+from checkAUR.common.data_classes import EnvVariables, RunOptions # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.common.exceptions import ProgramNotInstalledError # type: ignore [import-untyped]
+from checkAUR.common.report import PackageUpdate # type: ignore [import-untyped]
+
+
+STAGE_TIME = 0.2
+BARRIER_TIMEOUT = 10.0
+
+
+def meeting_stage(barrier, value):
+    """create stage returning the value once all stages sharing the barrier reached it.
+    Stages running one after another break the barrier instead
+    """
+    def stage(*_):
+        barrier.wait()
+        return value
+    return stage
+
+
+def test_stages_concurrent():
+    """test that stages run at the same time
+    """
+    barrier = threading.Barrier(3, timeout=BARRIER_TIMEOUT)
+    results = run_stages({f"stage_{number}": meeting_stage(barrier, number) for number in range(3)})
+    assert [result.unwrap() for result in results.values()] == [0, 1, 2]
+
+
+def test_stage_error():
+    """test that exception of a stage is kept until the result is used
+    """
+    def failing_stage():
+        raise ProgramNotInstalledError("Git")
+
+    results = run_stages({"failing": failing_stage, "working": lambda: 1})
+    assert results["working"].unwrap() == 1
+    with pytest.raises(ProgramNotInstalledError):
+        results["failing"].unwrap()
+
+
+def test_no_stages():
+    """test running empty set of stages
+    """
+    assert not run_stages({})
+
+
+def test_run_main_stages(monkeypatch):
+    """test that main sequence joins results of all concurrent stages
+    """
+    shown = []
+    # pulling waits for pacman query, checkrebuild has to run alongside it
+    barrier = threading.Barrier(2, timeout=BARRIER_TIMEOUT)
+    monkeypatch.setattr("checkAUR.api.load_env", lambda: EnvVariables(aur_path=Path("/")))
+    monkeypatch.setattr("checkAUR.api.detect_rebuilds", meeting_stage(barrier, {"package_1"}))
+    monkeypatch.setattr("checkAUR.api.detect_abi_breakage", lambda *_: {"package_3"})
+    monkeypatch.setattr("checkAUR.api.pull_aur_repos", lambda *_: {})
+    monkeypatch.setattr("checkAUR.api.read_enitre_repo_pkgbuild", lambda *_: {Package("package_1", "1.1")})
+    monkeypatch.setattr("checkAUR.api.read_repo_folders",
+        lambda *_: {"package_1": {Package("package_1", "1.1")}, "package_2": {Package("package_2", "1.0")}})
+    monkeypatch.setattr("checkAUR.api.extract_local_packages",
+        meeting_stage(barrier, {Package("package_1", "1.0")}))
+    monkeypatch.setattr("checkAUR.__main__.show_results", lambda results: shown.append(results) and False)
+
+    run_main(ignore=True)
+    assert len(shown) == 1
+    assert shown[0].invalid_packages == ("package_1", "package_3")
+    assert shown[0].awaiting_packages == (PackageUpdate("package_1", "1.0", "1.1"),)
+    assert shown[0].orphan_repos == ("package_2",)
+
+
+def test_stage_times_after_failure(monkeypatch, capsys):
+    """test that stage times are printed even if a stage failed
+    """
+    def failing_stage(*_):
+        raise ProgramNotInstalledError("pacman")
+
+    monkeypatch.setattr("checkAUR.api.load_env", lambda: EnvVariables(aur_path=Path("/")))
+    monkeypatch.setattr("checkAUR.api.detect_rebuilds", lambda *_: set())
+    monkeypatch.setattr("checkAUR.api.detect_abi_breakage", lambda *_: set())
+    monkeypatch.setattr("checkAUR.api.pull_aur_repos", lambda *_: {})
+    monkeypatch.setattr("checkAUR.api.extract_local_packages", failing_stage)
+    monkeypatch.setattr("checkAUR.__main__.show_results", lambda _: pytest.fail("results shown"))
+
+    run_main(ignore=True)
+    output = capsys.readouterr().out
+    assert "Stage times:" in output
+    assert "pacman" in output and "(failed)" in output
+
+
+def test_run_once():
+    """test that shared function runs once for concurrent stages
+    """
+    calls = []
+    shared = run_once(lambda: (calls.append(1), time.sleep(STAGE_TIME), len(calls))[2])
+    results = run_stages({"first": shared, "second": shared})
+    assert results["first"].unwrap() == results["second"].unwrap() == 1
+    assert len(calls) == 1
+
+
+def test_run_once_exception():
+    """test that exception of shared function is raised by every call
+    """
+    calls = []
+    def failing():
+        calls.append(1)
+        raise ProgramNotInstalledError("pacman")
+    shared = run_once(failing)
+    for _ in range(2):
+        with pytest.raises(ProgramNotInstalledError):
+            shared()
+    assert len(calls) == 1
+
+
+def test_stage_result_unwrap():
+    """test unwrapping successful stage
+    """
+    assert StageResult(name="stage", value=3, duration=0.0).unwrap() == 3
+
+
+@pytest.mark.parametrize("include_orphans", [False, True], scope="function")
+def test_update_aur_orphans(aur_tree, include_orphans):
+    """test that repos of packages which are not installed are pulled only on request
+    """
+    for name in ("package_1", "package_2"):
+        aur_tree.add_repo(name)
+        aur_tree.push_version(name, "2.0")
+    pulled, aur_packages, orphans = update_aur(aur_tree.aur_path, RunOptions(include_orphans=include_orphans),
+        lambda: {Package("package_1", "1.0-1")})
+    if include_orphans:
+        assert pulled == {Package("package_1", "2.0-1"), Package("package_2", "2.0-1")}
+        assert not orphans
+    else:
+        assert pulled == {Package("package_1", "2.0-1")}
+        assert orphans == {"package_2"}
+    assert {package.name for package in aur_packages} == {"package_1", "package_2"}
+
+
+@pytest.mark.parametrize("git_engine", ["gitpython", "asyncio"], scope="function")
+def test_update_aur_renamed_folder(aur_tree, git_engine):
+    """test that fetched version is kept for repo cloned into folder named differently than its pkgbase
+    """
+    aur_tree.add_repo("package_1").rename(aur_tree.aur_path / "package_1-clone")
+    aur_tree.push_version("package_1", "2.0")
+    pulled, aur_packages, _ = update_aur(aur_tree.aur_path, RunOptions(git_engine=git_engine, fetch_only=True))
+    assert pulled == aur_packages == {Package("package_1", "2.0-1")}
+
+
+
+def test_update_aur_unreadable(monkeypatch, aur_tree):
+    """test that repo without readable metadata is pulled, even though it can't be matched with a package
+    """
+    pulled_repos = []
+    monkeypatch.setattr("checkAUR.api.pull_aur_repos", lambda *args: (pulled_repos.append(args[4]), {})[1])
+    for name in ("package_1", "package_2"):
+        aur_tree.add_repo(name)
+    (aur_tree.aur_path / "broken").mkdir()
+    _, _, orphans = update_aur(aur_tree.aur_path, RunOptions(), lambda: {Package("package_1", "1.0-1")})
+    assert orphans == {"package_2"}
+    assert pulled_repos == [{"package_1", "broken"}]
@@ -0,0 +1,42 @@
+"""Tests for the cold start of the CLI
+"""
+
+from pathlib import Path
+import os
+import subprocess
+import sys
+
+import checkAUR # type: ignore [import-untyped]
+
+
+# cumulative import time of the CLI module in microseconds, about 30 ms are expected
+STARTUP_BUDGET = 150_000
+HEAVY_MODULES = ("git", "dotenv", "pyperclip", "asyncio", "logging.handlers")
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    """run Python in a new process, able to import checkAUR from the tested tree
+    """
+    source = Path(checkAUR.__file__).parent.parent.as_posix()
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (source, os.environ.get("PYTHONPATH"))))}
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True, env=env)
+
+
+def test_import_time():
+    """test that CLI module is imported within the budget, without heavy dependencies
+    """
+    result = run_python("-X", "importtime", "-c", "import checkAUR.scripts.run")
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("imported package"):
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            times[name.strip()] = int(cumulative)
+    assert not [module for module in HEAVY_MODULES if module in times]
+    assert times["checkAUR.scripts.run"] < STARTUP_BUDGET
+
+
+def test_version():
+    """test that --version is answered without running the program
+    """
+    result = run_python("-c", "from checkAUR.scripts.run import main_cli; main_cli()", "--version")
+    assert result.stdout.strip().endswith(checkAUR.__version__)
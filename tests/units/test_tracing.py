@@ -0,0 +1,103 @@
+"""Tests for spans of the run and their Chrome trace
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from checkAUR import async_git, use_git # type: ignore [import-untyped]
+from checkAUR.common import tracing # type: ignore [import-untyped]
+from checkAUR.common.package import Package, PackageIndex # type: ignore [import-untyped]
+from checkAUR.compare_packages import compare_packages # type: ignore [import-untyped]
+from checkAUR.common.tracing import span, traced, enable_tracing, disable_tracing, Tracer, \
+    Span # type: ignore [import-untyped]
+
+
+ENGINES = {
+    "gitpython": use_git.pull_entire_aur,
+    "asyncio": async_git.pull_entire_aur,
+}
+
+
+@pytest.fixture(name="tracer")
+def tracer_fixture():
+    """tracer enabled for the test only
+    """
+    yield enable_tracing()
+    disable_tracing()
+
+
+@traced()
+def traced_function(value: int) -> int:
+    """function recorded as span"""
+    return value * 2
+
+
+@traced(name="coroutine", category="async")
+async def traced_coroutine() -> int:
+    """coroutine recorded as span"""
+    await asyncio.sleep(0)
+    return 1
+
+
+def test_disabled_tracing():
+    """test that nothing is recorded without the tracer
+    """
+    assert tracing._tracer is None # pylint: disable=protected-access
+    with span("nothing", repo="package"):
+        pass
+    assert traced_function(2) == 4
+
+
+def test_spans(tracer, tmp_path):
+    """test recording spans, summing them and writing them as Chrome trace
+    """
+    with span("outer", repo="package"):
+        assert traced_function(1) == 2
+        assert traced_function(2) == 4
+    assert asyncio.run(traced_coroutine()) == 1
+
+    summary = {item.name: item for item in tracer.summary()}
+    assert summary["traced_function"].count == 2
+    assert summary["outer"].total >= summary["traced_function"].total
+    assert summary["coroutine"].count == 1
+
+    tracer.write_chrome_trace(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text(encoding="utf-8"))["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert [event["name"] for event in spans] == ["outer", "traced_function", "traced_function", "coroutine"]
+    assert spans[0]["args"] == {"repo": "package"}
+    assert spans[0]["tid"] == spans[1]["tid"] != spans[3]["tid"]
+    assert {event["name"] for event in events if event["ph"] == "M"} == {"thread_name"}
+
+
+@pytest.mark.parametrize("engine", ENGINES, scope="function")
+def test_engine_spans(aur_tree, tracer, engine):
+    """test that both engines record validation, fetch and fast-forward of repos
+    """
+    aur_tree.add_repo("package_1")
+    aur_tree.push_version("package_1", "2.0")
+    ENGINES[engine](aur_tree.aur_path, 1)
+    names = {item.name: item.count for item in tracer.summary()}
+    assert names["pull_repo"] == names["validate"] == names["fetch"] == names["fast-forward"] == 1
+    assert names["read_repo_packages"] >= 1
+
+
+def test_summary_on_stderr(capsys):
+    """test that the summary is kept out of stdout, where JSON report is printed
+    """
+    tracer = Tracer()
+    tracer.add(Span("fetch", "git", 0, 2_000_000, "MainThread", {}))
+    tracer.print_summary()
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert captured.err.splitlines()[1].split()[:2] == ["fetch", "1"]
+
+
+def test_comparison_traced_once(tracer):
+    """test that comparing packages is one span, without a span per version comparison
+    """
+    compare_packages([Package("foo", "1.1"), Package("bar", "2.0")],
+        PackageIndex([Package("foo", "1.0"), Package("bar", "2.0")]))
+    assert [item.name for item in tracer.summary()] == ["compare_packages"]
@@ -3,31 +3,46 @@
 
 from pathlib import Path
 from collections import namedtuple
+import time
 
 import pytest
 import git.exc
 
+from checkAUR import use_git # type: ignore [import-untyped]
 from checkAUR.use_git import check_if_correct_repo, pull_repo, pull_entire_aur # type: ignore [import-untyped]
+from checkAUR.deadlines import PullLimits, PullSummary # type: ignore [import-untyped]
+from checkAUR.progress import REPO_FAILED # type: ignore [import-untyped]
 from checkAUR.common.package import Package # type: ignore [import-untyped]
+from checkAUR.common.exceptions import ProgramNotInstalledError # type: ignore [import-untyped]
 
 
 ROOT_PATH = Path("/")
 
 
-@pytest.mark.parametrize("input_exception, output_exception", [
-    (git.exc.InvalidGitRepositoryError, OSError),
-    (git.exc.NoSuchPathError, ValueError)
+@pytest.mark.parametrize("folder, output_exception", [
+    ("empty", OSError),
+    ("missing", ValueError)
 ], scope="function")
-def test_check_repo_exceptions(monkeypatch, input_exception, output_exception):
-    """test for all possible exceptions raised by git during the check
+def test_check_repo_exceptions(tmp_path, folder, output_exception):
+    """test for all possible exceptions raised during the check
     """
+    repo_path = tmp_path / folder
+    if folder == "empty":
+        repo_path.mkdir()
+    with pytest.raises(output_exception):
+        check_if_correct_repo(repo_path)
 
-    def raise_input_exceptions(*_):
-        raise input_exception
 
-    monkeypatch.setattr("checkAUR.use_git.Repo.__init__", raise_input_exceptions)
-    with pytest.raises(output_exception):
-        check_if_correct_repo(ROOT_PATH)
+def test_check_repo_git_not_installed(monkeypatch, aur_tree):
+    """test reaction for missing git executable
+    """
+    def raise_git_not_found(*_):
+        raise git.exc.GitCommandNotFound("git", "not found")
+
+    repo_path = aur_tree.add_repo("package_1")
+    monkeypatch.setattr("git.Repo.__init__", raise_git_not_found)
+    with pytest.raises(ProgramNotInstalledError):
+        check_if_correct_repo(repo_path)
 
 
 Commit = namedtuple("Commit", "hexsha")
@@ -40,19 +55,12 @@ class MockCommit:
         self.commit = Commit(hexsha=import_hexsha)
 
 
-class MockOrigin:
-    """Mock class for origin remote
+class MockGit:
+    """Mock class for git commands of the repo
     """
-    def __init__(self, exists, commit="2137"):
-        self._exists = exists
-        self._commit = commit
+    def __init__(self):
         self.exception = None
-
-    def exists(self):
-        return self._exists
-
-    def fetch(self):
-        return [MockCommit(self._commit)]
+        self.commands = []
 
     @property
     def set_exception(self):
@@ -62,23 +70,25 @@ class MockOrigin:
     def set_exception(self, exception):
         self.exception = exception
 
-    def pull(self):
+    def fetch(self, *args, **_):
+        self.commands.append(("fetch", *args))
+
+    def merge(self, *args, **_):
+        self.commands.append(("merge", *args))
         if self.exception is not None:
             raise self.exception("Test use git")
 
 
-Remotes = namedtuple("Remotes", "origin")
-
-
 class MockRepo:
     """Mock replacement for Repo class
     """
     def __init__(self, bare=False, origin_exists=True, commit="2137"):
         self.bare = bare
         self.origin_exists = origin_exists
-        self.remotes = Remotes(origin=MockOrigin(origin_exists))
+        self.git = MockGit()
 
         self.commit = commit
+        self.git_dir = ROOT_PATH.as_posix()
 
     def __eq__(self, other_repo):
         return bool(self.bare == other_repo.bare and self.origin_exists == other_repo.origin_exists)
@@ -88,25 +98,35 @@ class MockRepo:
         return MockCommit(self.commit)
 
 
+def make_fake_repo(repo_path: Path, bare: bool, origin: bool) -> None:
+    """create files of git repository, enough to be recognized without git
+    """
+    git_dir = repo_path if bare else repo_path / ".git"
+    (git_dir / "objects").mkdir(parents=True)
+    (git_dir / "HEAD").write_text("ref: refs/heads/master\n", encoding="utf-8")
+    config = f"[core]\n\tbare = {str(bare).lower()}\n"
+    if origin:
+        config += '[remote "origin"]\n\turl = https://aur.archlinux.org/package.git\n'
+    (git_dir / "config").write_text(config, encoding="utf-8")
+
+
 @pytest.mark.parametrize("bare, origin, result", [
     (False, True, True),    # bare: if repo is bare repository, origin: if origin exists, result: if repo is returned or None
     (False, False, False),
     (True, True, False),
     (True, False, False)
     ], scope="function")
-def test_repo_types(monkeypatch, bare, origin, result):
+def test_repo_types(monkeypatch, tmp_path, bare, origin, result):
     """test checking responses for different repo types
     """
-    def mock_repo_init(*_):
-        return MockRepo(bare, origin)
-
-    monkeypatch.setattr("checkAUR.use_git.Repo", mock_repo_init)
+    make_fake_repo(tmp_path, bare, origin)
+    monkeypatch.setattr("git.Repo", lambda path: MockRepo(bare, origin))
     # Todo: should it be checked?
     monkeypatch.setattr("checkAUR.use_git.check_pkg_build", lambda *_: True)
     if result:
-        assert check_if_correct_repo(ROOT_PATH) == MockRepo(bare, origin)
+        assert check_if_correct_repo(tmp_path) == MockRepo(bare, origin)
     else:
-        assert check_if_correct_repo(ROOT_PATH) is None
+        assert check_if_correct_repo(tmp_path) is None
 
 
 @pytest.mark.parametrize("check_result, sha_equality, result", [
@@ -126,15 +146,21 @@ def test_pull_single_repo(monkeypatch, check_result, sha_equality, result):
         else:
             repo = MockRepo(commit="1000")
     monkeypatch.setattr("checkAUR.use_git.check_if_correct_repo", lambda *_: repo)
+    monkeypatch.setattr("checkAUR.use_git.read_upstream", lambda *_: "2137")
+    monkeypatch.setattr("checkAUR.use_git.read_head", lambda *_: repo.commit)
     assert pull_repo(ROOT_PATH) is result
+    if result:
+        assert [command[0] for command in repo.git.commands] == ["fetch", "merge"]
 
 
 def test_pull_single_repo_exception(monkeypatch):
     """test checking reaction for git pull problems
     """
     repo = MockRepo(commit="1000")
-    repo.remotes.origin.set_exception = git.exc.GitCommandError
+    repo.git.set_exception = git.exc.GitCommandError
     monkeypatch.setattr("checkAUR.use_git.check_if_correct_repo", lambda *_: repo)
+    monkeypatch.setattr("checkAUR.use_git.read_upstream", lambda *_: "2137")
+    monkeypatch.setattr("checkAUR.use_git.read_head", lambda *_: repo.commit)
     assert pull_repo(ROOT_PATH) is False
 
 
@@ -152,14 +178,63 @@ def test_pull_entire_aur(monkeypatch, tmp_path, packages, check, result):
         new_folder = tmp_path / package
         new_folder.mkdir()
 
-    def replace_pull_repo(path):
+    def replace_pull_repo(path, *_):
         return check[int(path.stem[-1])-1]
 
-    def replace_read_pkgbuild(path):
-        return Package(path.stem, "0.1")
+    def replace_read_repo_packages(path):
+        return {Package(path.stem, "0.1")}
 
     monkeypatch.setattr("checkAUR.use_git.pull_repo", replace_pull_repo)
-    monkeypatch.setattr("checkAUR.use_git.read_pkgbuild", replace_read_pkgbuild)
+    monkeypatch.setattr("checkAUR.use_git.read_repo_packages", replace_read_repo_packages)
     result = tuple(Package(package_name,"0.1") for package_name in result)
     answer = tuple(sorted(pull_entire_aur(input_path), key=lambda x: x.name))
     assert answer == result
+
+
+def test_fetch_only(aur_tree):
+    """test that fetch-only mode reads new version without touching the working tree
+    """
+    clone = aur_tree.add_repo("package_1")
+    aur_tree.add_repo("package_2")
+    aur_tree.push_version("package_1", "2.0")
+
+    assert pull_entire_aur(aur_tree.aur_path, fetch_only=True) == {Package("package_1", "2.0-1")}
+    assert "pkgver=1.0" in (clone / "PKGBUILD").read_text(encoding="utf-8")
+    assert pull_entire_aur(aur_tree.aur_path) == {Package("package_1", "2.0-1")}
+    assert "pkgver=2.0" in (clone / "PKGBUILD").read_text(encoding="utf-8")
+
+
+def test_repo_error_reported(monkeypatch, aur_tree):
+    """test that unexpected error of one repo is reported as its failure, without stopping the others
+    """
+    events = []
+    pull = use_git.pull_repo
+    def failing_pull(repo_path, *args):
+        if repo_path.name == "package_2":
+            raise git.exc.GitCommandError("rev-parse", 128)
+        return pull(repo_path, *args)
+
+    for name in ("package_1", "package_2"):
+        aur_tree.add_repo(name)
+        aur_tree.push_version(name, "2.0")
+    monkeypatch.setattr("checkAUR.use_git.pull_repo", failing_pull)
+    assert pull_entire_aur(aur_tree.aur_path, progress=events.append) == {Package("package_1", "2.0-1")}
+    assert [event.name for event in events if event.kind == REPO_FAILED] == ["package_2"]
+
+
+def test_deadline_waits_for_running(monkeypatch, aur_tree):
+    """test that repos running at the deadline finish before the pull returns, so they don't outlive the state
+    """
+    finished = []
+    def slow_pull(repo_path, *_):
+        time.sleep(0.3)
+        finished.append(repo_path.name)
+        raise TimeoutError
+
+    for name in ("package_1", "package_2", "package_3"):
+        aur_tree.add_repo(name)
+    monkeypatch.setattr("checkAUR.use_git._pull_and_read", slow_pull)
+    summary = PullSummary()
+    assert not pull_entire_aur(aur_tree.aur_path, 1, limits=PullLimits(deadline=0.1), summary=summary)
+    assert len(finished) == 1
+    assert summary.timed_out == {"package_1", "package_2", "package_3"}
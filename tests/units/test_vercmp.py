@@ -0,0 +1,103 @@
+"""Tests for in-process version comparison
+"""
+
+from pathlib import Path
+import shutil
+
+import pytest
+
+from checkAUR.common import vercmp as vercmp_module # type: ignore [import-untyped]
+from checkAUR.common.vercmp import vercmp, parse_version, version_key, ParsedVersion # type: ignore [import-untyped]
+from checkAUR.common.package import Package # type: ignore [import-untyped]
+
+
+CORPUS_PATH = Path(__file__).parent / "data" / "vercmp_pairs.txt"
+
+
+def load_corpus() -> list[tuple[str, str, int]]:
+    """load version pairs with expected results from the fixture file
+    """
+    corpus: list[tuple[str, str, int]] = []
+    with open(CORPUS_PATH, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip() or line.startswith("#"):
+                continue
+            first, second, result = line.split()
+            corpus.append((first, second, int(result)))
+    return corpus
+
+
+CORPUS = load_corpus()
+
+
+@pytest.mark.parametrize("first, second, result", CORPUS, scope="function")
+def test_vercmp_corpus(first, second, result):
+    """test native vercmp against the expected results in both directions
+    """
+    assert vercmp(first, second) == result
+    assert vercmp(second, first) == -result
+
+
+@pytest.mark.skipif(shutil.which("vercmp") is None, reason="pacman's vercmp not installed")
+@pytest.mark.parametrize("first, second, _", CORPUS, scope="function")
+def test_vercmp_differential(first, second, _):
+    """test native vercmp gives identical results as the program shipped with pacman
+    """
+    assert vercmp(first, second) == vercmp_module.vercmp_external(first, second)
+    assert vercmp(second, first) == vercmp_module.vercmp_external(second, first)
+
+
+@pytest.mark.parametrize("full_version, result", [
+    ("1.0", ParsedVersion("0", "1.0", None)),
+    ("1.0-2", ParsedVersion("0", "1.0", "2")),
+    ("3:1.0-2", ParsedVersion("3", "1.0", "2")),
+    (":1.0", ParsedVersion("0", "1.0", None)),
+    ("1.0-beta-2", ParsedVersion("0", "1.0-beta", "2")),
+    ("", ParsedVersion("0", "", None)),
+], scope="function")
+def test_parse_version(full_version, result):
+    """test splitting versions into epoch, version and release
+    """
+    assert parse_version(full_version) == result
+
+
+def test_version_key():
+    """test sorting versions with the key function
+    """
+    versions = ["1.0", "1:0.1", "1.0rc", "1.0.1", "1.0a"]
+    assert sorted(versions, key=version_key) == ["1.0a", "1.0rc", "1.0", "1.0.1", "1:0.1"]
+
+
+@pytest.mark.parametrize("external, result", [(1, 1), (0, 0), (-5, -1)], scope="function")
+def test_cross_check(monkeypatch, external, result):
+    """test that in cross-check mode the external vercmp is authoritative
+    """
+    monkeypatch.setattr("checkAUR.common.vercmp.vercmp_external", lambda *_: external)
+    monkeypatch.setattr("checkAUR.common.vercmp._cross_check", True)
+    assert vercmp("1.0", "1.1") == result
+
+
+def test_cross_check_unavailable(monkeypatch):
+    """test that missing vercmp does not break the comparison
+    """
+    def raise_not_found(*_):
+        raise FileNotFoundError
+
+    monkeypatch.setattr("checkAUR.common.vercmp.vercmp_external", raise_not_found)
+    monkeypatch.setattr("checkAUR.common.vercmp._cross_check", True)
+    assert vercmp("1.1", "1.0") == 1
+
+
+@pytest.mark.parametrize("first, second, greater, lower", [
+    ("1.0", "1.1", False, True),
+    ("1.1", "1.0", True, False),
+    ("1.0", "1.0", False, False),
+    ("1:0.1", "2.0", True, False),
+], scope="function")
+def test_package_comparison(first, second, greater, lower):
+    """test comparing packages without spawning any process
+    """
+    package_1 = Package("package", first)
+    package_2 = Package("package", second)
+    assert (package_1 > package_2) is greater
+    assert (package_1 < package_2) is lower